@@ -4,9 +4,25 @@ import subprocess
 import sys
 import time
 from datetime import datetime
-import shutil
+import json
+import platform
+import argparse
+import threading
 from pathlib import Path
 
+from metatimechanger.extraction import (INFER_MAX_GAP_HOURS, PATTERN_CONFIG_FILE, extraction_cache_info,
+                                        get_pattern_registry, infer_undated_datetimes,
+                                        reload_pattern_registry, set_date_year_bounds,
+                                        smart_extract_datetime, smart_extract_datetime_detail)
+from metatimechanger.engines import (COPY_PROGRESS_MIN_SIZE, ERROR_OTHER, OutputLayout, ToolChecker,
+                                     find_duplicate_files, format_size, reload_exif_profiles)
+from metatimechanger.scanner import (MEDIA_EXTENSIONS, PHOTO_EXTENSIONS, SHARD_DIR_NAME,
+                                     VIDEO_EXTENSIONS, WATCH_SETTLE_SECONDS, FolderWatcher,
+                                     file_signature, parse_shard, scan_folder, shard_files,
+                                     shard_paths)
+from metatimechanger.pipeline import Dated, RetimePolicy, merge_shards, retime, rollback_snapshot
+from metatimechanger.snapshot import SnapshotLog, find_snapshots, snapshot_path
+
 # Cek dan install colorama jika belum terinstal
 try:
     import colorama
@@ -19,38 +35,17 @@ except ModuleNotFoundError:
     from colorama import Fore, Style
     colorama.init(autoreset=True)
 
-class ToolChecker:
-    """Kelas untuk cek ketersediaan ExifTool dan FFmpeg"""
+class _NoColor:
+    """Pengganti Fore/Style: semua atribut warna jadi string kosong"""
     
-    @staticmethod
-    def check_exiftool():
-        """Cek ExifTool"""
-        try:
-            exiftool_path = shutil.which('exiftool') or shutil.which('exiftool.exe')
-            if exiftool_path:
-                result = subprocess.run([exiftool_path, '-ver'], 
-                                      capture_output=True, text=True, timeout=5)
-                if result.returncode == 0:
-                    return True, exiftool_path, result.stdout.strip()
-            return False, None, None
-        except:
-            return False, None, None
-    
-    @staticmethod
-    def check_ffmpeg():
-        """Cek FFmpeg"""
-        try:
-            ffmpeg_path = shutil.which('ffmpeg') or shutil.which('ffmpeg.exe')
-            if ffmpeg_path:
-                result = subprocess.run([ffmpeg_path, '-version'], 
-                                      capture_output=True, text=True, timeout=5)
-                if result.returncode == 0:
-                    lines = result.stdout.split('\n')
-                    version_line = lines[0] if lines else ""
-                    return True, ffmpeg_path, version_line[:50]
-            return False, None, None
-        except:
-            return False, None, None
+    def __getattr__(self, name):
+        return ''
+
+def disable_colors():
+    """Matikan semua warna ANSI, untuk output yang dibaca mesin (mis. mode JSONL)"""
+    global Fore, Style
+    colorama.deinit()
+    Fore = Style = _NoColor()
 
 # Header ASCII dengan warna kuning solid
 header_ascii = (
@@ -62,208 +57,94 @@ header_ascii = (
     f"{Fore.YELLOW}╚═╝░░░░░╚═╝╚══════╝░░░╚═╝░░░╚═╝░░╚═╝{Style.RESET_ALL}\n"
 )
 
-def update_metadata_exif(exiftool_path, file_path, new_datetime):
-    """Mengubah metadata EXIF menggunakan exiftool dengan TANGGAL dan JAM"""
-    try:
-        date_str = new_datetime.strftime("%Y:%m:%d %H:%M:%S")
-        filename = os.path.basename(file_path)
-        
-        ext = os.path.splitext(filename)[1].lower()
-        is_video = ext in ['.mp4', '.mov', '.avi', '.mkv', '.m4v', '.wmv', '.flv', '.3gp', '.webm']
-        is_photo = ext in ['.jpg', '.jpeg', '.png', '.heic', '.gif', '.bmp', '.tiff', '.webp']
-        
-        command = [
-            exiftool_path,
-            '-overwrite_original',
-        ]
-        
-        if is_video:
-            command.extend([
-                f'-CreateDate="{date_str}"',
-                f'-ModifyDate="{date_str}"',
-                f'-MediaCreateDate="{date_str}"',
-                f'-MediaModifyDate="{date_str}"',
-                f'-TrackCreateDate="{date_str}"',
-                f'-TrackModifyDate="{date_str}"',
-                f'-DateTimeOriginal="{date_str}"',
-            ])
-        elif is_photo:
-            command.extend([
-                f'-AllDates="{date_str}"',
-                f'-DateTimeOriginal="{date_str}"',
-                f'-CreateDate="{date_str}"',
-                f'-ModifyDate="{date_str}"',
-            ])
-        else:
-            command.extend([
-                f'-AllDates="{date_str}"',
-                f'-DateTimeOriginal="{date_str}"',
-            ])
-        
-        command.extend([
-            '-FileModifyDate<DateTimeOriginal',
-            file_path
-        ])
-        
-        result = subprocess.run(command, capture_output=True, text=True, timeout=30)
-        
-        if result.returncode == 0:
-            return True
-        else:
-            return False
-            
-    except:
-        return False
+def make_copy_progress(filename, interval=0.5, paused=None):
+    """
+    Callback progress copy: satu baris yang di-refresh maksimal tiap `interval` detik.
+    paused: threading.Event opsional, selama aktif progress tidak ditampilkan.
+    """
+    start = time.perf_counter()
+    last_update = [0.0]
+    
+    def progress(copied, total):
+        if paused is not None and paused.is_set():
+            return
+        now = time.perf_counter()
+        if now - last_update[0] < interval and copied < total:
+            return
+        last_update[0] = now
+        elapsed = max(now - start, 1e-6)
+        percent = copied * 100 / total if total else 100
+        print(f"\r{Fore.BLUE}  📤 {filename}: {percent:5.1f}% "
+              f"({format_size(copied)}/{format_size(total)}, {format_size(copied / elapsed)}/s){Style.RESET_ALL}   ",
+              end='', flush=True)
+        if copied >= total:
+            print()
+    
+    return progress
 
-def update_metadata_ffmpeg(ffmpeg_path, file_path, new_datetime, output_folder):
-    """Update metadata video dengan FFmpeg"""
-    try:
-        date_str = new_datetime.strftime("%Y-%m-%d %H:%M:%S")
-        filename = os.path.basename(file_path)
-        
-        temp_file = os.path.join(output_folder, f"temp_{filename}")
-        output_file = os.path.join(output_folder, filename)
-        
-        command = [
-            ffmpeg_path,
-            '-i', file_path,
-            '-metadata', f'creation_time={date_str}',
-            '-metadata', f'date={date_str}',
-            '-metadata', f'creation_date={date_str}',
-            '-movflags', 'use_metadata_tags',
-            '-c', 'copy',
-            '-y',
-            temp_file
-        ]
-        
-        result = subprocess.run(command, capture_output=True, text=True, timeout=60)
-        
-        if result.returncode == 0:
-            if os.path.exists(temp_file) and os.path.getsize(temp_file) > 0:
-                if os.path.exists(output_file):
-                    os.remove(output_file)
-                os.rename(temp_file, output_file)
-                
-                timestamp = time.mktime(new_datetime.timetuple())
-                os.utime(output_file, (timestamp, timestamp))
-                
-                return True
-            else:
-                return False
-        else:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-            return False
-            
-    except:
-        return False
+# Refresh baris progress maksimal sekian kali per detik
+PROGRESS_REFRESH_RATE = 4
 
-def update_timestamps_basic(file_path, new_datetime):
-    """Basic file timestamp update"""
-    try:
-        timestamp = time.mktime(new_datetime.timetuple())
-        os.utime(file_path, (timestamp, timestamp))
-        return True
-    except:
-        return False
+def format_duration(seconds):
+    """Format detik jadi M:SS atau H:MM:SS"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
 
-def smart_extract_datetime(filename, is_video=True):
+class ProgressLine:
     """
-    Fungsi cerdas untuk ekstrak datetime dari berbagai format file
+    Satu baris progress (file/s, ETA, jumlah per engine) pengganti print per file.
+    Ditulis ulang dengan \r, maksimal `rate` kali per detik.
     """
-    filename_without_ext = os.path.splitext(filename)[0]
-    
-    # DAFTAR PATTERN YANG DICARI
-    patterns = [
-        # Pattern dengan SPASI: "Vid 20210327 092658"
-        (r'(?:Vid|Video|IMG|Image|Photo|Pic|Pict|Screen|Screenshot|Record|Recording)[ _-]*(\d{4})(\d{2})(\d{2})[ _-]*(\d{2})(\d{2})(\d{2})', 'Vid YYYYMMDD HHMMSS'),
-        
-        # Pattern umum dengan SPASI: "20210327 092658"
-        (r'(\d{4})(\d{2})(\d{2})[ _-]+(\d{2})(\d{2})(\d{2})', 'YYYYMMDD HHMMSS'),
-        
-        # Pattern dengan underscore: "20210327_092658"
-        (r'(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})', 'YYYYMMDD_HHMMSS'),
-        
-        # Pattern tanpa separator: "20210327092658"
-        (r'(\d{4})(\d{2})(\d{2})(\d{2})(\d{2})(\d{2})', 'YYYYMMDDHHMMSS'),
-        
-        # Pattern dengan dash: "2021-03-27-09-26-58"
-        (r'(\d{4})-(\d{2})-(\d{2})-(\d{2})-(\d{2})-(\d{2})', 'YYYY-MM-DD-HH-MM-SS'),
-        
-        # Pattern dengan dot: "2021.03.27.09.26.58"
-        (r'(\d{4})\.(\d{2})\.(\d{2})\.(\d{2})\.(\d{2})\.(\d{2})', 'YYYY.MM.DD.HH.MM.SS'),
-    ]
     
-    # Cari semua kemungkinan pattern
-    all_matches = []
+    def __init__(self, total, rate=None):
+        if rate is None:
+            rate = PROGRESS_REFRESH_RATE
+        self.total = total
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.done = 0
+        self.counts = {}
+        self.started = time.perf_counter()
+        self.last_render = 0.0
+        self.visible = False
+        self.lock = threading.Lock()
     
-    for pattern, pattern_name in patterns:
-        matches = list(re.finditer(pattern, filename_without_ext, re.IGNORECASE))
-        for match in matches:
-            try:
-                groups = match.groups()
-                
-                if len(groups) >= 6:
-                    # Pattern dengan jam
-                    year = int(groups[0])
-                    month = int(groups[1])
-                    day = int(groups[2])
-                    hour = int(groups[3])
-                    minute = int(groups[4])
-                    second = int(groups[5])
-                    
-                    # Validasi
-                    if not (1 <= month <= 12):
-                        continue
-                    if not (1 <= day <= 31):
-                        continue
-                    if not (0 <= hour <= 23):
-                        continue
-                    if not (0 <= minute <= 59):
-                        continue
-                    if not (0 <= second <= 59):
-                        continue
-                    
-                    datetime_obj = datetime(year, month, day, hour, minute, second)
-                    
-                    all_matches.append({
-                        'datetime': datetime_obj,
-                        'pattern': pattern_name,
-                        'has_time': True,
-                        'position': match.start()
-                    })
-                    
-            except (ValueError, IndexError):
-                continue
+    def update(self, label, count=1):
+        """Catat file selesai; label = nama engine, 'skip', atau 'gagal'"""
+        with self.lock:
+            self.done += count
+            self.counts[label] = self.counts.get(label, 0) + count
+            self._render(force=self.done >= self.total)
     
-    if not all_matches:
-        # Coba cari hanya tanggal
-        date_patterns = [
-            r'(\d{4})(\d{2})(\d{2})',  # YYYYMMDD
-            r'(\d{4})-(\d{2})-(\d{2})',  # YYYY-MM-DD
-        ]
+    def _render(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self.last_render < self.interval:
+            return
+        self.last_render = now
         
-        for pattern in date_patterns:
-            matches = list(re.finditer(pattern, filename_without_ext))
-            for match in matches:
-                try:
-                    groups = match.groups()
-                    if len(groups) >= 3:
-                        year = int(groups[0])
-                        month = int(groups[1])
-                        day = int(groups[2])
-                        
-                        if 1 <= month <= 12 and 1 <= day <= 31:
-                            datetime_obj = datetime(year, month, day, 12, 0, 0)
-                            return datetime_obj, False
-                except ValueError:
-                    continue
-        
-        return None, False
+        elapsed = max(now - self.started, 1e-6)
+        rate = self.done / elapsed
+        eta = format_duration((self.total - self.done) / rate) if rate > 0 else "-"
+        counts = " · ".join(f"{label} {count}" for label, count in self.counts.items())
+        print(f"\r{Fore.CYAN}⏳ {self.done}/{self.total} | {rate:.1f} file/s | ETA {eta} | {counts}{Style.RESET_ALL}   ",
+              end='', flush=True)
+        self.visible = True
+    
+    def clear(self):
+        """Tutup baris progress sebelum print lain (prompt, summary)"""
+        with self.lock:
+            if self.visible:
+                print()
+                self.visible = False
     
-    # Pilih match terbaik
-    best_match = min(all_matches, key=lambda x: x['position'])
-    return best_match['datetime'], best_match['has_time']
+    def finish(self):
+        with self.lock:
+            if self.done:
+                self._render(force=True)
+        self.clear()
 
 def ask_user_for_single_file(filename, default_datetime=None):
     """Tanya user untuk satu file yang tidak punya format"""
@@ -335,14 +216,215 @@ def ask_user_for_single_file(filename, default_datetime=None):
         else:
             print(f"{Fore.RED}❌ Pilihan tidak valid!{Style.RESET_ALL}")
 
+_DIGIT_RUN_RE = re.compile(r'\d+')
+
+def prompt_group_key(file_path):
+    """Kunci kelompok pertanyaan: folder + template nama (deret digit jadi '#')"""
+    filename = os.path.basename(file_path)
+    stem, ext = os.path.splitext(filename)
+    return os.path.dirname(file_path), _DIGIT_RUN_RE.sub('#', stem) + ext.lower()
+
+def group_questions_by_template(questions):
+    """Kelompokkan antrian pertanyaan berdasarkan prompt_group_key, urutan kemunculan dipertahankan"""
+    groups = {}
+    for question in questions:
+        groups.setdefault(prompt_group_key(question[2]), []).append(question)
+    return list(groups.values())
+
+def ask_user_for_group(entries):
+    """
+    Tanya sekali untuk satu kelompok file tanpa tanggal.
+    Return ("date", datetime), ("skip", None), atau ("single", None) = tanya satu per satu.
+    """
+    template = prompt_group_key(entries[0][1])[1]
+    print(f"\n{Fore.YELLOW}⚠️  Kelompok {template}: {len(entries)} file tanpa format tanggal{Style.RESET_ALL}")
+    for filename, _ in entries[:3]:
+        print(f"   • {filename}")
+    if len(entries) > 3:
+        print(f"   • ... dan {len(entries) - 3} file lain")
+    
+    while True:
+        print(f"\n{Fore.CYAN}Pilihan:{Style.RESET_ALL}")
+        print("[1] Input satu tanggal untuk seluruh kelompok")
+        print("[2] Skip seluruh kelompok")
+        print("[3] Tanya satu per satu")
+        
+        choice = input(f"{Fore.GREEN}Pilih (1-3): {Style.RESET_ALL}").strip()
+        
+        if choice == "1":
+            while True:
+                print(f"{Fore.YELLOW}Format: DD/MM/YYYY HH:MM:SS{Style.RESET_ALL}")
+                user_input = input(f"{Fore.GREEN}Tanggal untuk {len(entries)} file: {Style.RESET_ALL}").strip()
+                
+                if not user_input:
+                    print(f"{Fore.YELLOW}Kembali ke menu pilihan{Style.RESET_ALL}")
+                    break
+                
+                try:
+                    return "date", parse_user_datetime(user_input)
+                except ValueError:
+                    print(f"{Fore.RED}❌ Format salah!{Style.RESET_ALL}")
+                    continue
+        
+        elif choice == "2":
+            return "skip", None
+        
+        elif choice == "3":
+            return "single", None
+        
+        else:
+            print(f"{Fore.RED}❌ Pilihan tidak valid!{Style.RESET_ALL}")
+
+def parse_user_datetime(user_input):
+    """Parse input user DD/MM/YYYY [HH:MM:SS] (jam default 12:00:00), raise ValueError jika salah"""
+    if ":" in user_input and len(user_input) > 10:
+        return datetime.strptime(user_input, "%d/%m/%Y %H:%M:%S")
+    date_only = datetime.strptime(user_input, "%d/%m/%Y")
+    return datetime(date_only.year, date_only.month, date_only.day, 12, 0, 0)
+
+def ask_batch_datetime():
+    """Minta satu tanggal untuk semua file (mode batch)"""
+    while True:
+        print(f"\n{Fore.CYAN}=== TANGGAL UNTUK SEMUA FILE ==={Style.RESET_ALL}")
+        print(f"{Fore.YELLOW}Format: DD/MM/YYYY HH:MM:SS{Style.RESET_ALL}")
+        print(f"{Fore.YELLOW}Contoh: 27/03/2021 09:26:58{Style.RESET_ALL}")
+        
+        user_input = input(f"{Fore.GREEN}Masukkan tanggal untuk SEMUA file: {Style.RESET_ALL}").strip()
+        
+        try:
+            return parse_user_datetime(user_input)
+        except ValueError:
+            print(f"{Fore.RED}❌ Format salah!{Style.RESET_ALL}")
+            continue
+
+def ask_confirm_datetime(filename, datetime_obj):
+    """Konfirmasi tanggal hasil ekstraksi (mode confirm). Return datetime atau None (skip)"""
+    print(f"{Fore.CYAN}  Apakah tanggal ini benar?{Style.RESET_ALL}")
+    print(f"  [1] Ya, gunakan tanggal ini")
+    print(f"  [2] Tidak, input tanggal lain")
+    print(f"  [3] Skip file ini")
+    
+    confirm = input(f"{Fore.GREEN}Pilihan (1-3): {Style.RESET_ALL}").strip()
+    
+    if confirm == "1":
+        # Gunakan tanggal yang ditemukan
+        return datetime_obj
+    elif confirm == "2":
+        # Input manual
+        while True:
+            print(f"\n{Fore.CYAN}Input manual untuk: {filename}{Style.RESET_ALL}")
+            print(f"{Fore.YELLOW}Format: DD/MM/YYYY HH:MM:SS{Style.RESET_ALL}")
+            
+            user_input = input(f"{Fore.GREEN}Masukkan tanggal (dan jam): {Style.RESET_ALL}").strip()
+            
+            try:
+                return parse_user_datetime(user_input)
+            except ValueError:
+                print(f"{Fore.RED}❌ Format salah!{Style.RESET_ALL}")
+                continue
+    elif confirm == "3":
+        return None
+    else:
+        print(f"{Fore.RED}  ❌ Pilihan tidak valid, skip file{Style.RESET_ALL}")
+        return None
+
+class EventWriter:
+    """
+    Penulis event JSONL (satu objek JSON per baris) dengan buffer.
+    path "-" = stdout; output console lain dipindah ke stderr
+    supaya stream JSONL tetap bersih.
+    """
+    
+    def __init__(self, path, flush_every=256):
+        self.path = path
+        self.flush_every = flush_every
+        self.buffer = []
+        self.lock = threading.Lock()
+        if path == "-":
+            self.stream = sys.stdout
+            sys.stdout = sys.stderr
+        else:
+            self.stream = open(path, 'a', encoding='utf-8')
+    
+    def emit(self, event, **fields):
+        """Tambah satu event; ditulis ke disk per flush_every event"""
+        record = {'event': event, 'ts': round(time.time(), 3)}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self.lock:
+            self.buffer.append(line)
+            if len(self.buffer) >= self.flush_every:
+                self._flush_locked()
+    
+    def _flush_locked(self):
+        if self.buffer:
+            self.stream.write('\n'.join(self.buffer) + '\n')
+            self.buffer = []
+        self.stream.flush()
+    
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+    
+    def close(self):
+        self.flush()
+        if self.path == "-":
+            sys.stdout = self.stream
+        else:
+            self.stream.close()
+
+# Diisi dari argumen --jsonl / --verbose / --shard saat program dijalankan
+EVENT_WRITER = None
+VERBOSE = False
+SHARD = None
+SYNC_FILE_TIMES = True
+OUTPUT_LAYOUT = None
+SNAPSHOT = True
+INFER_MAX_GAP = None
+
 def process_files_with_options(folder_path, output_folder, processing_mode="auto", is_video=True, 
                                exiftool_path=None, ffmpeg_path=None, exif_available=False, 
-                               ffmpeg_available=False, tool_choice="auto"):
+                               ffmpeg_available=False, tool_choice="auto", dedupe=False,
+                               infer_undated=False, events=None, verbose=False, shard=None,
+                               only=None, show_summary=True, sync_times=True, layout=None,
+                               snapshot=True, infer_max_gap_hours=None):
     """
     Memproses file dengan berbagai mode:
     - "auto": Otomatis tanpa konfirmasi (hanya tanya jika format tidak ditemukan)
     - "confirm": Konfirmasi satu per satu
     - "batch": Tanggal sama untuk semua file
+    - "group": Seperti auto, tapi file tanpa tanggal ditanya sekali per
+      kelompok nama file (mis. semua Screenrecorder-*.mp4)
+    - "unattended": Seperti auto tanpa pertanyaan sama sekali, file tanpa
+      tanggal di-skip (dipakai mode watch)
+    
+    File yang tanggalnya sudah pasti langsung ditulis di background,
+    pertanyaan untuk file lain dikumpulkan dalam antrian dan jawabannya
+    langsung diproses begitu masuk.
+    
+    dedupe=True: file dengan isi sama hanya diproses sekali, hasilnya
+    di-hardlink/copy ke output untuk duplikatnya.
+    infer_undated=True: file tanpa tanggal diperkirakan dari file tetangga
+    sebelum user ditanya (lihat infer_undated_datetimes).
+    infer_max_gap_hours: jarak maksimal (jam) kedua tetangga untuk inferensi,
+    None = INFER_MAX_GAP_HOURS.
+    events: EventWriter; jika diisi, hasil per file ditulis sebagai event
+    JSONL dan print per file di console dimatikan.
+    verbose=False: print per file diganti satu baris progress (ProgressLine);
+    verbose=True: detail tiap file ditampilkan.
+    shard=(i, N): hanya proses bagian file milik shard i dari N (lihat shard_of);
+    journal dan report shard ditulis ke output_folder/.metatimechanger/
+    untuk digabung dengan merge_shards.
+    only: list nama file di folder_path yang diproses (tanpa scan folder).
+    show_summary=False: tanpa info scan dan summary (dipakai mode watch).
+    sync_times=True: setelah semua file ditulis, atime/mtime output diisi tanggal
+    metadata dalam satu tahap bulk (set_file_times). Engine basic selalu ikut,
+    karena waktu filesystem adalah satu-satunya metadata yang ditulisnya.
+    layout: pattern subfolder output dari tanggal (mis. "{Y}/{m}/{d}"), None = flat.
+    snapshot=True: sebelum ExifTool menimpa file asli, waktu & tag tanggal aslinya
+    dicatat ke output_folder/.metatimechanger/snapshot-*.bin (lihat command rollback).
+    Bisa juga SnapshotLog milik pemanggil (mis. satu snapshot per sesi watch),
+    yang tidak ditutup di sini.
     """
     
     if not os.path.exists(folder_path):
@@ -350,217 +432,454 @@ def process_files_with_options(folder_path, output_folder, processing_mode="auto
         return 0
     
     if is_video:
-        extensions = ['.mp4', '.mov', '.avi', '.mkv', '.m4v', '.wmv', '.flv', '.3gp', '.webm']
+        extensions = VIDEO_EXTENSIONS
         file_type = "video"
     else:
-        extensions = ['.jpg', '.jpeg', '.png', '.heic', '.gif', '.bmp', '.tiff', '.webp']
+        extensions = PHOTO_EXTENSIONS
         file_type = "image"
     
-    files = []
-    for filename in sorted(os.listdir(folder_path)):
-        if os.path.splitext(filename)[1].lower() in extensions:
-            file_path = os.path.join(folder_path, filename)
-            if os.path.isfile(file_path):
-                files.append((filename, file_path))
+    files = scan_folder(folder_path, extensions, only)
     
     if not files:
-        print(f"{Fore.YELLOW}⚠️  Tidak ada file {file_type} ditemukan{Style.RESET_ALL}")
+        if show_summary:
+            print(f"{Fore.YELLOW}⚠️  Tidak ada file {file_type} ditemukan{Style.RESET_ALL}")
         return 0
     
-    print(f"\n{Fore.CYAN}📊 Ditemukan {len(files)} file {file_type}{Style.RESET_ALL}")
+    if show_summary:
+        print(f"\n{Fore.CYAN}📊 Ditemukan {len(files)} file {file_type}{Style.RESET_ALL}")
+    
+    # Daftar lengkap tetap dipakai inferensi supaya tetangga di luar shard ikut terlihat
+    scanned = files
+    if shard:
+        files = shard_files(files, folder_path, shard)
+        print(f"{Fore.CYAN}🧱 Shard {shard[0]}/{shard[1]}: {len(files)} file{Style.RESET_ALL}")
+    
+    total_files = len(files)
+    duplicates = {}
+    if dedupe:
+        files, duplicates = find_duplicate_files(files)
+        duplicate_count = total_files - len(files)
+        if duplicate_count:
+            print(f"{Fore.CYAN}🔁 {duplicate_count} duplikat dilewati, cukup proses {len(files)} file unik{Style.RESET_ALL}")
     
     os.makedirs(output_folder, exist_ok=True)
+    output_layout = OutputLayout(output_folder, layout)
+    # Snapshot milik pemanggil (sesi watch) tidak ditutup di sini
+    own_snapshot = not isinstance(snapshot, SnapshotLog)
+    if own_snapshot:
+        snapshot_log = SnapshotLog(snapshot_path(output_folder)) if snapshot else None
+    else:
+        snapshot_log = snapshot
+    
+    journal = None
+    if shard:
+        journal_path, report_path = shard_paths(output_folder, shard)
+        os.makedirs(os.path.dirname(journal_path), exist_ok=True)
+        journal = EventWriter(journal_path)
     
     processed_count = 0
     skipped_count = 0
-    batch_date = None
-    apply_to_all = False
+    copy_bytes = 0
+    copy_seconds = 0.0
+    registry = get_pattern_registry()
+    registry.reset_stats()
+    cache_before = extraction_cache_info()
+    verbose = verbose and events is None
+    progress = None if verbose or not show_summary else ProgressLine(total_files)
+    patterns = {}
+    failed_files = []
+    time_failed = []
+    # Aktif selama ada input() supaya progress copy tidak menimpa prompt
+    prompting = threading.Event()
+    
+    def file_done(filename, file_path, datetime_obj, engine, status, duration=0.0, size=0,
+                  error=None, error_kind=None, pattern=None):
+        """Catat hasil satu file: update baris progress dan tulis event JSONL"""
+        if status == 'failed':
+            failed_files.append((filename, error_kind))
+        if progress is not None:
+            progress.update(engine if status == 'ok' else ('gagal' if status == 'failed' else 'skip'))
+        # Path relatif terhadap folder input: sama di semua mesin/mount point, dipakai merge
+        relative = os.path.relpath(file_path, folder_path).replace(os.sep, '/')
+        for sink in (events, journal):
+            if sink is None:
+                continue
+            sink.emit('file', file=file_path, name=filename, relative=relative,
+                      datetime=datetime_obj.isoformat() if datetime_obj else None,
+                      pattern=pattern, engine=engine,
+                      duration_ms=round(duration * 1000, 3), bytes=size,
+                      status=status, error=error, error_kind=error_kind)
+    
+    def skip_file(filename, file_path, error=None):
+        """File yang tidak pernah dikirim ke retime() (tanpa tanggal / di-skip user)"""
+        nonlocal skipped_count
+        skipped_count += 1
+        file_done(filename, file_path, None, None, 'skipped', error=error, pattern=patterns.get(file_path))
+    
+    def copy_progress(filename, file_path):
+        if verbose and os.path.getsize(file_path) >= COPY_PROGRESS_MIN_SIZE:
+            return make_copy_progress(filename, paused=prompting)
+        return None
+    
+    def log_scheduler(message):
+        if progress is not None:
+            progress.clear()
+        print(f"{Fore.CYAN}⚙️  {message}{Style.RESET_ALL}")
     
-    for idx, (filename, file_path) in enumerate(files, 1):
-        print(f"\n{Fore.CYAN}[{idx}/{len(files)}] {filename}{Style.RESET_ALL}")
+    def report(result):
+        """Tampilkan satu Result dari retime()"""
+        nonlocal processed_count, skipped_count, copy_bytes, copy_seconds
+        filename = os.path.basename(result.path)
+        file_done(filename, result.path, result.datetime, result.engine, result.status, result.duration,
+                  result.bytes, result.error, result.error_kind, result.pattern)
         
-        datetime_obj = None
-        skip_file = False
+        if result.status != 'ok':
+            if verbose and result.status == 'failed':
+                print(f"{Fore.RED}  ❌ Gagal update metadata ({result.engine}, {result.error_kind}): {filename}{Style.RESET_ALL}")
+                if result.error:
+                    print(f"{Fore.YELLOW}     {result.error}{Style.RESET_ALL}")
+            elif verbose:
+                print(f"{Fore.YELLOW}  ⏭️  {filename} di-skip ({result.error}){Style.RESET_ALL}")
+            skipped_count += 1
+            return
         
+        processed_count += 1
+        copy_bytes += result.bytes
+        copy_seconds += result.duration
+        # Output ada tapi tetap ada error: tahap waktu filesystem yang gagal
+        if result.output and result.error:
+            time_failed.append((filename, result.error_kind, result.error))
+        if verbose:
+            engine = {"exiftool": "ExifTool", "native": "Native", "ffmpeg": "FFmpeg",
+                      "sidecar": "Sidecar XMP", "link": "Duplikat"}.get(result.engine, "Timestamp")
+            if result.bytes:
+                rate = format_size(result.bytes / result.duration) + "/s" if result.duration > 0 else "-"
+                print(f"{Fore.GREEN}  ✅ {filename} ({engine}) 📤 {format_size(result.bytes)}, {rate}{Style.RESET_ALL}")
+            else:
+                print(f"{Fore.GREEN}  ✅ {filename} ({engine}){Style.RESET_ALL}")
+            if result.error:
+                print(f"{Fore.YELLOW}  ⚠️  {result.error}{Style.RESET_ALL}")
+    
+    # Ekstraksi semua file dulu (satu pass), supaya inferensi bisa melihat tetangga
+    extracted = {}
+    inferred = {}
+    if processing_mode in ("auto", "confirm", "group", "unattended"):
+        if infer_undated and len(scanned) != len(files):
+            # Tetangga di luar shard / duplikat hanya untuk inferensi, tidak masuk statistik pattern
+            for filename, file_path in scanned:
+                extracted[file_path] = smart_extract_datetime_detail(filename)[:2]
+            registry.reset_stats()
+        for filename, file_path in files:
+            datetime_obj, has_time, pattern_name = smart_extract_datetime_detail(filename)
+            extracted[file_path] = (datetime_obj, has_time)
+            patterns[file_path] = pattern_name
+        if infer_undated:
+            inferred_by_index = infer_undated_datetimes(
+                [filename for filename, _ in scanned],
+                [extracted[file_path][0] for _, file_path in scanned],
+                max_gap_hours=infer_max_gap_hours,
+            )
+            own_paths = {file_path for _, file_path in files}
+            inferred = {scanned[index][1]: value for index, value in inferred_by_index.items()
+                        if scanned[index][1] in own_paths}
+            for file_path in inferred:
+                patterns[file_path] = "inferred"
+            if inferred:
+                print(f"{Fore.CYAN}🧩 {len(inferred)} file tanpa tanggal diperkirakan dari file tetangga{Style.RESET_ALL}")
+    
+    def dated_files():
+        """
+        Tanggal per file untuk retime(), dalam urutan siap: file yang tanggalnya
+        sudah pasti dulu (langsung ditulis di background), lalu jawaban user.
+        retime() menampilkan hasil yang sudah selesai sebelum pertanyaan berikutnya.
+        """
         # MODE BATCH: Gunakan tanggal yang sama untuk semua
-        if processing_mode == "batch" or apply_to_all:
-            if batch_date is None and processing_mode == "batch":
-                # Minta tanggal batch
-                while True:
-                    print(f"\n{Fore.CYAN}=== TANGGAL UNTUK SEMUA FILE ==={Style.RESET_ALL}")
-                    print(f"{Fore.YELLOW}Format: DD/MM/YYYY HH:MM:SS{Style.RESET_ALL}")
-                    print(f"{Fore.YELLOW}Contoh: 27/03/2021 09:26:58{Style.RESET_ALL}")
-                    
-                    user_input = input(f"{Fore.GREEN}Masukkan tanggal untuk SEMUA file: {Style.RESET_ALL}").strip()
-                    
-                    try:
-                        if ":" in user_input and len(user_input) > 10:
-                            batch_date = datetime.strptime(user_input, "%d/%m/%Y %H:%M:%S")
-                        else:
-                            date_only = datetime.strptime(user_input, "%d/%m/%Y")
-                            batch_date = datetime(date_only.year, date_only.month, date_only.day, 12, 0, 0)
-                        break
-                    except ValueError:
-                        print(f"{Fore.RED}❌ Format salah!{Style.RESET_ALL}")
-                        continue
-            
-            datetime_obj = batch_date
-            print(f"{Fore.GREEN}  📅 Menggunakan tanggal batch: {datetime_obj.strftime('%d/%m/%Y %H:%M:%S')}{Style.RESET_ALL}")
+        if processing_mode == "batch":
+            batch_date = ask_batch_datetime()
+            if verbose:
+                for idx, (filename, _) in enumerate(files, 1):
+                    print(f"\n{Fore.CYAN}[{idx}/{len(files)}] {filename}{Style.RESET_ALL}")
+                    print(f"{Fore.GREEN}  📅 Menggunakan tanggal batch: {batch_date.strftime('%d/%m/%Y %H:%M:%S')}{Style.RESET_ALL}")
+            yield Dated([file_path for _, file_path in files], batch_date, None)
+            return
         
-        # MODE AUTO: Coba ekstrak otomatis, hanya tanya jika gagal
-        elif processing_mode == "auto":
-            datetime_obj, has_time = smart_extract_datetime(filename, is_video)
+        # Tahap 1: file yang tanggalnya sudah pasti langsung ke background,
+        # sisanya masuk antrian pertanyaan
+        questions = []
+        for idx, (filename, file_path) in enumerate(files, 1):
+            datetime_obj, has_time = extracted[file_path]
+            is_inferred = not datetime_obj and file_path in inferred
+            if is_inferred:
+                datetime_obj = inferred[file_path]
+                has_time = True
             
-            if datetime_obj:
+            # MODE UNATTENDED tidak pernah bertanya
+            if processing_mode == "unattended" and not datetime_obj:
+                skip_file(filename, file_path, "tanggal tidak ditemukan di nama file")
+                continue
+            
+            # MODE CONFIRM selalu tanya; MODE AUTO hanya tanya jika format tidak ditemukan
+            if processing_mode == "confirm" or not datetime_obj:
+                questions.append((idx, filename, file_path, datetime_obj, has_time, is_inferred))
+                continue
+            
+            if verbose:
+                print(f"\n{Fore.CYAN}[{idx}/{len(files)}] {filename}{Style.RESET_ALL}")
+                if is_inferred:
+                    print(f"{Fore.CYAN}  🧩 Diperkirakan dari file tetangga{Style.RESET_ALL}")
                 if has_time:
                     print(f"{Fore.GREEN}  ✅ Ditemukan: {datetime_obj.strftime('%d/%m/%Y %H:%M:%S')}{Style.RESET_ALL}")
                 else:
                     print(f"{Fore.YELLOW}  ✅ Ditemukan (hanya tanggal): {datetime_obj.strftime('%d/%m/%Y')} (jam: 12:00){Style.RESET_ALL}")
-            else:
-                # Tidak ditemukan format, tanya user
-                result = ask_user_for_single_file(filename)
-                if result:
-                    datetime_obj, apply_to_all_flag = result
-                    if apply_to_all_flag:
-                        apply_to_all = True
-                        batch_date = datetime_obj
+            yield Dated([file_path], datetime_obj, patterns.get(file_path))
+        
+        # Tahap 2: antrian pertanyaan, jawaban langsung dikirim ke background
+        if questions:
+            if progress is not None:
+                progress.clear()
+            running = len(files) - len(questions)
+            background = f", {running} file lain diproses di background" if running else ""
+            print(f"\n{Fore.CYAN}❓ {len(questions)} file perlu jawaban{background}{Style.RESET_ALL}")
+        
+        # MODE GROUP: satu pertanyaan per kelompok nama file, satu batch write per jawaban
+        if processing_mode == "group" and questions:
+            remaining = []
+            for group in group_questions_by_template(questions):
+                if len(group) == 1:
+                    remaining.extend(group)
+                    continue
+                
+                if progress is not None:
+                    progress.clear()
+                entries = [(filename, file_path) for _, filename, file_path, _, _, _ in group]
+                prompting.set()
+                action, group_datetime = ask_user_for_group(entries)
+                prompting.clear()
+                
+                if action == "date":
+                    print(f"{Fore.GREEN}  📅 {len(entries)} file memakai: {group_datetime.strftime('%d/%m/%Y %H:%M:%S')}{Style.RESET_ALL}")
+                    yield Dated([file_path for _, file_path in entries], group_datetime, None)
+                elif action == "skip":
+                    print(f"{Fore.YELLOW}  ⏭️  {len(entries)} file di-skip{Style.RESET_ALL}")
+                    for filename, file_path in entries:
+                        skip_file(filename, file_path)
                 else:
-                    skip_file = True
+                    remaining.extend(group)
+            
+            # Kelompok yang dipilih "tanya satu per satu" kembali ke urutan asli
+            questions = sorted(remaining, key=lambda question: question[0])
         
-        # MODE CONFIRM: Konfirmasi satu per satu
-        elif processing_mode == "confirm":
-            datetime_obj, has_time = smart_extract_datetime(filename, is_video)
+        apply_to_all = False
+        batch_date = None
+        for idx, filename, file_path, datetime_obj, has_time, is_inferred in questions:
+            if progress is not None:
+                progress.clear()
+            print(f"\n{Fore.CYAN}[{idx}/{len(files)}] {filename}{Style.RESET_ALL}")
             
-            if datetime_obj:
+            if apply_to_all:
+                datetime_obj = batch_date
+                print(f"{Fore.GREEN}  📅 Menggunakan tanggal batch: {datetime_obj.strftime('%d/%m/%Y %H:%M:%S')}{Style.RESET_ALL}")
+            
+            # MODE CONFIRM: Konfirmasi satu per satu
+            elif datetime_obj:
+                if is_inferred:
+                    print(f"{Fore.CYAN}  🧩 Diperkirakan dari file tetangga{Style.RESET_ALL}")
                 if has_time:
                     print(f"{Fore.GREEN}  📅 Ditemukan: {datetime_obj.strftime('%d/%m/%Y %H:%M:%S')}{Style.RESET_ALL}")
                 else:
                     print(f"{Fore.YELLOW}  📅 Ditemukan (hanya tanggal): {datetime_obj.strftime('%d/%m/%Y')} (jam: 12:00){Style.RESET_ALL}")
                 
-                # Tanya konfirmasi
-                print(f"{Fore.CYAN}  Apakah tanggal ini benar?{Style.RESET_ALL}")
-                print(f"  [1] Ya, gunakan tanggal ini")
-                print(f"  [2] Tidak, input tanggal lain")
-                print(f"  [3] Skip file ini")
-                
-                confirm = input(f"{Fore.GREEN}Pilihan (1-3): {Style.RESET_ALL}").strip()
-                
-                if confirm == "1":
-                    # Gunakan tanggal yang ditemukan
-                    pass
-                elif confirm == "2":
-                    # Input manual
-                    while True:
-                        print(f"\n{Fore.CYAN}Input manual untuk: {filename}{Style.RESET_ALL}")
-                        print(f"{Fore.YELLOW}Format: DD/MM/YYYY HH:MM:SS{Style.RESET_ALL}")
-                        
-                        user_input = input(f"{Fore.GREEN}Masukkan tanggal (dan jam): {Style.RESET_ALL}").strip()
-                        
-                        try:
-                            if ":" in user_input and len(user_input) > 10:
-                                datetime_obj = datetime.strptime(user_input, "%d/%m/%Y %H:%M:%S")
-                            else:
-                                date_only = datetime.strptime(user_input, "%d/%m/%Y")
-                                datetime_obj = datetime(date_only.year, date_only.month, date_only.day, 12, 0, 0)
-                            break
-                        except ValueError:
-                            print(f"{Fore.RED}❌ Format salah!{Style.RESET_ALL}")
-                            continue
-                elif confirm == "3":
-                    skip_file = True
-                else:
-                    print(f"{Fore.RED}  ❌ Pilihan tidak valid, skip file{Style.RESET_ALL}")
-                    skip_file = True
-            else:
-                # Tidak ditemukan format
-                result = ask_user_for_single_file(filename)
-                if result:
-                    datetime_obj, apply_to_all_flag = result
-                    if apply_to_all_flag:
-                        apply_to_all = True
-                        batch_date = datetime_obj
-                else:
-                    skip_file = True
-        
-        # Skip file jika diperlukan
-        if skip_file:
-            print(f"{Fore.YELLOW}  ⏭️  File di-skip{Style.RESET_ALL}")
-            skipped_count += 1
-            continue
-        
-        if not datetime_obj:
-            print(f"{Fore.YELLOW}  ⏭️  File di-skip{Style.RESET_ALL}")
-            skipped_count += 1
-            continue
-        
-        # Tentukan tool yang akan digunakan
-        file_ext = os.path.splitext(filename)[1].lower()
-        
-        if tool_choice == "auto":
-            if is_video:
-                if exif_available:
-                    selected_tool = "exiftool"
-                elif ffmpeg_available:
-                    selected_tool = "ffmpeg"
-                else:
-                    selected_tool = "basic"
+                prompting.set()
+                datetime_obj = ask_confirm_datetime(filename, datetime_obj)
+                prompting.clear()
+            
+            # Tidak ditemukan format, tanya user
             else:
-                selected_tool = "exiftool" if exif_available else "basic"
-        else:
-            selected_tool = tool_choice
+                prompting.set()
+                datetime_obj, apply_to_all_flag = ask_user_for_single_file(filename)
+                prompting.clear()
+                if apply_to_all_flag:
+                    apply_to_all = True
+                    batch_date = datetime_obj
+            
+            if not datetime_obj:
+                print(f"{Fore.YELLOW}  ⏭️  File di-skip{Style.RESET_ALL}")
+                skip_file(filename, file_path)
+                continue
+            
+            yield Dated([file_path], datetime_obj, patterns.get(file_path))
+    
+    # Routing engine, background writer, fallback, scheduler FFmpeg, antrian ulang,
+    # sidecar, duplikat dan waktu filesystem semuanya dikerjakan retime()
+    policy = RetimePolicy(output_folder, tool=tool_choice,
+                          exiftool_path=exiftool_path if exif_available else None,
+                          ffmpeg_path=ffmpeg_path if ffmpeg_available else None,
+                          detect_tools=False, sync_times=sync_times, layout=output_layout,
+                          snapshot=snapshot_log, progress_factory=copy_progress, log=log_scheduler)
+    for result in retime(dated_files(), policy, duplicates):
+        report(result)
+    
+    if progress is not None:
+        progress.finish()
+    if own_snapshot and snapshot_log is not None:
+        snapshot_log.close()
+    
+    if time_failed:
+        print(f"{Fore.YELLOW}⚠️  Gagal mengatur waktu file: {len(time_failed)} file{Style.RESET_ALL}")
+        if verbose:
+            for filename, error_kind, message in time_failed:
+                print(f"{Fore.YELLOW}  • {filename} ({error_kind}): {message}{Style.RESET_ALL}")
+    
+    pattern_hits = [(name, hits) for name, hits in registry.stats() if hits]
+    
+    if show_summary:
+        print(f"\n{Fore.GREEN}{'='*60}{Style.RESET_ALL}")
+        print(f"{Fore.GREEN}📊 SUMMARY PROCESSING{Style.RESET_ALL}")
+        print(f"{Fore.GREEN}{'='*60}{Style.RESET_ALL}")
+        print(f"{Fore.CYAN}Total file: {total_files}{Style.RESET_ALL}")
+        print(f"{Fore.GREEN}Berhasil diproses: {processed_count}{Style.RESET_ALL}")
+        print(f"{Fore.YELLOW}Di-skip: {skipped_count}{Style.RESET_ALL}")
         
-        # Update metadata dengan tool yang dipilih
-        success = False
+        # Tanpa --verbose kegagalan tidak dicetak per file, tampilkan ringkasannya
+        if failed_files and not verbose:
+            print(f"{Fore.RED}Gagal: {len(failed_files)} file{Style.RESET_ALL}")
+            for filename, error_kind in failed_files[:10]:
+                print(f"  • {filename} ({error_kind or ERROR_OTHER})")
+            if len(failed_files) > 10:
+                print(f"  • ... dan {len(failed_files) - 10} file lain")
         
-        if selected_tool == "exiftool" and exif_available and exiftool_path:
-            success = update_metadata_exif(exiftool_path, file_path, datetime_obj)
-            if success:
-                print(f"{Fore.GREEN}  ✅ Metadata diupdate (ExifTool){Style.RESET_ALL}")
-            else:
-                print(f"{Fore.RED}  ❌ Gagal update metadata{Style.RESET_ALL}")
+        if copy_bytes:
+            rate = format_size(copy_bytes / copy_seconds) + "/s" if copy_seconds > 0 else "-"
+            print(f"{Fore.CYAN}Disalin: {format_size(copy_bytes)} ({rate}){Style.RESET_ALL}")
         
-        elif selected_tool == "ffmpeg" and ffmpeg_available and ffmpeg_path and is_video:
-            success = update_metadata_ffmpeg(ffmpeg_path, file_path, datetime_obj, output_folder)
-            if success:
-                print(f"{Fore.GREEN}  ✅ Metadata diupdate (FFmpeg){Style.RESET_ALL}")
-            else:
-                print(f"{Fore.RED}  ❌ Gagal update metadata{Style.RESET_ALL}")
+        cache_after = extraction_cache_info()
+        cache_hits = cache_after.hits - cache_before.hits
+        cache_misses = cache_after.misses - cache_before.misses
+        if cache_hits or cache_misses:
+            print(f"{Fore.CYAN}Cache ekstraksi: {cache_hits} hit / {cache_misses} miss{Style.RESET_ALL}")
         
-        elif selected_tool == "basic":
-            success = update_timestamps_basic(file_path, datetime_obj)
-            if success:
-                print(f"{Fore.GREEN}  ✅ Timestamp file diupdate{Style.RESET_ALL}")
-            else:
-                print(f"{Fore.RED}  ❌ Gagal update timestamp{Style.RESET_ALL}")
+        if pattern_hits:
+            print(f"{Fore.CYAN}Pattern terpakai:{Style.RESET_ALL}")
+            for name, hits in pattern_hits:
+                print(f"  • {name}: {hits}")
         
-        if success:
-            # Copy ke output folder (kecuali FFmpeg yang sudah handle sendiri)
-            if selected_tool != "ffmpeg":
-                try:
-                    output_path = os.path.join(output_folder, filename)
-                    shutil.copy2(file_path, output_path)
-                    print(f"{Fore.BLUE}  📤 Disalin ke output folder{Style.RESET_ALL}")
-                except Exception as e:
-                    print(f"{Fore.YELLOW}  ⚠️  Gagal menyalin: {str(e)}{Style.RESET_ALL}")
-            processed_count += 1
-        else:
-            skipped_count += 1
+        layout_note = f" (layout {layout}, {len(output_layout.created)} folder)" if layout else ""
+        print(f"{Fore.BLUE}Output folder: {output_folder}{layout_note}{Style.RESET_ALL}")
+        if snapshot_log is not None and snapshot_log.count:
+            print(f"{Fore.BLUE}Snapshot rollback: {snapshot_log.path} ({snapshot_log.count} file){Style.RESET_ALL}")
+    
+    if events is not None:
+        events.emit('summary', input=folder_path, output=output_folder, total=total_files,
+                    processed=processed_count, skipped=skipped_count, bytes=copy_bytes,
+                    patterns=dict(pattern_hits))
+        events.flush()
     
-    # Tampilkan summary
-    print(f"\n{Fore.GREEN}{'='*60}{Style.RESET_ALL}")
-    print(f"{Fore.GREEN}📊 SUMMARY PROCESSING{Style.RESET_ALL}")
-    print(f"{Fore.GREEN}{'='*60}{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}Total file: {len(files)}{Style.RESET_ALL}")
-    print(f"{Fore.GREEN}Berhasil diproses: {processed_count}{Style.RESET_ALL}")
-    print(f"{Fore.YELLOW}Di-skip: {skipped_count}{Style.RESET_ALL}")
-    print(f"{Fore.BLUE}Output folder: {output_folder}{Style.RESET_ALL}")
+    if journal is not None:
+        journal.close()
+        report = {
+            'shard': f"{shard[0]}/{shard[1]}",
+            'host': platform.node(),
+            'input': folder_path,
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'total': total_files,
+            'processed': processed_count,
+            'skipped': skipped_count,
+            'bytes': copy_bytes,
+            'patterns': dict(pattern_hits),
+        }
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"{Fore.BLUE}Journal shard: {journal_path}{Style.RESET_ALL}")
     
-    if processed_count > 0:
+    if processed_count > 0 and show_summary:
         print(f"\n{Fore.GREEN}✅ Selesai! File sudah diupdate dengan TANGGAL dan JAM.{Style.RESET_ALL}")
         print(f"{Fore.CYAN}   File siap diupload ke Google Photos!{Style.RESET_ALL}")
     
     return processed_count
 
+def watch_folder(folder_path, output_folder, tool_choice="auto", include_existing=False,
+                 settle_seconds=None, events=None):
+    """
+    Mode daemon: pantau folder input, proses hanya file yang baru masuk.
+    File yang masih ditulis (ukuran / mtime masih berubah) ditunggu sampai
+    stabil selama settle_seconds. Tidak ada pertanyaan: file tanpa tanggal
+    di nama file di-skip (mode "unattended"). Berhenti dengan Ctrl+C.
+    Satu snapshot rollback dipakai untuk seluruh sesi, bukan satu file per batch.
+    """
+    if not os.path.isdir(folder_path):
+        print(f"{Fore.RED}❌ Folder tidak ditemukan: {folder_path}{Style.RESET_ALL}")
+        return 1
+    if settle_seconds is None:
+        settle_seconds = WATCH_SETTLE_SECONDS
+    
+    checker = ToolChecker()
+    exif_available, exiftool_path, _ = checker.check_exiftool()
+    ffmpeg_available, ffmpeg_path, _ = checker.check_ffmpeg()
+    
+    watcher = FolderWatcher(folder_path)
+    # pending: nama -> (signature terakhir, waktu signature itu pertama terlihat)
+    pending = {}
+    # done: nama -> signature setelah diproses, supaya tulisan exiftool ke file sendiri tidak memicu ulang
+    done = {}
+    
+    if include_existing:
+        pending.update((name, None) for name in watcher.existing())
+    else:
+        for name in watcher.existing():
+            done[name] = file_signature(os.path.join(folder_path, name))
+    
+    print(f"{Fore.CYAN}👀 Memantau {folder_path} ({watcher.backend}), output: {output_folder}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}   Tekan Ctrl+C untuk berhenti{Style.RESET_ALL}")
+    
+    snapshot_log = SnapshotLog(snapshot_path(output_folder)) if SNAPSHOT else None
+    try:
+        while True:
+            for name in watcher.wait(timeout=0.5):
+                pending.setdefault(name, None)
+            
+            now = time.monotonic()
+            ready = []
+            for name, state in list(pending.items()):
+                signature = file_signature(os.path.join(folder_path, name))
+                if signature is None or signature == done.get(name):
+                    # File hilang, atau perubahan dari proses kita sendiri
+                    del pending[name]
+                elif state is None or state[0] != signature:
+                    pending[name] = (signature, now)
+                elif now - state[1] >= settle_seconds and signature[0] > 0:
+                    ready.append(name)
+                    del pending[name]
+            
+            if not ready:
+                continue
+            
+            started = time.perf_counter()
+            processed = 0
+            for is_video, extensions in ((True, VIDEO_EXTENSIONS), (False, PHOTO_EXTENSIONS)):
+                names = [name for name in ready if os.path.splitext(name)[1].lower() in extensions]
+                if names:
+                    processed += process_files_with_options(
+                        folder_path, output_folder, "unattended", is_video=is_video,
+                        exiftool_path=exiftool_path, ffmpeg_path=ffmpeg_path,
+                        exif_available=exif_available, ffmpeg_available=ffmpeg_available,
+                        tool_choice=tool_choice, events=events, only=names, show_summary=False,
+                        sync_times=SYNC_FILE_TIMES, layout=OUTPUT_LAYOUT, snapshot=snapshot_log or False)
+            
+            for name in ready:
+                done[name] = file_signature(os.path.join(folder_path, name))
+            media = [name for name in ready if os.path.splitext(name)[1].lower() in MEDIA_EXTENSIONS]
+            if media:
+                elapsed = time.perf_counter() - started
+                print(f"{Fore.GREEN}⏱️  {datetime.now().strftime('%H:%M:%S')} {len(media)} file baru: "
+                      f"{processed} berhasil, {len(media) - processed} di-skip ({elapsed:.1f}s){Style.RESET_ALL}")
+    finally:
+        watcher.close()
+        if snapshot_log is not None:
+            snapshot_log.close()
+            if snapshot_log.count:
+                print(f"{Fore.BLUE}Snapshot rollback: {snapshot_log.path} ({snapshot_log.count} file){Style.RESET_ALL}")
+    return 0
+
 def main_menu():
     """Menu utama program"""
     
@@ -641,7 +960,12 @@ def process_videos_menu(exif_available, ffmpeg_available, exiftool_path, ffmpeg_
     print("    • Tanggal sama untuk semua file")
     print("    • Input tanggal satu kali")
     
-    mode_choice = input(f"\n{Fore.YELLOW}Pilih mode (1-3): {Style.RESET_ALL}").strip()
+    print("\n[4] Grouped Prompt")
+    print("    • Seperti Auto Fast")
+    print("    • File tanpa tanggal dikelompokkan per template nama file")
+    print("    • Satu pertanyaan untuk tiap kelompok")
+    
+    mode_choice = input(f"\n{Fore.YELLOW}Pilih mode (1-4): {Style.RESET_ALL}").strip()
     
     if mode_choice == "1":
         processing_mode = "auto"
@@ -649,6 +973,8 @@ def process_videos_menu(exif_available, ffmpeg_available, exiftool_path, ffmpeg_
         processing_mode = "confirm"
     elif mode_choice == "3":
         processing_mode = "batch"
+    elif mode_choice == "4":
+        processing_mode = "group"
     else:
         print(f"{Fore.RED}❌ Pilihan tidak valid!{Style.RESET_ALL}")
         return
@@ -659,8 +985,10 @@ def process_videos_menu(exif_available, ffmpeg_available, exiftool_path, ffmpeg_
     print("[2] ExifTool (cepat, metadata only)")
     print("[3] FFmpeg (lebih compatible)")
     print("[4] Basic (hanya timestamp)")
+    print("[5] Sidecar XMP (file asli tidak disentuh)")
+    print("[6] Native (MKV/WebM tanpa remux)")
     
-    tool_choice = input(f"{Fore.YELLOW}Pilih tool (1-4): {Style.RESET_ALL}").strip()
+    tool_choice = input(f"{Fore.YELLOW}Pilih tool (1-6): {Style.RESET_ALL}").strip()
     
     if tool_choice == "2" and exif_available:
         selected_tool = "exiftool"
@@ -668,14 +996,27 @@ def process_videos_menu(exif_available, ffmpeg_available, exiftool_path, ffmpeg_
         selected_tool = "ffmpeg"
     elif tool_choice == "4":
         selected_tool = "basic"
+    elif tool_choice == "5":
+        selected_tool = "sidecar"
+    elif tool_choice == "6":
+        selected_tool = "native"
     else:
         selected_tool = "auto"
     
+    dedupe = input(f"{Fore.YELLOW}Proses duplikat sekali saja? (y/n): {Style.RESET_ALL}").strip().lower() == 'y'
+    infer_undated = False
+    if processing_mode in ("auto", "confirm", "group"):
+        infer_undated = input(f"{Fore.YELLOW}Perkirakan tanggal file tanpa tanggal dari file tetangga? (y/n): {Style.RESET_ALL}").strip().lower() == 'y'
+    
     print(f"\n{Fore.YELLOW}⏳ Memproses video dengan mode {processing_mode}...{Style.RESET_ALL}")
     process_files_with_options(folder, output, processing_mode, is_video=True, 
                                exiftool_path=exiftool_path, ffmpeg_path=ffmpeg_path,
                                exif_available=exif_available, ffmpeg_available=ffmpeg_available,
-                               tool_choice=selected_tool)
+                               tool_choice=selected_tool, dedupe=dedupe,
+                               infer_undated=infer_undated, events=EVENT_WRITER,
+                               verbose=VERBOSE, shard=SHARD, sync_times=SYNC_FILE_TIMES,
+                               layout=OUTPUT_LAYOUT, snapshot=SNAPSHOT,
+                               infer_max_gap_hours=INFER_MAX_GAP)
     
     input(f"\n{Fore.YELLOW}Tekan Enter untuk kembali ke menu...{Style.RESET_ALL}")
 
@@ -698,8 +1039,9 @@ def process_photos_menu(exif_available, exiftool_path):
     print("[1] Auto Fast (rekomendasi)")
     print("[2] Confirm One-by-One")
     print("[3] Batch Same Date")
+    print("[4] Grouped Prompt (file tanpa tanggal dikelompokkan per template nama file)")
     
-    mode_choice = input(f"{Fore.YELLOW}Pilih mode (1-3): {Style.RESET_ALL}").strip()
+    mode_choice = input(f"{Fore.YELLOW}Pilih mode (1-4): {Style.RESET_ALL}").strip()
     
     if mode_choice == "1":
         processing_mode = "auto"
@@ -707,15 +1049,39 @@ def process_photos_menu(exif_available, exiftool_path):
         processing_mode = "confirm"
     elif mode_choice == "3":
         processing_mode = "batch"
+    elif mode_choice == "4":
+        processing_mode = "group"
     else:
         print(f"{Fore.RED}❌ Pilihan tidak valid!{Style.RESET_ALL}")
         return
     
+    # Pilihan tool
+    print(f"\n{Fore.CYAN}=== PILIHAN TOOL ==={Style.RESET_ALL}")
+    print("[1] Auto (rekomendasi)")
+    print("[2] Sidecar XMP (file asli tidak disentuh)")
+    
+    tool_choice = input(f"{Fore.YELLOW}Pilih tool (1-2): {Style.RESET_ALL}").strip()
+    
+    if tool_choice == "2":
+        selected_tool = "sidecar"
+    else:
+        # Auto: native (HEIC/AVIF, PNG) -> ExifTool -> basic, dipilih per file oleh select_tool
+        selected_tool = "auto"
+    
+    dedupe = input(f"{Fore.YELLOW}Proses duplikat sekali saja? (y/n): {Style.RESET_ALL}").strip().lower() == 'y'
+    infer_undated = False
+    if processing_mode in ("auto", "confirm", "group"):
+        infer_undated = input(f"{Fore.YELLOW}Perkirakan tanggal file tanpa tanggal dari file tetangga? (y/n): {Style.RESET_ALL}").strip().lower() == 'y'
+    
     print(f"\n{Fore.YELLOW}⏳ Memproses foto dengan mode {processing_mode}...{Style.RESET_ALL}")
     process_files_with_options(folder, output, processing_mode, is_video=False, 
                                exiftool_path=exiftool_path, ffmpeg_path=None,
                                exif_available=exif_available, ffmpeg_available=False,
-                               tool_choice="exiftool" if exif_available else "basic")
+                               tool_choice=selected_tool, dedupe=dedupe,
+                               infer_undated=infer_undated, events=EVENT_WRITER,
+                               verbose=VERBOSE, shard=SHARD, sync_times=SYNC_FILE_TIMES,
+                               layout=OUTPUT_LAYOUT, snapshot=SNAPSHOT,
+                               infer_max_gap_hours=INFER_MAX_GAP)
     
     input(f"\n{Fore.YELLOW}Tekan Enter untuk kembali ke menu...{Style.RESET_ALL}")
 
@@ -727,9 +1093,10 @@ def settings_menu(exif_available, ffmpeg_available, exiftool_path, ffmpeg_path):
         print("[2] Test FFmpeg")
         print("[3] Test Smart Extraction")
         print("[4] Info Format yang Didukung")
-        print("[5] Kembali ke Menu Utama")
+        print("[5] Pattern Registry (reload & statistik)")
+        print("[6] Kembali ke Menu Utama")
         
-        choice = input(f"{Fore.YELLOW}Pilih (1-5): {Style.RESET_ALL}").strip()
+        choice = input(f"{Fore.YELLOW}Pilih (1-6): {Style.RESET_ALL}").strip()
         
         if choice == "1":
             test_exiftool(exif_available, exiftool_path)
@@ -740,6 +1107,8 @@ def settings_menu(exif_available, ffmpeg_available, exiftool_path, ffmpeg_path):
         elif choice == "4":
             show_format_info()
         elif choice == "5":
+            show_pattern_registry()
+        elif choice == "6":
             break
         else:
             print(f"{Fore.RED}❌ Pilihan tidak valid!{Style.RESET_ALL}")
@@ -754,6 +1123,8 @@ def test_smart_extraction():
         "lv_0_20231225143045.mp4",  # Prefix aneh
         "holiday_20231225_143045(1).mp4",  # Suffix
         "IMG-20231225-WA143045.jpg",  # WhatsApp
+        "signal-2023-12-25-143045.jpg",  # Signal
+        "1703514645123.mp4",  # Unix epoch milidetik
         "my_photo_20231225.jpg",  # Hanya tanggal
     ]
     
@@ -771,6 +1142,43 @@ def test_smart_extraction():
     
     input(f"\n{Fore.YELLOW}Tekan Enter...{Style.RESET_ALL}")
 
+def show_pattern_registry():
+    """Reload pattern dari config dan tampilkan daftar + statistik hit"""
+    print(f"\n{Fore.CYAN}=== PATTERN REGISTRY ==={Style.RESET_ALL}")
+    
+    try:
+        # Statistik diambil sebelum reload, karena registry baru mulai dari nol hit
+        last_hits = [(name, hits) for name, hits in get_pattern_registry().stats() if hits]
+        registry = reload_pattern_registry()
+        profiles = reload_exif_profiles()
+    except (OSError, ValueError, KeyError, re.error) as e:
+        print(f"{Fore.RED}❌ Config pattern tidak valid: {str(e)}{Style.RESET_ALL}")
+        input(f"\n{Fore.YELLOW}Tekan Enter...{Style.RESET_ALL}")
+        return
+    
+    if os.path.isfile(PATTERN_CONFIG_FILE):
+        print(f"{Fore.GREEN}✅ Config dimuat: {PATTERN_CONFIG_FILE}{Style.RESET_ALL}")
+    else:
+        print(f"{Fore.YELLOW}⚠️  Config tidak ada, hanya pattern bawaan: {PATTERN_CONFIG_FILE}{Style.RESET_ALL}")
+    
+    # Urutan prioritas: pattern di atas dicoba lebih dulu
+    for entry in registry.entries:
+        kind = "tanggal+jam" if entry['has_time'] else "tanggal"
+        print(f"• {entry['name']} ({kind}): {entry['regex'].pattern}")
+    
+    print(f"\n{Fore.CYAN}Hit pattern di run terakhir:{Style.RESET_ALL}")
+    if last_hits:
+        for name, hits in last_hits:
+            print(f"• {name}: {hits}")
+    else:
+        print("• belum ada file yang diproses")
+    
+    print(f"\n{Fore.CYAN}Tag ExifTool per profil:{Style.RESET_ALL}")
+    for name, tags in list(profiles.profiles.items()) + list(profiles.formats.items()):
+        print(f"• {name}: {', '.join(tags)}")
+    
+    input(f"\n{Fore.YELLOW}Tekan Enter...{Style.RESET_ALL}")
+
 def test_exiftool(exif_available, exiftool_path):
     """Test ExifTool"""
     print(f"\n{Fore.CYAN}=== TEST EXIFTOOL ==={Style.RESET_ALL}")
@@ -823,6 +1231,9 @@ def show_format_info():
     print("• holiday_20231225_143045(1).mp4 (ada suffix)")
     print("• IMG-20231225-WA143045.jpg (WhatsApp)")
     print("• 20231225_143045_backup.png")
+    print("• signal-2023-12-25-143045.jpg (Signal)")
+    print("• 1703514645123.mp4 / FB_IMG_1703514645123.jpg (Unix epoch ms)")
+    print("• 1703514645.mp4 (Unix epoch detik)")
     
     print(f"\n{Fore.YELLOW}⚡ MODE AUTO FAST:{Style.RESET_ALL}")
     print("• Program otomatis ekstrak tanggal dari nama file")
@@ -840,9 +1251,139 @@ def show_format_info():
     print("• Input tanggal satu kali")
     print("• Cocok untuk file tanpa format tanggal")
     
+    print(f"\n{Fore.YELLOW}🗂️  MODE GROUPED PROMPT:{Style.RESET_ALL}")
+    print("• Seperti mode auto")
+    print("• File tanpa tanggal dikelompokkan per template nama file")
+    print("• Satu pertanyaan dan satu batch ExifTool per kelompok")
+    
     input(f"\n{Fore.YELLOW}Tekan Enter...{Style.RESET_ALL}")
 
+def parse_args(argv=None):
+    """Argumen command line"""
+    parser = argparse.ArgumentParser(description="MetaTimeChanger v2.0")
+    parser.add_argument("--jsonl", metavar="PATH",
+                        help="Tulis hasil per file sebagai event JSONL ke PATH ('-' = stdout), warna dimatikan")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="Tampilkan detail tiap file (default: satu baris progress)")
+    parser.add_argument("--progress-rate", type=float, default=PROGRESS_REFRESH_RATE, metavar="N",
+                        help=f"Refresh baris progress maksimal N kali per detik (default {PROGRESS_REFRESH_RATE})")
+    parser.add_argument("--shard", type=parse_shard, metavar="i/N",
+                        help="Hanya proses shard i dari N (untuk dibagi ke beberapa mesin)")
+    parser.add_argument("--no-file-times", action="store_true",
+                        help="Jangan ubah atime/mtime file output (hanya tag di dalam file yang ditulis)")
+    parser.add_argument("--layout", type=OutputLayout.validate, metavar="POLA",
+                        help="Subfolder output dari tanggal, mis. '{Y}/{m}/{d}' atau '{Y}-{m}' (default: flat)")
+    parser.add_argument("--no-snapshot", action="store_true",
+                        help="Jangan catat waktu & tag asli sebelum ExifTool menimpa file (tanpa rollback)")
+    parser.add_argument("--min-year", type=int, metavar="TAHUN",
+                        help="Tahun paling awal yang diterima dari nama file (default 1900)")
+    parser.add_argument("--infer-max-gap", type=float, metavar="JAM",
+                        help=f"Jarak maksimal dua file tetangga untuk inferensi tanggal (default {INFER_MAX_GAP_HOURS} jam)")
+    
+    commands = parser.add_subparsers(dest="command")
+    merge_parser = commands.add_parser("merge", help="Gabungkan journal & report semua shard")
+    merge_parser.add_argument("output", help="Output folder yang dipakai bersama semua shard")
+    
+    rollback_parser = commands.add_parser("rollback", help="Kembalikan waktu & tag asli file dari snapshot run")
+    rollback_parser.add_argument("output", help="Output folder run yang di-rollback")
+    rollback_parser.add_argument("--snapshot", metavar="PATH",
+                                 help="File snapshot tertentu (default: snapshot run terakhir)")
+    
+    watch_parser = commands.add_parser("watch", help="Pantau folder dan proses file yang baru masuk")
+    watch_parser.add_argument("input", help="Folder yang dipantau (folder upload)")
+    watch_parser.add_argument("output", help="Output folder")
+    watch_parser.add_argument("--tool", default="auto", choices=["auto", "exiftool", "ffmpeg", "basic", "sidecar", "native"],
+                              help="Tool untuk update metadata (default auto)")
+    watch_parser.add_argument("--include-existing", action="store_true",
+                              help="Proses juga file yang sudah ada saat mulai")
+    watch_parser.add_argument("--settle", type=float, default=WATCH_SETTLE_SECONDS, metavar="DETIK",
+                              help=f"File dianggap selesai ditulis jika tidak berubah selama DETIK (default {WATCH_SETTLE_SECONDS})")
+    return parser.parse_args(argv)
+
+def run_merge(output_folder):
+    """Command merge: gabungkan hasil semua shard dan tampilkan ringkasannya"""
+    try:
+        merged = merge_shards(output_folder)
+    except (OSError, ValueError) as e:
+        print(f"{Fore.RED}❌ Gagal menggabungkan shard: {str(e)}{Style.RESET_ALL}")
+        return 1
+    
+    if not merged['shards']:
+        print(f"{Fore.YELLOW}⚠️  Tidak ada journal shard di {output_folder}{Style.RESET_ALL}")
+        return 1
+    
+    print(f"{Fore.GREEN}📊 Gabungan {merged['shards']} shard{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}Total file: {merged['total']}{Style.RESET_ALL}")
+    print(f"{Fore.GREEN}Berhasil diproses: {merged['processed']}{Style.RESET_ALL}")
+    print(f"{Fore.YELLOW}Di-skip: {merged['skipped']}{Style.RESET_ALL}")
+    if merged['missing_shards']:
+        missing = ", ".join(str(index) for index in merged['missing_shards'])
+        print(f"{Fore.RED}⚠️  Shard belum selesai: {missing}{Style.RESET_ALL}")
+    print(f"{Fore.BLUE}Hasil: {os.path.join(output_folder, SHARD_DIR_NAME)}{Style.RESET_ALL}")
+    return 0
+
+def run_rollback(output_folder, snapshot=None):
+    """Command rollback: kembalikan file dari snapshot run terakhir (atau `snapshot`)"""
+    if snapshot is None:
+        snapshots = find_snapshots(output_folder)
+        if not snapshots:
+            print(f"{Fore.YELLOW}⚠️  Tidak ada snapshot yang bisa di-rollback di {output_folder}{Style.RESET_ALL}")
+            return 1
+        snapshot = snapshots[-1]
+    
+    print(f"{Fore.CYAN}⏪ Rollback dari {snapshot}...{Style.RESET_ALL}")
+    started = time.perf_counter()
+    try:
+        summary = rollback_snapshot(snapshot)
+    except (OSError, ValueError) as e:
+        print(f"{Fore.RED}❌ Gagal rollback: {str(e)}{Style.RESET_ALL}")
+        return 1
+    
+    print(f"{Fore.GREEN}📊 {summary['files']} file dikembalikan dalam {format_duration(time.perf_counter() - started)}{Style.RESET_ALL}")
+    print(f"{Fore.GREEN}Tag tanggal: {summary['tags_restored']} file{Style.RESET_ALL}")
+    failures = [(path, "tag") for path in summary['tags_failed']]
+    failures += [(path, error_kind) for path, error_kind, _ in summary['times_failed']]
+    if failures:
+        print(f"{Fore.RED}Gagal: {len(failures)} file{Style.RESET_ALL}")
+        for path, error_kind in failures[:10]:
+            print(f"  • {os.path.basename(path)} ({error_kind})")
+        if len(failures) > 10:
+            print(f"  • ... dan {len(failures) - 10} file lain")
+    print(f"{Fore.BLUE}Snapshot: {summary['snapshot']}{Style.RESET_ALL}")
+    return 1 if failures else 0
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "merge":
+        sys.exit(run_merge(args.output))
+    if args.command == "rollback":
+        sys.exit(run_rollback(args.output, args.snapshot))
+    
+    VERBOSE = args.verbose
+    SHARD = args.shard
+    SYNC_FILE_TIMES = not args.no_file_times
+    OUTPUT_LAYOUT = args.layout
+    SNAPSHOT = not args.no_snapshot
+    PROGRESS_REFRESH_RATE = args.progress_rate
+    set_date_year_bounds(min_year=args.min_year)
+    INFER_MAX_GAP = args.infer_max_gap
+    if args.jsonl:
+        disable_colors()
+        EVENT_WRITER = EventWriter(args.jsonl)
+    
+    if args.command == "watch":
+        exit_code = 0
+        try:
+            exit_code = watch_folder(args.input, args.output, tool_choice=args.tool,
+                         include_existing=args.include_existing,
+                         settle_seconds=args.settle, events=EVENT_WRITER)
+        except KeyboardInterrupt:
+            print(f"\n{Fore.YELLOW}⚠️  Watch dihentikan{Style.RESET_ALL}")
+        finally:
+            if EVENT_WRITER is not None:
+                EVENT_WRITER.close()
+        sys.exit(exit_code)
+    
     try:
         print(f"{Fore.CYAN}🚀 Memulai MetaTimeChanger v2.0...{Style.RESET_ALL}")
         print(f"{Fore.CYAN}   (Multiple Processing Modes){Style.RESET_ALL}")
@@ -855,3 +1396,6 @@ if __name__ == "__main__":
         import traceback
         traceback.print_exc()
         input(f"\n{Fore.YELLOW}Press Enter to exit...{Style.RESET_ALL}")
+    finally:
+        if EVENT_WRITER is not None:
+            EVENT_WRITER.close()
@@ -0,0 +1,40 @@
+"""
+MetaTimeChanger sebagai library.
+
+Import package ini tidak menjalankan apa pun (tanpa colorama, tanpa cek tool,
+tanpa baca config); semua kerja baru terjadi saat fungsi dipanggil.
+
+    from metatimechanger import retime, RetimePolicy
+
+    for result in retime(paths, RetimePolicy("output", tool="exiftool")):
+        print(result.path, result.status)
+"""
+
+from .extraction import (PatternRegistry, get_pattern_registry, infer_undated_datetimes,
+                         reload_pattern_registry, smart_extract_datetime,
+                         smart_extract_datetime_detail)
+from .engines import ExifTagProfiles, ToolChecker, classify_tool_error, get_exif_profiles, select_tool
+from .scanner import PHOTO_EXTENSIONS, VIDEO_EXTENSIONS, scan_folder, sniff_file_type
+from .pipeline import Dated, Result, RetimePolicy, retime
+
+__all__ = [
+    'PatternRegistry',
+    'get_pattern_registry',
+    'infer_undated_datetimes',
+    'reload_pattern_registry',
+    'smart_extract_datetime',
+    'smart_extract_datetime_detail',
+    'ExifTagProfiles',
+    'ToolChecker',
+    'classify_tool_error',
+    'get_exif_profiles',
+    'select_tool',
+    'PHOTO_EXTENSIONS',
+    'VIDEO_EXTENSIONS',
+    'scan_folder',
+    'sniff_file_type',
+    'Dated',
+    'Result',
+    'RetimePolicy',
+    'retime',
+]
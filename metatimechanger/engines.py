@@ -0,0 +1,973 @@
+"""Engine penulis metadata: ExifTool, FFmpeg, timestamp basic, sidecar XMP, copy & dedupe."""
+
+import os
+import re
+import json
+import errno
+import subprocess
+import shutil
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .extraction import PATTERN_CONFIG_FILE
+from .native import NATIVE_FORMATS, NativePatchError, apply_patches, plan_native_patch, write_with_inserts
+from .scanner import (VIDEO_EXTENSIONS, PHOTO_EXTENSIONS, VIDEO_FORMATS, PHOTO_FORMATS,
+                      extension_matches)
+
+# xxhash opsional (lebih cepat), fallback ke blake2b bawaan Python
+try:
+    import xxhash
+except ModuleNotFoundError:
+    xxhash = None
+
+class ToolChecker:
+    """Kelas untuk cek ketersediaan ExifTool dan FFmpeg"""
+    
+    @staticmethod
+    def check_exiftool():
+        """Cek ExifTool"""
+        try:
+            exiftool_path = shutil.which('exiftool') or shutil.which('exiftool.exe')
+            if exiftool_path:
+                result = subprocess.run([exiftool_path, '-ver'], 
+                                      capture_output=True, text=True, timeout=5)
+                if result.returncode == 0:
+                    return True, exiftool_path, result.stdout.strip()
+            return False, None, None
+        except:
+            return False, None, None
+    
+    @staticmethod
+    def check_ffmpeg():
+        """Cek FFmpeg"""
+        try:
+            ffmpeg_path = shutil.which('ffmpeg') or shutil.which('ffmpeg.exe')
+            if ffmpeg_path:
+                result = subprocess.run([ffmpeg_path, '-version'], 
+                                      capture_output=True, text=True, timeout=5)
+                if result.returncode == 0:
+                    lines = result.stdout.split('\n')
+                    version_line = lines[0] if lines else ""
+                    return True, ffmpeg_path, version_line[:50]
+            return False, None, None
+        except:
+            return False, None, None
+
+# Jenis error tool; locked & timeout bersifat sementara dan layak diulang
+ERROR_LOCKED = "locked"
+ERROR_TIMEOUT = "timeout"
+ERROR_UNSUPPORTED = "unsupported"
+ERROR_DISK_FULL = "disk_full"
+ERROR_OTHER = "other"
+TRANSIENT_ERRORS = frozenset({ERROR_LOCKED, ERROR_TIMEOUT})
+
+_LOCKED_ERRNOS = frozenset({errno.EBUSY, errno.EAGAIN, errno.ETXTBSY, errno.EDEADLK})
+_DISK_FULL_ERRNOS = frozenset({errno.ENOSPC, getattr(errno, 'EDQUOT', errno.ENOSPC)})
+# Windows: ERROR_SHARING_VIOLATION, ERROR_LOCK_VIOLATION / ERROR_HANDLE_DISK_FULL, ERROR_DISK_FULL
+_LOCKED_WINERRORS = frozenset({32, 33})
+_DISK_FULL_WINERRORS = frozenset({39, 112})
+
+# Potongan pesan stderr exiftool/ffmpeg/OS per jenis error (dicek berurutan)
+_ERROR_MARKERS = (
+    (ERROR_DISK_FULL, ('no space left', 'disk full', 'not enough space', 'quota exceeded')),
+    (ERROR_LOCKED, ('being used by another process', 'sharing violation', 'lock violation',
+                    'resource temporarily unavailable', 'device or resource busy',
+                    'text file busy', 'error renaming temporary file')),
+    (ERROR_UNSUPPORTED, ('not supported', 'unsupported', 'unknown file type',
+                         'invalid data found', 'could not find tag', 'not a valid')),
+)
+
+# Retry inline untuk error sementara: jeda RETRY_BASE_DELAY * 2^n, maksimal RETRY_MAX_DELAY
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+# Jeda sebelum antrian ulang di akhir proses dijalankan
+RETRY_QUEUE_DELAY = 5.0
+
+def classify_tool_error(message=None, exc=None):
+    """
+    Tentukan jenis error dari exception dan/atau stderr tool.
+    Return salah satu ERROR_LOCKED, ERROR_TIMEOUT, ERROR_UNSUPPORTED, ERROR_DISK_FULL, ERROR_OTHER.
+    """
+    if isinstance(exc, subprocess.TimeoutExpired):
+        return ERROR_TIMEOUT
+    if isinstance(exc, OSError):
+        if exc.errno in _DISK_FULL_ERRNOS or getattr(exc, 'winerror', None) in _DISK_FULL_WINERRORS:
+            return ERROR_DISK_FULL
+        if exc.errno in _LOCKED_ERRNOS or getattr(exc, 'winerror', None) in _LOCKED_WINERRORS:
+            return ERROR_LOCKED
+    
+    text = (message or (str(exc) if exc is not None else "")).lower()
+    for kind, markers in _ERROR_MARKERS:
+        if any(marker in text for marker in markers):
+            return kind
+    return ERROR_OTHER
+
+def _error_summary(stderr):
+    """Baris error terakhir dari stderr tool (untuk log), maksimal 200 karakter"""
+    lines = [line.strip() for line in (stderr or "").splitlines() if line.strip()]
+    return lines[-1][:200] if lines else ""
+
+def call_with_retry(func, *args, attempts=None, **kwargs):
+    """
+    Panggil engine yang return (success, error_kind, message).
+    Error sementara (TRANSIENT_ERRORS) diulang dengan exponential backoff,
+    error lain langsung dikembalikan.
+    """
+    if attempts is None:
+        attempts = RETRY_ATTEMPTS
+    for attempt in range(attempts):
+        success, error_kind, message = func(*args, **kwargs)
+        if success or error_kind not in TRANSIENT_ERRORS or attempt == attempts - 1:
+            return success, error_kind, message
+        time.sleep(min(RETRY_BASE_DELAY * (2 ** attempt), RETRY_MAX_DELAY))
+
+def update_metadata_exif(exiftool_path, file_path, new_datetime, file_format=None):
+    """
+    Mengubah metadata EXIF menggunakan exiftool dengan TANGGAL dan JAM.
+    Return (success, error_kind, pesan error).
+    """
+    return update_metadata_exif_many(exiftool_path, [file_path], new_datetime, file_format)
+
+# Tag tanggal yang ditulis ExifTool per profil file.
+# Bisa diganti lewat key "exif_profiles" di file config pattern, mis.
+# {"exif_profiles": {"video": ["CreateDate", "MediaCreateDate"], "formats": {".png": ["CreationTime"]}}}
+DEFAULT_EXIF_PROFILES = {
+    'video': ['CreateDate', 'ModifyDate', 'MediaCreateDate', 'MediaModifyDate',
+              'TrackCreateDate', 'TrackModifyDate', 'DateTimeOriginal'],
+    'photo': ['AllDates', 'DateTimeOriginal', 'CreateDate', 'ModifyDate'],
+    'other': ['AllDates', 'DateTimeOriginal'],
+}
+
+# Shortcut ExifTool "AllDates"
+EXIF_ALL_DATES = ('DateTimeOriginal', 'CreateDate', 'ModifyDate')
+
+class ExifTagProfiles:
+    """
+    Template argumen ExifTool per ekstensi, dibangun sekali per run.
+    Per file hanya string tanggal yang ditempel ke prefix "-Tag=" yang sudah jadi.
+    Hanya tag di dalam file yang ditulis; waktu filesystem diatur set_file_times.
+    """
+    
+    def __init__(self, profiles=None, formats=None):
+        self.profiles = dict(DEFAULT_EXIF_PROFILES)
+        self.profiles.update(profiles or {})
+        # Override per ekstensi (".png": [...]) mengalahkan profil video/photo/other
+        self.formats = {ext.lower(): tags for ext, tags in (formats or {}).items()}
+        self.templates = {}
+    
+    @classmethod
+    def from_config(cls, config_path=PATTERN_CONFIG_FILE):
+        """Profil bawaan + key "exif_profiles" dari file config JSON (jika ada)"""
+        config = {}
+        if config_path and os.path.isfile(config_path):
+            with open(config_path, encoding='utf-8') as f:
+                config = json.load(f).get('exif_profiles', {})
+        formats = config.pop('formats', {})
+        return cls(config, formats)
+    
+    def profile_name(self, ext, file_format=None):
+        """Override ekstensi, lalu profil dari jenis file asli (jika diketahui), lalu dari ekstensi"""
+        if ext in self.formats:
+            return ext
+        if file_format in VIDEO_FORMATS or (file_format is None and ext in VIDEO_EXTENSIONS):
+            return 'video'
+        if file_format in PHOTO_FORMATS or (file_format is None and ext in PHOTO_EXTENSIONS):
+            return 'photo'
+        return 'other'
+    
+    def template(self, ext, file_format=None):
+        """Tuple prefix "-Tag=" untuk ekstensi + jenis file ini, di-cache"""
+        key = (ext, file_format)
+        template = self.templates.get(key)
+        if template is None:
+            name = self.profile_name(ext, file_format)
+            tags = self.formats[ext] if name == ext else self.profiles[name]
+            template = tuple(f'-{tag}=' for tag in tags)
+            self.templates[key] = template
+        return template
+    
+    def tag_names(self, ext, file_format=None):
+        """Nama tag yang ikut ditulis (AllDates dipecah jadi tag aslinya), untuk snapshot"""
+        names = []
+        for prefix in self.template(ext, file_format):
+            tag = prefix[1:-1]
+            for name in (EXIF_ALL_DATES if tag.lower() == 'alldates' else (tag,)):
+                if name not in names:
+                    names.append(name)
+        return names
+    
+    def arguments(self, ext, date_str, file_paths, file_format=None):
+        """
+        Argumen satu panggilan exiftool, untuk dikirim lewat stdin (-@ -)
+        (-P: mtime file tidak diubah ExifTool)
+        """
+        arguments = ['-charset', 'filename=utf8', '-overwrite_original', '-P']
+        arguments.extend([prefix + date_str for prefix in self.template(ext, file_format)])
+        arguments.extend(file_paths)
+        return arguments
+
+_exif_profiles = None
+
+def get_exif_profiles():
+    """Profil tag ExifTool aktif (dimuat dari config saat pertama dipakai)"""
+    global _exif_profiles
+    if _exif_profiles is None:
+        _exif_profiles = ExifTagProfiles.from_config()
+    return _exif_profiles
+
+def reload_exif_profiles(config_path=PATTERN_CONFIG_FILE):
+    """Muat ulang profil dari config (mis. setelah file config diubah)"""
+    global _exif_profiles
+    _exif_profiles = ExifTagProfiles.from_config(config_path)
+    return _exif_profiles
+
+def update_metadata_exif_many(exiftool_path, file_paths, new_datetime, file_format=None):
+    """
+    Satu panggilan exiftool untuk banyak file dengan tanggal yang sama.
+    Semua file harus berjenis & berekstensi sama: profil tag dipilih dari
+    file_format (hasil sniff_file_type, None = dari ekstensi) dan ekstensi file pertama.
+    Daftar file dikirim lewat stdin (-@ -), bukan argv, supaya ratusan file tidak
+    melewati batas command line (~32K karakter di Windows).
+    Return (success, error_kind, pesan error).
+    """
+    try:
+        date_str = new_datetime.strftime("%Y:%m:%d %H:%M:%S")
+        ext = os.path.splitext(file_paths[0])[1].lower()
+        arguments = get_exif_profiles().arguments(ext, date_str, file_paths, file_format)
+        
+        timeout = 30 + 2 * (len(file_paths) - 1)
+        result = subprocess.run([exiftool_path, '-@', '-'], input='\n'.join(arguments) + '\n',
+                                capture_output=True, text=True, encoding='utf-8',
+                                errors='surrogateescape', timeout=timeout)
+        
+        if result.returncode == 0:
+            return True, None, None
+        else:
+            return False, classify_tool_error(result.stderr), _error_summary(result.stderr)
+            
+    except (OSError, subprocess.SubprocessError) as e:
+        return False, classify_tool_error(exc=e), str(e)
+
+def _path_key(path):
+    return os.path.normcase(os.path.normpath(path))
+
+def read_exif_dates(exiftool_path, file_paths, tags):
+    """
+    Baca nilai tag tanggal saat ini dengan satu panggilan exiftool -j.
+    Argumen dikirim lewat stdin (-@ -) supaya daftar file panjang tidak
+    melewati batas command line.
+    Return {file_path: {tag: nilai atau None jika tag tidak ada}};
+    file yang tidak terbaca tidak ada di hasil.
+    """
+    lines = ['-charset', 'filename=utf8', '-j', '-s'] + [f'-{tag}' for tag in tags] + list(file_paths)
+    command = [exiftool_path, '-@', '-']
+    try:
+        timeout = 30 + (len(file_paths) - 1)
+        result = subprocess.run(command, input='\n'.join(lines) + '\n', capture_output=True, text=True,
+                                encoding='utf-8', errors='surrogateescape', timeout=timeout)
+        items = json.loads(result.stdout or '[]')
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return {}
+    
+    # Key JSON tanpa prefix grup ("PNG:CreationTime" -> "CreationTime")
+    keys = [(tag, tag.rsplit(':', 1)[-1]) for tag in tags]
+    # ExifTool di Windows mengembalikan SourceFile dengan "/", jadi path dinormalisasi
+    dates = {}
+    for item in items:
+        dates[_path_key(item.get('SourceFile', ''))] = {tag: None if key not in item else str(item[key])
+                                         for tag, key in keys}
+    return dates
+
+def snapshot_originals(snapshot, exiftool_path, groups):
+    """
+    Catat atime/mtime dan tag tanggal asli file ke SnapshotLog sebelum ExifTool
+    menimpanya in-place.
+    groups: list (file_paths, file_format) per job ExifTool; tag semua job dibaca
+    dengan satu panggilan exiftool, tiap file hanya menyimpan tag profilnya sendiri.
+    File yang sudah tercatat di snapshot tidak dibaca ulang.
+    Return list path yang tag aslinya tidak terbaca (mis. exiftool timeout): file
+    itu tidak dicatat dan tidak boleh ditimpa, karena tanggalnya tidak bisa di-rollback.
+    """
+    profiles = get_exif_profiles()
+    file_tags = {}
+    for file_paths, file_format in groups:
+        paths = [path for path in file_paths if not snapshot.is_recorded(path)]
+        if paths:
+            tags = profiles.tag_names(os.path.splitext(paths[0])[1].lower(), file_format)
+            file_tags.update((path, tags) for path in paths)
+    if not file_tags:
+        return []
+    
+    all_tags = list(dict.fromkeys(tag for tags in file_tags.values() for tag in tags))
+    dates = read_exif_dates(exiftool_path, list(file_tags), all_tags)
+    entries = []
+    unread = []
+    for path, tags in file_tags.items():
+        values = dates.get(_path_key(path))
+        try:
+            stat = os.stat(path)
+        except OSError:
+            values = None
+        if values is None:
+            unread.append(path)
+            continue
+        entries.append((path, stat.st_atime_ns, stat.st_mtime_ns, {tag: values[tag] for tag in tags}))
+    snapshot.record(entries)
+    return unread
+
+# Marker -echo3 per blok rollback dan ringkasan hasil exiftool per blok
+_RESTORE_MARKER = '@@mtc-restored '
+_RESTORE_SUMMARY_RE = re.compile(r'(\d+) image files (?:updated|unchanged)$')
+
+def restore_exif_tags(exiftool_path, entries):
+    """
+    Rollback tag tanggal: satu proses exiftool untuk semua file. Argumen dikirim
+    lewat stdin (-@ -), satu blok -execute per file karena nilai aslinya berbeda-beda.
+    entries: list (path, {tag: nilai asli atau None = hapus tag}).
+    Return (jumlah berhasil, list path yang gagal).
+    """
+    if not entries:
+        return 0, []
+    lines = []
+    for index, (path, tags) in enumerate(entries):
+        if index:
+            lines.append('-execute')
+        # Opsi tidak terbawa melewati -execute, jadi charset nama file diulang per blok
+        lines += ['-charset', 'filename=utf8', '-overwrite_original', '-P']
+        lines += [f'-{tag}={value or ""}' for tag, value in tags.items()]
+        lines += [path, '-echo3', f'{_RESTORE_MARKER}{index}']
+    
+    command = [exiftool_path, '-@', '-']
+    try:
+        result = subprocess.run(command, input='\n'.join(lines) + '\n', capture_output=True,
+                                text=True, encoding='utf-8', errors='surrogateescape')
+    except (OSError, subprocess.SubprocessError):
+        return 0, [path for path, _ in entries]
+    
+    # Tiap blok: ringkasan "N image files updated" lalu marker dari -echo3
+    updated = set()
+    block_updated = False
+    for line in result.stdout.splitlines():
+        line = line.strip()
+        if line.startswith(_RESTORE_MARKER):
+            if block_updated:
+                updated.add(int(line[len(_RESTORE_MARKER):]))
+            block_updated = False
+        else:
+            match = _RESTORE_SUMMARY_RE.match(line)
+            if match and int(match.group(1)):
+                block_updated = True
+    failed = [path for index, (path, _) in enumerate(entries) if index not in updated]
+    return len(updated), failed
+
+def update_metadata_ffmpeg(ffmpeg_path, file_path, new_datetime, output_file, timeout=60):
+    """
+    Update metadata video dengan FFmpeg, hasil remux ditulis ke output_file.
+    Return (success, error_kind, pesan error).
+    """
+    temp_file = None
+    try:
+        date_str = new_datetime.strftime("%Y-%m-%d %H:%M:%S")
+        temp_file = os.path.join(os.path.dirname(output_file), f"temp_{os.path.basename(output_file)}")
+        
+        command = [
+            ffmpeg_path,
+            '-i', file_path,
+            '-metadata', f'creation_time={date_str}',
+            '-metadata', f'date={date_str}',
+            '-metadata', f'creation_date={date_str}',
+            '-movflags', 'use_metadata_tags',
+            '-c', 'copy',
+            '-y',
+            temp_file
+        ]
+        
+        result = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+        
+        if result.returncode == 0:
+            if os.path.exists(temp_file) and os.path.getsize(temp_file) > 0:
+                # os.replace menimpa output lama tanpa cek exists terpisah
+                os.replace(temp_file, output_file)
+                return True, None, None
+            else:
+                return False, ERROR_OTHER, "output FFmpeg kosong"
+        else:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            return False, classify_tool_error(result.stderr), _error_summary(result.stderr)
+            
+    except (OSError, subprocess.SubprocessError) as e:
+        # Timeout meninggalkan file temp setengah jadi
+        if temp_file and os.path.exists(temp_file):
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+        return False, classify_tool_error(exc=e), str(e)
+
+def plan_metadata_native(file_path, new_datetime, file_format):
+    """
+    Rencana tulis tanggal native (tanpa ExifTool/FFmpeg) dari file asli berjenis
+    file_format (hasil sniff_file_type).
+    Hanya header yang dibaca; rencana ditulis ke salinan di output oleh write_files_metadata.
+    Return (NativePlan atau None, error_kind, pesan error).
+    """
+    try:
+        return plan_native_patch(file_path, file_format, new_datetime), None, None
+    except NativePatchError as e:
+        return None, ERROR_UNSUPPORTED, str(e)
+    except OSError as e:
+        return None, classify_tool_error(exc=e), str(e)
+
+def measure_disk_throughput(file_paths, sample_bytes=64 * 1024 * 1024):
+    """
+    Ukur kecepatan baca disk (bytes/detik) dari file terbesar.
+    Cache OS dibuang dulu (jika bisa) supaya yang terukur adalah disk, bukan RAM.
+    """
+    try:
+        sample_path = max(file_paths, key=os.path.getsize)
+        fd = os.open(sample_path, os.O_RDONLY)
+    except (OSError, ValueError):
+        return None
+    
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        
+        total = 0
+        start = time.perf_counter()
+        while total < sample_bytes:
+            chunk = os.read(fd, 4 * 1024 * 1024)
+            if not chunk:
+                break
+            total += len(chunk)
+        elapsed = time.perf_counter() - start
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+    
+    # Sampel terlalu kecil tidak bisa dipercaya
+    if total < 8 * 1024 * 1024 or elapsed <= 0:
+        return None
+    return total / elapsed
+
+def ffmpeg_concurrency_for(throughput):
+    """Jumlah job FFmpeg paralel berdasarkan kecepatan disk"""
+    if throughput is None or throughput < 200 * 1024 * 1024:
+        # HDD / network share: job paralel hanya bikin seek bolak-balik
+        return 1
+    if throughput < 1000 * 1024 * 1024:
+        # SATA SSD
+        return 2
+    # NVMe
+    return max(2, min(4, os.cpu_count() or 1))
+
+def ffmpeg_timeout_for(size_bytes, throughput):
+    """Timeout FFmpeg sesuai ukuran file (remux = baca + tulis seluruh file)"""
+    # Asumsi konservatif jika throughput tidak terukur: 50 MB/s
+    rate = throughput or 50 * 1024 * 1024
+    return 60 + int(3 * size_bytes / rate)
+
+def run_ffmpeg_jobs(ffmpeg_path, jobs, output_folder, log=None, layout=None):
+    """
+    Jalankan banyak remux FFmpeg dengan scheduler.
+    - Jumlah job paralel dari kecepatan disk yang terukur
+    - Timeout per file sesuai ukuran
+    - File terbesar dijalankan duluan supaya tidak jadi ekor yang lama
+    - Error sementara (file terkunci, timeout) diulang dengan backoff
+    jobs: list (filename, file_path, datetime).
+    log(pesan): callback opsional untuk info scheduler.
+    layout: OutputLayout (default: flat di output_folder).
+    Return list (filename, success, detik, error_kind, pesan error).
+    """
+    if layout is None:
+        layout = OutputLayout(output_folder)
+    sized_jobs = []
+    for filename, file_path, new_datetime in jobs:
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            size = 0
+        sized_jobs.append((size, filename, file_path, new_datetime))
+    sized_jobs.sort(key=lambda job: job[0], reverse=True)
+    
+    throughput = measure_disk_throughput([job[2] for job in sized_jobs])
+    workers = min(ffmpeg_concurrency_for(throughput), len(sized_jobs))
+    
+    if log is not None:
+        speed = f"~{throughput / (1024 * 1024):.0f} MB/s" if throughput else "tidak terukur"
+        log(f"FFmpeg scheduler: {len(sized_jobs)} file, {workers} paralel (disk {speed})")
+    
+    def run_job(job):
+        size, filename, file_path, new_datetime = job
+        timeout = ffmpeg_timeout_for(size, throughput)
+        started = time.perf_counter()
+        try:
+            output_file = layout.path_for(filename, new_datetime, file_path)
+        except OSError as e:
+            return filename, False, 0.0, classify_tool_error(exc=e), str(e)
+        success, error_kind, message = call_with_retry(update_metadata_ffmpeg, ffmpeg_path, file_path,
+                                                       new_datetime, output_file, timeout=timeout)
+        return filename, success, time.perf_counter() - started, error_kind, message
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(run_job, sized_jobs))
+
+class OutputLayout:
+    """
+    Path output per file: output_folder/<bucket>/<filename>.
+    pattern: None = flat; mis. "{Y}/{m}/{d}" atau "{Y}-{m}" (Y, m, d, H dari tanggal metadata).
+    Folder yang sudah dibuat dicatat di memori (satu makedirs per bucket), dan nama
+    yang bentrok dalam satu run diberi akhiran " (1)", " (2)", ... tanpa cek ke disk.
+    Aman dipakai dari writer thread dan thread FFmpeg sekaligus.
+    """
+    
+    FIELDS = ('Y', 'm', 'd', 'H')
+    
+    def __init__(self, output_folder, pattern=None):
+        self.output_folder = output_folder
+        self.pattern = self.validate(pattern) if pattern else None
+        self.created = set()
+        # path output -> pemilik (file asal), supaya panggilan ulang untuk file yang sama dapat path sama
+        self.claimed = {}
+        self.lock = threading.Lock()
+    
+    @classmethod
+    def validate(cls, pattern):
+        """Cek pattern layout, return pattern atau ValueError"""
+        try:
+            bucket = pattern.format(**{field: '0' for field in cls.FIELDS})
+        except (KeyError, IndexError, ValueError) as e:
+            raise ValueError(f"layout {pattern!r} tidak valid, field yang bisa dipakai: "
+                             + ", ".join('{' + field + '}' for field in cls.FIELDS)) from e
+        if os.path.isabs(bucket) or '..' in bucket.replace('\\', '/').split('/'):
+            raise ValueError(f"layout {pattern!r} harus path relatif di dalam output folder")
+        return pattern
+    
+    def bucket(self, datetime_obj):
+        """Folder output untuk tanggal ini (flat jika tanpa pattern / tanpa tanggal)"""
+        if not self.pattern or datetime_obj is None:
+            return self.output_folder
+        return os.path.normpath(os.path.join(self.output_folder, self.pattern.format(
+            Y=f"{datetime_obj.year:04d}", m=f"{datetime_obj.month:02d}",
+            d=f"{datetime_obj.day:02d}", H=f"{datetime_obj.hour:02d}")))
+    
+    def path_for(self, filename, datetime_obj, owner=None):
+        """Path output untuk filename; owner (default filename) membedakan file asal bernama sama"""
+        owner = filename if owner is None else owner
+        folder = self.bucket(datetime_obj)
+        with self.lock:
+            if folder not in self.created:
+                os.makedirs(folder, exist_ok=True)
+                self.created.add(folder)
+            
+            target = os.path.join(folder, filename)
+            stem, ext = os.path.splitext(filename)
+            counter = 1
+            while self.claimed.get(target, owner) != owner:
+                target = os.path.join(folder, f"{stem} ({counter}){ext}")
+                counter += 1
+            self.claimed[target] = owner
+            return target
+
+def datetime_to_ns(new_datetime):
+    """Tanggal lokal -> nanodetik epoch untuk os.utime(ns=...)"""
+    return int(time.mktime(new_datetime.timetuple())) * 1_000_000_000 + new_datetime.microsecond * 1000
+
+def set_file_times(entries):
+    """
+    Tahap bulk waktu filesystem: atime & mtime tiap file diisi tanggal metadata
+    dengan os.utime(ns=...), tanpa ExifTool. Dipakai semua engine (termasuk basic)
+    setelah file output selesai ditulis.
+    entries: iterable (path, datetime). Return list (path, error_kind, pesan error) yang gagal.
+    """
+    failed = []
+    ns_cache = {}
+    for path, new_datetime in entries:
+        ns = ns_cache.get(new_datetime)
+        try:
+            if ns is None:
+                ns = ns_cache[new_datetime] = datetime_to_ns(new_datetime)
+            os.utime(path, ns=(ns, ns))
+        except (OSError, OverflowError, ValueError) as e:
+            failed.append((path, classify_tool_error(exc=e), str(e)))
+    return failed
+
+def restore_file_times(entries):
+    """
+    Rollback waktu filesystem: os.utime(ns=...) dengan atime/mtime asli per file.
+    entries: iterable (path, atime_ns, mtime_ns). Return list (path, error_kind, pesan error) yang gagal.
+    """
+    failed = []
+    for path, atime_ns, mtime_ns in entries:
+        try:
+            os.utime(path, ns=(atime_ns, mtime_ns))
+        except OSError as e:
+            failed.append((path, classify_tool_error(exc=e), str(e)))
+    return failed
+
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+COPY_KERNEL_CHUNK = 64 * 1024 * 1024
+COPY_PROGRESS_MIN_SIZE = 256 * 1024 * 1024
+
+def format_size(num_bytes):
+    """Format ukuran byte jadi KB/MB/GB"""
+    if num_bytes < 1024:
+        return f"{num_bytes:.0f} B"
+    for unit in ('KB', 'MB', 'GB'):
+        num_bytes /= 1024
+        if num_bytes < 1024 or unit == 'GB':
+            return f"{num_bytes:.1f} {unit}"
+
+def _copy_file_range_loop(src_fd, dst_fd, total, progress):
+    """Copy di kernel dengan copy_file_range (Linux 4.5+, bisa reflink/server-side copy)"""
+    copied = 0
+    while copied < total:
+        sent = os.copy_file_range(src_fd, dst_fd, min(COPY_KERNEL_CHUNK, total - copied))
+        if sent == 0:
+            break
+        copied += sent
+        if progress:
+            progress(copied, total)
+    return copied
+
+def _sendfile_loop(src_fd, dst_fd, total, progress):
+    """Copy di kernel dengan sendfile (fallback untuk kernel/filesystem lama)"""
+    copied = 0
+    while copied < total:
+        sent = os.sendfile(dst_fd, src_fd, copied, min(COPY_KERNEL_CHUNK, total - copied))
+        if sent == 0:
+            break
+        copied += sent
+        if progress:
+            progress(copied, total)
+    return copied
+
+def _buffered_copy_loop(fsrc, fdst, total, buffer_size, progress):
+    """Copy biasa dengan satu buffer besar yang dipakai ulang"""
+    copied = 0
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    while True:
+        read = fsrc.readinto(buffer)
+        if not read:
+            break
+        fdst.write(view[:read])
+        copied += read
+        if progress:
+            progress(copied, total)
+    return copied
+
+def _rewind_copy(fsrc, fdst):
+    """Kembalikan sumber ke offset 0 dan kosongkan target sebelum mencoba cara copy lain"""
+    fsrc.seek(0)
+    fdst.seek(0)
+    fdst.truncate()
+
+def copy_file_fast(source_path, target_path, buffer_size=COPY_BUFFER_SIZE, progress=None):
+    """
+    Pengganti shutil.copy2 untuk file besar.
+    Urutan: copy_file_range -> sendfile -> loop buffer (buffer_size).
+    Metadata (mtime, permission) ikut disalin seperti copy2.
+    progress(copied, total) dipanggil tiap chunk. Return (bytes, detik).
+    OSError jika jumlah byte tersalin tidak sama dengan ukuran awal file sumber.
+    """
+    start = time.perf_counter()
+    total = os.path.getsize(source_path)
+    
+    with open(source_path, 'rb') as fsrc, open(target_path, 'wb') as fdst:
+        src_fd = fsrc.fileno()
+        dst_fd = fdst.fileno()
+        copied = None
+        
+        # Tiap cara copy mulai dari file target kosong dan offset 0: kernel copy yang
+        # gagal / berhenti di tengah jalan sudah memindahkan posisi kedua file
+        if hasattr(os, 'copy_file_range'):
+            try:
+                copied = _copy_file_range_loop(src_fd, dst_fd, total, progress)
+            except OSError:
+                copied = None
+        
+        if copied != total and hasattr(os, 'sendfile'):
+            _rewind_copy(fsrc, fdst)
+            try:
+                copied = _sendfile_loop(src_fd, dst_fd, total, progress)
+            except OSError:
+                copied = None
+        
+        # Kernel copy yang berhenti lebih awal (return 0 sebelum total) diulang
+        # dengan loop buffer, yang membaca sampai EOF
+        if copied != total:
+            _rewind_copy(fsrc, fdst)
+            copied = _buffered_copy_loop(fsrc, fdst, total, buffer_size, progress)
+        
+        fdst.flush()
+        written = os.fstat(dst_fd).st_size
+    
+    if copied != total or written != total:
+        # Ukuran file sumber berubah selama copy: jangan tinggalkan output terpotong
+        os.remove(target_path)
+        raise OSError(f"file sumber berubah saat disalin ({written} dari {total} byte)")
+    
+    shutil.copystat(source_path, target_path)
+    return copied, time.perf_counter() - start
+
+FINGERPRINT_CHUNK = 64 * 1024
+
+def fast_fingerprint(file_path, chunk_size=FINGERPRINT_CHUNK):
+    """
+    Sidik jari cepat isi file: ukuran + blok awal + blok akhir.
+    Tidak membaca seluruh file, jadi tetap cepat untuk video besar.
+    """
+    size = os.path.getsize(file_path)
+    hasher = xxhash.xxh3_128() if xxhash else hashlib.blake2b(digest_size=16)
+    hasher.update(size.to_bytes(8, 'little'))
+    
+    with open(file_path, 'rb') as f:
+        hasher.update(f.read(chunk_size))
+        if size > chunk_size:
+            f.seek(max(chunk_size, size - chunk_size))
+            hasher.update(f.read(chunk_size))
+    
+    return size, hasher.digest()
+
+def find_duplicate_files(files):
+    """
+    Kelompokkan file dengan isi yang sama.
+    Hanya file dengan ukuran yang sama yang di-fingerprint.
+    files: list (filename, file_path).
+    Return (file unik, {file_path utama: [(filename, file_path) duplikat]}).
+    """
+    by_size = {}
+    for filename, file_path in files:
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            size = None
+        by_size.setdefault(size, []).append((filename, file_path))
+    
+    primary_of = {}
+    duplicates = {}
+    for size, group in by_size.items():
+        if size is None or len(group) < 2:
+            continue
+        
+        # Nama terpendek dianggap file asli, mis. "a.mp4" sebelum "a(1).mp4"
+        seen = {}
+        for filename, file_path in sorted(group, key=lambda item: (len(item[0]), item[0])):
+            try:
+                fingerprint = fast_fingerprint(file_path)
+            except OSError:
+                continue
+            if fingerprint in seen:
+                primary_path = seen[fingerprint]
+                primary_of[file_path] = primary_path
+                duplicates.setdefault(primary_path, []).append((filename, file_path))
+            else:
+                seen[fingerprint] = file_path
+    
+    unique_files = [(filename, file_path) for filename, file_path in files if file_path not in primary_of]
+    return unique_files, duplicates
+
+def link_or_copy(source_path, target_path):
+    """Hardlink hasil ke target, fallback ke copy jika beda filesystem"""
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    try:
+        os.link(source_path, target_path)
+        return "link"
+    except OSError:
+        copy_file_fast(source_path, target_path)
+        return "copy"
+
+# Template sidecar XMP, diisi dengan str.format (tanpa exiftool)
+XMP_SIDECAR_TEMPLATE = (
+    '<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>\n'
+    '<x:xmpmeta xmlns:x="adobe:ns:meta/">\n'
+    ' <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">\n'
+    '  <rdf:Description rdf:about=""\n'
+    '    xmlns:xmp="http://ns.adobe.com/xap/1.0/"\n'
+    '    xmlns:photoshop="http://ns.adobe.com/photoshop/1.0/"\n'
+    '    xmp:CreateDate="{date}"\n'
+    '    photoshop:DateCreated="{date}"/>\n'
+    ' </rdf:RDF>\n'
+    '</x:xmpmeta>\n'
+    '<?xpacket end="w"?>\n'
+)
+
+def render_xmp_sidecar(new_datetime):
+    """Render isi sidecar XMP untuk satu tanggal"""
+    return XMP_SIDECAR_TEMPLATE.format(date=new_datetime.strftime("%Y-%m-%dT%H:%M:%S"))
+
+def write_xmp_sidecars(entries, output_folder, layout=None):
+    """
+    Tulis sidecar XMP (file.ext.xmp) untuk banyak file sekaligus.
+    File media asli tidak disentuh sama sekali, cocok untuk storage read-only.
+    entries: list (filename, datetime). layout: OutputLayout (default: flat di output_folder).
+    Return (list berhasil, list gagal).
+    """
+    if layout is None:
+        layout = OutputLayout(output_folder)
+    written = []
+    failed = []
+    rendered = {}
+    
+    for filename, new_datetime in entries:
+        # File dengan tanggal sama memakai hasil render yang sama
+        content = rendered.get(new_datetime)
+        if content is None:
+            content = render_xmp_sidecar(new_datetime).encode('utf-8')
+            rendered[new_datetime] = content
+        
+        try:
+            with open(layout.path_for(filename + '.xmp', new_datetime), 'wb') as f:
+                f.write(content)
+            written.append(filename)
+        except OSError:
+            failed.append(filename)
+    
+    return written, failed
+
+# Jenis file yang bisa ditulis ExifTool (AVI/MKV/WebM/WMV/FLV/BMP hanya bisa dibaca)
+EXIFTOOL_WRITABLE_FORMATS = frozenset({'jpeg', 'png', 'gif', 'tiff', 'webp', 'heic', 'avif',
+                                       'mp4', 'mov', 'm4v', '3gp'})
+
+def engine_supports(selected_tool, file_format, ext):
+    """
+    False jika engine pasti gagal untuk jenis file asli ini, supaya tidak dipanggil sia-sia.
+    ExifTool juga menolak menulis file yang ekstensinya tidak sesuai isi (mis. HEIC bernama .jpg).
+    """
+    if file_format is None:
+        return True
+    if selected_tool == "exiftool":
+        return file_format in EXIFTOOL_WRITABLE_FORMATS and extension_matches(file_format, ext)
+    if selected_tool == "native":
+        return file_format in NATIVE_FORMATS
+    if selected_tool == "ffmpeg":
+        return file_format in VIDEO_FORMATS
+    return True
+
+def select_tool(tool_choice, is_video, exif_available, ffmpeg_available, file_format=None, ext=None,
+                native=True):
+    """
+    Tentukan tool yang akan digunakan untuk satu file.
+    file_format (hasil sniff_file_type) + ext: mode auto melewati engine yang pasti gagal.
+    native=False: lewati patcher native (fallback untuk file yang strukturnya tidak bisa di-patch).
+    """
+    if tool_choice != "auto":
+        return tool_choice
+    
+    # MKV/WebM/HEIC: tanggal di-patch langsung tanpa remux FFmpeg / proses ExifTool
+    if native and file_format in NATIVE_FORMATS:
+        return "native"
+    
+    exif_usable = exif_available and engine_supports("exiftool", file_format, ext or "")
+    if is_video:
+        if exif_usable:
+            return "exiftool"
+        elif ffmpeg_available:
+            return "ffmpeg"
+        return "basic"
+    return "exiftool" if exif_usable else "basic"
+
+def write_files_metadata(entries, datetime_obj, selected_tool, output_folder,
+                         exiftool_path=None, progress_factory=None, layout=None, snapshot=None,
+                         file_format=None):
+    """
+    Update metadata file dengan ExifTool / native, lalu copy ke output folder.
+    entries: list (filename, file_path) dengan tanggal yang sama; lebih dari satu
+    file ExifTool ditulis dalam satu panggilan.
+    file_format: jenis file asli semua entries (hasil sniff_file_type, dibaca sekali
+    oleh pemanggil), untuk profil tag ExifTool dan patcher native.
+    Engine "native" tidak menyentuh file asli: salinan di output yang di-patch.
+    Waktu filesystem (termasuk engine "basic") diatur terpisah dengan set_file_times.
+    progress_factory(filename, file_path): callback progress copy atau None.
+    layout: OutputLayout (default: flat di output_folder).
+    snapshot: SnapshotLog; waktu & tag asli file yang ditimpa ExifTool dicatat
+    sebelum ditulis, untuk rollback. File yang tag aslinya tidak terbaca gagal
+    tanpa ditimpa; file yang sudah tercatat tidak dibaca ulang.
+    Error sementara (file terkunci, timeout) diulang dengan backoff.
+    Return list dict hasil: status ("ok" / "failed"; copy ke output yang gagal juga
+    "failed"), output, bytes, seconds (waktu copy), duration (waktu total per file),
+    error, error_kind.
+    """
+    if layout is None:
+        layout = OutputLayout(output_folder)
+    results = []
+    for filename, file_path in entries:
+        results.append({
+            'filename': filename,
+            'file_path': file_path,
+            'engine': selected_tool,
+            'status': 'failed',
+            'output': None,
+            'bytes': 0,
+            'seconds': 0.0,
+            'duration': 0.0,
+            'error': None,
+            'error_kind': None,
+        })
+    
+    started = time.perf_counter()
+    if selected_tool == "exiftool":
+        paths = [file_path for _, file_path in entries]
+        if snapshot is not None:
+            unread = set(snapshot_originals(snapshot, exiftool_path, [(paths, file_format)]))
+            paths = [path for path in paths if path not in unread]
+        if len(paths) > 1 and call_with_retry(update_metadata_exif_many, exiftool_path, paths,
+                                              datetime_obj, file_format)[0]:
+            written = dict.fromkeys(paths, (True, None, None))
+        else:
+            # Satu file, atau batch gagal: ulangi per file untuk tahu mana yang gagal
+            written = {path: call_with_retry(update_metadata_exif, exiftool_path, path, datetime_obj, file_format)
+                       for path in paths}
+        not_snapshotted = (False, ERROR_OTHER, "tag tanggal asli tidak terbaca untuk snapshot, file tidak ditimpa")
+        outcomes = [written.get(file_path, not_snapshotted) for _, file_path in entries]
+    elif selected_tool == "native":
+        native_plans = {}
+        outcomes = []
+        for _, file_path in entries:
+            plan, error_kind, message = call_with_retry(plan_metadata_native, file_path, datetime_obj, file_format)
+            native_plans[file_path] = plan
+            outcomes.append((plan is not None, error_kind, message))
+    else:
+        # Basic: hanya copy, waktu filesystem ditulis tahap set_file_times
+        outcomes = [(True, None, None)] * len(entries)
+    
+    # Satu panggilan batch dibagi rata ke semua file di dalamnya
+    metadata_seconds = (time.perf_counter() - started) / len(entries)
+    
+    for result, (success, error_kind, message) in zip(results, outcomes):
+        result['duration'] = metadata_seconds
+        if not success:
+            result.update(error=message, error_kind=error_kind)
+            continue
+        
+        # Copy ke output folder (FFmpeg sudah menulis langsung ke output)
+        try:
+            output_path = layout.path_for(result['filename'], datetime_obj, result['file_path'])
+            progress = progress_factory(result['filename'], result['file_path']) if progress_factory else None
+            plan = native_plans[result['file_path']] if selected_tool == "native" else None
+            if plan is not None and plan.inserts:
+                # Chunk baru (mis. tIME PNG) perlu tulis ulang streaming, bukan copy + patch
+                copy_started = time.perf_counter()
+                copied = write_with_inserts(result['file_path'], output_path, plan)
+                seconds = time.perf_counter() - copy_started
+            else:
+                copied, seconds = copy_file_fast(result['file_path'], output_path, progress=progress)
+            if plan is not None:
+                if not plan.inserts:
+                    apply_patches(output_path, plan.patches)
+                # Waktu file tetap seperti copy biasa; tanggal baru diatur set_file_times
+                shutil.copystat(result['file_path'], output_path)
+            result.update(status='ok', output=output_path, bytes=copied, seconds=seconds,
+                          duration=metadata_seconds + seconds)
+        except OSError as e:
+            # Tanpa salinan di output file ini gagal, termasuk untuk antrian ulang
+            result.update(error=f"Gagal menyalin: {str(e)}", error_kind=classify_tool_error(exc=e))
+    
+    return results
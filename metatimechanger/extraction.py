@@ -0,0 +1,398 @@
+"""Ekstraksi tanggal dari nama file: validasi, pattern registry, cache, inferensi."""
+
+import os
+import re
+import json
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+# === VALIDASI TANGGAL ===
+# Semua ekstraktor memakai validasi ini: cek angka dulu, baru buat datetime.
+# Tidak ada datetime(...) yang dibuat hanya untuk ditangkap ValueError-nya.
+
+# Batas tahun yang dianggap masuk akal (None = tahun sekarang + 1).
+# Nama file bertanggal boleh jauh ke belakang (mis. hasil scan arsip 1999),
+# bisa diubah lewat --min-year.
+DATE_MIN_YEAR = 1900
+DATE_MAX_YEAR = None
+# Unix timestamp di nama file hanya dipercaya mulai tahun ini: deret 10/13 digit
+# acak terlalu mudah jatuh ke tahun 1970-an
+EPOCH_MIN_YEAR = 2000
+
+# Jumlah hari per bulan (index 0 tidak dipakai): [tahun biasa, tahun kabisat]
+_MONTH_DAYS = (
+    (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31),
+    (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31),
+)
+
+def is_leap_year(year):
+    """Cek tahun kabisat"""
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+def date_year_bounds(min_year=None, max_year=None):
+    """Batas tahun (min, max) yang dipakai validasi"""
+    if min_year is None:
+        min_year = DATE_MIN_YEAR
+    if max_year is None:
+        max_year = DATE_MAX_YEAR if DATE_MAX_YEAR is not None else time.localtime().tm_year + 1
+    return min_year, max_year
+
+def is_valid_date_parts(year, month, day, hour=0, minute=0, second=0, min_year=None, max_year=None):
+    """Validasi tanggal+jam dalam bentuk int, termasuk jumlah hari per bulan dan tahun kabisat"""
+    if min_year is None or max_year is None:
+        min_year, max_year = date_year_bounds(min_year, max_year)
+    
+    if not (min_year <= year <= max_year):
+        return False
+    if not (1 <= month <= 12):
+        return False
+    if not (1 <= day <= _MONTH_DAYS[is_leap_year(year)][month]):
+        return False
+    return 0 <= hour <= 23 and 0 <= minute <= 59 and 0 <= second <= 59
+
+def set_date_year_bounds(min_year=None, max_year=None):
+    """Ubah batas tahun validasi untuk pattern tanggal (None = tidak diubah)"""
+    global DATE_MIN_YEAR, DATE_MAX_YEAR
+    if min_year is not None:
+        DATE_MIN_YEAR = min_year
+    if max_year is not None:
+        DATE_MAX_YEAR = max_year
+
+@lru_cache(maxsize=16)
+def epoch_window(min_year, max_year):
+    """Rentang Unix timestamp (waktu lokal) yang sesuai dengan batas tahun"""
+    return (
+        int(time.mktime((min_year, 1, 1, 0, 0, 0, 0, 0, -1))),
+        int(time.mktime((max_year, 12, 31, 23, 59, 59, 0, 0, -1))),
+    )
+
+# DAFTAR PATTERN BAWAAN
+# Grup regex: (tahun, bulan, hari, jam, menit, detik) berurutan, atau grup bernama
+# year/month/day/hour/minute/second. Pattern dengan 3 grup = hanya tanggal.
+# kind 'epoch' / 'epoch_ms': satu grup berisi Unix timestamp detik / milidetik.
+# Grup bernama meridiem (opsional, pattern tanggal+jam): AM/PM, jam 12-jam diubah ke 24 jam.
+DEFAULT_PATTERNS = [
+    # Pattern perangkat (dari v1.0)
+    {'name': 'PXL YYYYMMDD_HHMMSS', 'regex': r'PXL[_-](\d{4})(\d{2})(\d{2})[_-](\d{2})(\d{2})(\d{2})'},
+    {'name': 'MVIMG YYYYMMDD_HHMMSS', 'regex': r'MVIMG[_-](\d{4})(\d{2})(\d{2})[_-](\d{2})(\d{2})(\d{2})'},
+    {'name': 'Screenshot YYYYMMDD-HHMMSS', 'regex': r'Screenshot[_-](\d{4})(\d{2})(\d{2})[_-](\d{2})(\d{2})(\d{2})'},
+    {'name': 'WhatsApp IMG-YYYYMMDD-WAHHMMSS', 'regex': r'IMG[_-](\d{4})(\d{2})(\d{2})[_-]WA(\d{2})(\d{2})(\d{2})'},
+    
+    # Pattern dengan SPASI: "Vid 20210327 092658"
+    {'name': 'Vid YYYYMMDD HHMMSS', 'regex': r'(?:Vid|Video|IMG|Image|Photo|Pic|Pict|Screen|Screenshot|Record|Recording)[ _-]*(\d{4})(\d{2})(\d{2})[ _-]*(\d{2})(\d{2})(\d{2})'},
+    
+    # Pattern umum dengan SPASI: "20210327 092658"
+    {'name': 'YYYYMMDD HHMMSS', 'regex': r'(\d{4})(\d{2})(\d{2})[ _-]+(\d{2})(\d{2})(\d{2})'},
+    
+    # Pattern dengan underscore: "20210327_092658"
+    {'name': 'YYYYMMDD_HHMMSS', 'regex': r'(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})'},
+    
+    # Pattern tanpa separator: "20210327092658"
+    {'name': 'YYYYMMDDHHMMSS', 'regex': r'(\d{4})(\d{2})(\d{2})(\d{2})(\d{2})(\d{2})'},
+    
+    # Pattern dengan dash: "2021-03-27-09-26-58"
+    {'name': 'YYYY-MM-DD-HH-MM-SS', 'regex': r'(\d{4})-(\d{2})-(\d{2})-(\d{2})-(\d{2})-(\d{2})'},
+    
+    # Pattern dengan dot: "2021.03.27.09.26.58"
+    {'name': 'YYYY.MM.DD.HH.MM.SS', 'regex': r'(\d{4})\.(\d{2})\.(\d{2})\.(\d{2})\.(\d{2})\.(\d{2})'},
+    
+    # Pattern vendor lain
+    {'name': 'Signal signal-YYYY-MM-DD-HHMMSS', 'regex': r'signal[_-](\d{4})-(\d{2})-(\d{2})[_-](\d{2})-?(\d{2})-?(\d{2})'},
+    {'name': 'macOS YYYY-MM-DD at HH.MM.SS', 'regex': r'(\d{4})-(\d{2})-(\d{2}) at (\d{1,2})\.(\d{2})\.(\d{2})(?:\s?(?P<meridiem>[AP]M))?'},
+    
+    # Tanggal dan jam dengan separator campuran: "2023-12-25_14-30-45", "2023.12.25_14.30.45"
+    {'name': 'YYYY-MM-DD_HH-MM-SS', 'regex': r'(\d{4})-(\d{2})-(\d{2})[ _T](\d{2})[-.](\d{2})[-.](\d{2})'},
+    {'name': 'YYYY.MM.DD_HH.MM.SS', 'regex': r'(\d{4})\.(\d{2})\.(\d{2})[ _-](\d{2})\.(\d{2})\.(\d{2})'},
+    
+    # Unix epoch (detik / milidetik): "1703514645.mp4", "FB_IMG_1703514645123.jpg"
+    {'name': 'Epoch ms (13 digit)', 'regex': r'(?<!\d)(\d{13})(?!\d)', 'kind': 'epoch_ms'},
+    {'name': 'Epoch detik (10 digit)', 'regex': r'(?<!\d)(\d{10})(?!\d)', 'kind': 'epoch'},
+    
+    # Pattern cadangan jika tidak ada tanggal+jam
+    {'name': 'YYYYMMDD', 'regex': r'(\d{4})(\d{2})(\d{2})'},
+    {'name': 'YYYY-MM-DD', 'regex': r'(\d{4})-(\d{2})-(\d{2})'},
+]
+
+# Pattern tambahan user (skema penamaan kamera sendiri), format:
+# {"patterns": [{"name": "...", "regex": "...", "prepend": true}]}
+# Config dicari di folder program (satu level di atas package ini)
+PATTERN_CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   'metatimechanger_patterns.json')
+
+_DATE_GROUP_NAMES = ('year', 'month', 'day', 'hour', 'minute', 'second')
+
+class PatternRegistry:
+    """
+    Registry pattern ekstraksi tanggal.
+    Setiap pattern dikompilasi sekali, dicoba sesuai urutan daftar (hasilnya
+    di-cache per bentuk nama file), dan punya counter hit. Urutan tidak berubah
+    karena hit; stats() hanya untuk laporan.
+    """
+    
+    def __init__(self, patterns=None):
+        self.entries = []
+        self.hits = {}
+        self.uncached = 0
+        for pattern in (DEFAULT_PATTERNS if patterns is None else patterns):
+            self.add(pattern['name'], pattern['regex'], kind=pattern.get('kind', 'date'),
+                     cached=pattern in DEFAULT_PATTERNS)
+    
+    def add(self, name, regex, prepend=False, kind='date', cached=False):
+        """
+        Tambah pattern baru (prepend=True: prioritas di atas pattern bawaan).
+        cached=False: pattern dicari di nama file asli setiap kali, tidak lewat
+        cache bentuk nama file, jadi regex boleh berisi digit literal (mis. "CAM2-").
+        Pattern bawaan tidak berisi digit literal sehingga aman di-cache.
+        """
+        compiled = re.compile(regex, re.IGNORECASE)
+        
+        if kind in ('epoch', 'epoch_ms'):
+            if compiled.groups != 1:
+                raise ValueError(f"Pattern epoch '{name}' harus punya tepat 1 grup")
+            groups = (1,)
+        elif kind == 'date':
+            meridiem = compiled.groupindex.get('meridiem')
+            if all(group in compiled.groupindex for group in _DATE_GROUP_NAMES[:3]):
+                groups = tuple(compiled.groupindex[group] for group in _DATE_GROUP_NAMES if group in compiled.groupindex)
+            else:
+                groups = tuple(group for group in range(1, compiled.groups + 1) if group != meridiem)
+            
+            if len(groups) not in (3, 6):
+                raise ValueError(f"Pattern '{name}' harus punya 3 (tanggal) atau 6 (tanggal+jam) grup")
+            if meridiem is not None:
+                if len(groups) != 6:
+                    raise ValueError(f"Grup meridiem di pattern '{name}' butuh 6 grup tanggal+jam")
+                # Span AM/PM ikut sebagai grup ke-7
+                groups += (meridiem,)
+        else:
+            raise ValueError(f"Jenis pattern '{kind}' tidak dikenal (date, epoch, epoch_ms)")
+        
+        entry = {
+            'name': name,
+            'regex': compiled,
+            'groups': groups,
+            'kind': kind,
+            'has_time': kind != 'date' or len(groups) >= 6,
+            'cached': cached,
+        }
+        if prepend:
+            self.entries.insert(0, entry)
+        else:
+            self.entries.append(entry)
+        self.hits.setdefault(name, 0)
+        if not cached:
+            self.uncached += 1
+        _extraction_plan.cache_clear()
+    
+    @classmethod
+    def from_config(cls, config_path=PATTERN_CONFIG_FILE):
+        """Pattern bawaan + pattern dari file config JSON (jika ada)"""
+        user_patterns = []
+        if config_path and os.path.isfile(config_path):
+            with open(config_path, encoding='utf-8') as f:
+                user_patterns = json.load(f).get('patterns', [])
+        
+        # Default: pattern user dicoba sebelum pattern bawaan
+        first = [pattern for pattern in user_patterns if pattern.get('prepend', True)]
+        last = [pattern for pattern in user_patterns if not pattern.get('prepend', True)]
+        return cls(first + DEFAULT_PATTERNS + last)
+    
+    def record_hit(self, name):
+        self.hits[name] += 1
+    
+    def reset_stats(self):
+        """Reset counter hit untuk run baru"""
+        for name in self.hits:
+            self.hits[name] = 0
+        _extraction_plan.cache_clear()
+    
+    def stats(self):
+        """List (nama pattern, hit) urut hit terbanyak"""
+        return sorted(self.hits.items(), key=lambda item: -item[1])
+
+_pattern_registry = None
+
+def get_pattern_registry():
+    """Registry pattern aktif (dimuat dari config saat pertama dipakai)"""
+    global _pattern_registry
+    if _pattern_registry is None:
+        _pattern_registry = PatternRegistry.from_config()
+    return _pattern_registry
+
+def reload_pattern_registry(config_path=PATTERN_CONFIG_FILE):
+    """Muat ulang pattern dari config"""
+    global _pattern_registry
+    _pattern_registry = PatternRegistry.from_config(config_path)
+    _extraction_plan.cache_clear()
+    return _pattern_registry
+
+_DIGIT_RE = re.compile(r'\d')
+
+def _build_extraction_plan(sample, cached=True):
+    """
+    Cari semua kandidat pattern pada nama file contoh (digit sudah jadi '0').
+    cached=False: hanya pattern yang tidak boleh di-cache, dicari di nama file asli.
+    Hasil: (kandidat tanggal+jam, kandidat hanya tanggal), masing-masing
+    urut prioritas pattern di registry lalu posisi, berisi prioritas, nama pattern
+    dan span grup untuk di-slice dari nama file asli.
+    Urutan sengaja tidak memakai jumlah hit: plan di-cache per bentuk nama file,
+    jadi pattern yang dilaporkan tidak boleh bergantung pada file mana yang
+    pertama mengisi cache.
+    """
+    time_candidates = []
+    date_candidates = []
+    for priority, entry in enumerate(get_pattern_registry().entries):
+        if entry['cached'] != cached:
+            continue
+        candidates = time_candidates if entry['has_time'] else date_candidates
+        for match in entry['regex'].finditer(sample):
+            spans = tuple(match.span(group) for group in entry['groups'])
+            candidates.append((priority, entry['name'], entry['kind'], spans))
+    
+    return tuple(time_candidates), tuple(date_candidates)
+
+@lru_cache(maxsize=4096)
+def _extraction_plan(shape):
+    """
+    Plan ekstraksi per bentuk nama file (LRU cache).
+    Posisi match regex hanya bergantung pada bentuk nama file, jadi file
+    berikutnya dengan bentuk yang sama langsung slicing + validasi.
+    """
+    return _build_extraction_plan(shape.replace('#', '0'))
+
+def extraction_cache_info():
+    """Statistik cache ekstraksi (hits, misses, currsize)"""
+    return _extraction_plan.cache_info()
+
+def _hour_24(hour, meridiem):
+    """Jam 12-jam + "AM"/"PM" -> jam 24-jam (12 AM = 0, 12 PM = 12); -1 jika jam tidak valid"""
+    if not meridiem:
+        return hour
+    if not 1 <= hour <= 12:
+        return -1
+    return hour % 12 + (12 if meridiem.upper() == 'PM' else 0)
+
+def smart_extract_datetime_detail(filename):
+    """
+    Seperti smart_extract_datetime, tapi juga mengembalikan nama pattern.
+    Return (datetime atau None, has_time, nama pattern atau None).
+    """
+    filename_without_ext = os.path.splitext(filename)[0]
+    
+    if '#' in filename_without_ext:
+        # '#' asli di nama file bentrok dengan template, jangan pakai cache
+        plan = _build_extraction_plan(_DIGIT_RE.sub('0', filename_without_ext))
+    else:
+        plan = _extraction_plan(_DIGIT_RE.sub('#', filename_without_ext))
+    
+    time_candidates, date_candidates = plan
+    registry = get_pattern_registry()
+    if registry.uncached:
+        # Pattern user dicari langsung di nama file, lalu digabung sesuai prioritas
+        extra_time, extra_date = _build_extraction_plan(filename_without_ext, cached=False)
+        if extra_time:
+            time_candidates = sorted(time_candidates + extra_time, key=lambda candidate: candidate[0])
+        if extra_date:
+            date_candidates = sorted(date_candidates + extra_date, key=lambda candidate: candidate[0])
+    min_year, max_year = date_year_bounds()
+    
+    # Kandidat sudah urut prioritas, yang pertama valid adalah match terbaik
+    for _, pattern_name, kind, spans in time_candidates:
+        if kind != 'date':
+            start, end = spans[0]
+            timestamp = int(filename_without_ext[start:end])
+            if kind == 'epoch_ms':
+                timestamp //= 1000
+            
+            # Hanya timestamp dalam rentang tahun yang masuk akal (lebih ketat dari pattern tanggal)
+            min_timestamp, max_timestamp = epoch_window(max(min_year, EPOCH_MIN_YEAR), max_year)
+            if min_timestamp <= timestamp <= max_timestamp:
+                registry.record_hit(pattern_name)
+                return datetime.fromtimestamp(timestamp), True, pattern_name
+            continue
+        
+        values = [filename_without_ext[start:end] for start, end in spans]
+        year, month, day, hour, minute, second = [int(value) for value in values[:6]]
+        if len(values) == 7:
+            hour = _hour_24(hour, values[6])
+        if is_valid_date_parts(year, month, day, hour, minute, second, min_year, max_year):
+            registry.record_hit(pattern_name)
+            return datetime(year, month, day, hour, minute, second), True, pattern_name
+    
+    # Coba cari hanya tanggal
+    for _, pattern_name, kind, spans in date_candidates:
+        year, month, day = [int(filename_without_ext[start:end]) for start, end in spans]
+        if is_valid_date_parts(year, month, day, min_year=min_year, max_year=max_year):
+            registry.record_hit(pattern_name)
+            return datetime(year, month, day, 12, 0, 0), False, pattern_name
+    
+    return None, False, None
+
+def smart_extract_datetime(filename, is_video=True):
+    """
+    Fungsi cerdas untuk ekstrak datetime dari berbagai format file
+    """
+    datetime_obj, has_time, pattern_name = smart_extract_datetime_detail(filename)
+    return datetime_obj, has_time
+
+# Batas keyakinan inferensi: dua tetangga bertanggal tidak boleh berjarak lebih dari ini
+INFER_MAX_GAP_HOURS = 6
+
+_SEQUENCE_RE = re.compile(r'\d+')
+
+def _sequence_number(filename):
+    """Nomor urut pertama di nama file, mis. DSC0042.jpg -> 42"""
+    match = _SEQUENCE_RE.search(os.path.splitext(filename)[0])
+    return int(match.group(0)) if match else None
+
+def infer_undated_datetimes(filenames, datetimes, max_gap_hours=None):
+    """
+    Perkirakan tanggal file tanpa tanggal dari tetangga bertanggal.
+    filenames: nama file urut; datetimes: datetime atau None per file.
+    File tanpa tanggal yang diapit dua file bertanggal (jarak <= max_gap_hours)
+    diberi tanggal interpolasi berdasarkan nomor urut (jika ada) atau posisi.
+    Satu pass untuk seluruh daftar. Return dict {index: datetime}.
+    """
+    if max_gap_hours is None:
+        max_gap_hours = INFER_MAX_GAP_HOURS
+    max_gap = timedelta(hours=max_gap_hours)
+    count = len(filenames)
+    
+    # Index file bertanggal berikutnya untuk setiap posisi (pass mundur)
+    next_dated = [None] * count
+    upcoming = None
+    for index in range(count - 1, -1, -1):
+        next_dated[index] = upcoming
+        if datetimes[index] is not None:
+            upcoming = index
+    
+    inferred = {}
+    previous = None
+    for index in range(count):
+        if datetimes[index] is not None:
+            previous = index
+            continue
+        
+        following = next_dated[index]
+        if previous is None or following is None:
+            continue
+        
+        start_dt = datetimes[previous]
+        end_dt = datetimes[following]
+        if not (timedelta(0) <= end_dt - start_dt <= max_gap):
+            continue
+        
+        # Interpolasi pakai nomor urut jika ketiganya konsisten, selain itu posisi
+        start_seq = _sequence_number(filenames[previous])
+        seq = _sequence_number(filenames[index])
+        end_seq = _sequence_number(filenames[following])
+        if None not in (start_seq, seq, end_seq) and start_seq < seq < end_seq:
+            ratio = (seq - start_seq) / (end_seq - start_seq)
+        else:
+            ratio = (index - previous) / (following - previous)
+        
+        estimate = start_dt + (end_dt - start_dt) * ratio
+        inferred[index] = estimate.replace(microsecond=0)
+    
+    return inferred
@@ -0,0 +1,497 @@
+"""Patcher metadata native tanpa tool eksternal (Matroska/WebM DateUTC, EXIF di HEIC, tIME/eXIf di PNG)."""
+
+import mmap
+import struct
+import time
+import zlib
+from collections import namedtuple
+
+# Jenis file (hasil sniff_file_type) yang tanggalnya bisa ditulis tanpa remux / subprocess
+MATROSKA_FORMATS = frozenset({'mkv', 'webm'})
+HEIF_FORMATS = frozenset({'heic', 'avif'})
+PNG_FORMATS = frozenset({'png'})
+NATIVE_FORMATS = MATROSKA_FORMATS | HEIF_FORMATS | PNG_FORMATS
+
+# Rencana tulis: patches = [(offset, bytes)] ditimpa di tempat (panjang sama),
+# inserts = [(offset, bytes)] disisipkan sebelum byte `offset` file asli (perlu tulis ulang)
+NativePlan = namedtuple('NativePlan', ['patches', 'inserts'])
+
+NATIVE_COPY_BUFFER_SIZE = 1024 * 1024
+
+class NativePatchError(ValueError):
+    """Struktur file tidak bisa di-patch di tempat (perlu remux / tool lain)"""
+
+# ID elemen EBML yang dipakai (lengkap dengan marker bit panjang)
+EBML_HEADER_ID = 0x1A45DFA3
+SEGMENT_ID = 0x18538067
+INFO_ID = 0x1549A966
+DATE_UTC_ID = 0x4461
+VOID_ID = 0xEC
+CRC32_ID = 0xBF
+
+# DateUTC: nanodetik (int64 big-endian) sejak 2001-01-01 00:00:00 UTC
+MATROSKA_EPOCH = 978307200
+DATE_UTC_SIZE = 8
+DATE_UTC_ELEMENT_SIZE = 2 + 1 + DATE_UTC_SIZE
+
+def _read_ebml_header(f, pos, end):
+    """
+    Baca header elemen EBML (ID + ukuran) di posisi pos.
+    Return (element_id, posisi data, ukuran data atau None jika unknown-size, panjang field ukuran).
+    """
+    f.seek(pos)
+    head = f.read(12)
+    if not head or pos >= end:
+        raise NativePatchError("struktur EBML terpotong")
+    
+    first = head[0]
+    id_length = 8 - first.bit_length() + 1
+    if not first or id_length > 4 or len(head) < id_length + 1:
+        raise NativePatchError("ID elemen EBML tidak valid")
+    element_id = int.from_bytes(head[:id_length], 'big')
+    
+    size_byte = head[id_length]
+    size_length = 8 - size_byte.bit_length() + 1
+    if not size_byte or len(head) < id_length + size_length:
+        raise NativePatchError("ukuran elemen EBML tidak valid")
+    raw = int.from_bytes(head[id_length:id_length + size_length], 'big')
+    size = raw & ((1 << (7 * size_length)) - 1)
+    if size == (1 << (7 * size_length)) - 1:
+        size = None
+    
+    data_pos = pos + id_length + size_length
+    if size is not None and data_pos + size > end:
+        raise NativePatchError("elemen EBML melewati batas parent")
+    return element_id, data_pos, size, size_length
+
+def _encode_ebml_size(value, length):
+    """Field ukuran EBML dengan panjang tetap `length` byte, None jika nilai tidak muat"""
+    if length < 1 or length > 8 or value >= (1 << (7 * length)) - 1:
+        return None
+    return (value | (1 << (7 * length))).to_bytes(length, 'big')
+
+def _void_element(total):
+    """Elemen Void berukuran total `total` byte (minimal 2)"""
+    for length in range(1, 9):
+        size = _encode_ebml_size(total - 1 - length, length) if total - 1 - length >= 0 else None
+        if size is not None:
+            return bytes([VOID_ID]) + size + b'\0' * (total - 1 - length)
+    raise NativePatchError("Void terlalu kecil")
+
+def _date_utc_element(value, total=DATE_UTC_ELEMENT_SIZE):
+    """Elemen DateUTC berukuran total `total` byte (11, atau 12 dengan field ukuran 2 byte)"""
+    return DATE_UTC_ID.to_bytes(2, 'big') + _encode_ebml_size(DATE_UTC_SIZE, total - 2 - DATE_UTC_SIZE) + value
+
+def _split_void(void_size, value):
+    """
+    Bagi sebuah Void berukuran `void_size` byte jadi (elemen DateUTC, sisa Void).
+    Sisa 1 byte tidak bisa jadi Void, jadi diserap field ukuran DateUTC yang lebih panjang.
+    Return None jika Void terlalu kecil.
+    """
+    rest = void_size - DATE_UTC_ELEMENT_SIZE
+    if rest < 0:
+        return None
+    if rest == 1:
+        return _date_utc_element(value, DATE_UTC_ELEMENT_SIZE + 1), b''
+    return _date_utc_element(value), _void_element(rest) if rest else b''
+
+def matroska_date_value(new_datetime):
+    """DateUTC untuk tanggal lokal (sama seperti creation_time di FFmpeg), 8 byte big-endian"""
+    seconds = int(time.mktime(new_datetime.timetuple())) - MATROSKA_EPOCH
+    return struct.pack('>q', seconds * 1_000_000_000 + new_datetime.microsecond * 1000)
+
+def _find_segment_info(f, file_size):
+    """Return (posisi Info, posisi data, ukuran, panjang field ukuran, posisi elemen sesudahnya, batas Segment)"""
+    element_id, data_pos, size, _ = _read_ebml_header(f, 0, file_size)
+    if element_id != EBML_HEADER_ID or size is None:
+        raise NativePatchError("bukan file Matroska/WebM")
+    
+    element_id, segment_pos, segment_size, _ = _read_ebml_header(f, data_pos + size, file_size)
+    if element_id != SEGMENT_ID:
+        raise NativePatchError("Segment Matroska tidak ditemukan")
+    segment_end = file_size if segment_size is None else segment_pos + segment_size
+    
+    # Info biasanya di awal Segment; elemen level 1 lain dilewati dengan seek
+    pos = segment_pos
+    while pos < segment_end:
+        element_id, data_pos, size, size_length = _read_ebml_header(f, pos, segment_end)
+        if size is None:
+            break
+        if element_id == INFO_ID:
+            return pos, data_pos, size, size_length, data_pos + size, segment_end
+        pos = data_pos + size
+    raise NativePatchError("Segment/Info tidak ditemukan sebelum cluster unknown-size")
+
+def plan_matroska_date(f, new_datetime):
+    """
+    Rencana patch DateUTC untuk file Matroska/WebM yang sudah dibuka (mode baca).
+    Urutan pilihan:
+    1. DateUTC sudah ada: 8 byte nilainya ditimpa
+    2. Void di dalam Info: Void diganti DateUTC + sisa Void
+    3. Void tepat setelah Info: Info diperbesar ke dalam Void (ukuran Info ditulis
+       ulang dengan panjang field yang sama), posisi elemen lain tidak bergeser
+    CRC-32 di Info (jika ada) dihitung ulang. Ukuran file tidak pernah berubah.
+    Return list (offset, bytes). NativePatchError jika tidak ada ruang (perlu remux).
+    """
+    f.seek(0, 2)
+    file_size = f.tell()
+    info_pos, info_data, info_size, info_size_length, info_end, segment_end = _find_segment_info(f, file_size)
+    value = matroska_date_value(new_datetime)
+    
+    date_pos = None
+    void = None
+    crc_data = None
+    pos = info_data
+    while pos < info_end:
+        element_id, data_pos, size, _ = _read_ebml_header(f, pos, info_end)
+        if size is None:
+            raise NativePatchError("elemen Info unknown-size")
+        if element_id == DATE_UTC_ID:
+            if size != DATE_UTC_SIZE:
+                raise NativePatchError("DateUTC bukan 8 byte")
+            date_pos = data_pos
+        elif element_id == VOID_ID and void is None and data_pos + size - pos >= DATE_UTC_ELEMENT_SIZE:
+            void = (pos, data_pos + size - pos)
+        elif element_id == CRC32_ID and pos == info_data and size == 4:
+            crc_data = data_pos
+        pos = data_pos + size
+    
+    patches = []
+    new_info_end = info_end
+    if date_pos is not None:
+        patches.append((date_pos, value))
+    elif void is not None:
+        date_element, rest = _split_void(void[1], value)
+        patches.append((void[0], date_element + rest))
+    else:
+        split = None
+        if info_end < segment_end:
+            element_id, data_pos, size, _ = _read_ebml_header(f, info_end, segment_end)
+            if element_id == VOID_ID and size is not None:
+                split = _split_void(data_pos + size - info_end, value)
+        if split is None:
+            raise NativePatchError("tidak ada DateUTC atau Void untuk menulis tanggal")
+        date_element, rest = split
+        new_size = _encode_ebml_size(info_size + len(date_element), info_size_length)
+        if new_size is None:
+            raise NativePatchError("ukuran Info tidak muat untuk DateUTC baru")
+        
+        id_length = info_data - info_size_length - info_pos
+        patches.append((info_pos + id_length, new_size))
+        patches.append((info_end, date_element + rest))
+        new_info_end = info_end + len(date_element)
+    
+    if crc_data is not None:
+        # CRC-32 (little-endian) menutupi semua data Info setelah elemen CRC itu sendiri
+        covered_start = crc_data + 4
+        f.seek(covered_start)
+        covered = bytearray(f.read(new_info_end - covered_start))
+        for offset, data in patches:
+            start = max(offset, covered_start)
+            end = min(offset + len(data), new_info_end)
+            if start < end:
+                covered[start - covered_start:end - covered_start] = data[start - offset:end - offset]
+        patches.append((crc_data, struct.pack('<I', zlib.crc32(covered))))
+    
+    return patches
+
+# Tag TIFF/EXIF bertipe ASCII "YYYY:MM:DD HH:MM:SS\0" yang ditimpa (IFD0 + Exif IFD)
+TIFF_DATE_TAGS = frozenset({0x0132, 0x9003, 0x9004})
+DATE_TIME_ORIGINAL = 0x9003
+TIFF_ASCII = 2
+TIFF_DATE_LENGTH = 20
+EXIF_IFD_POINTER = 0x8769
+
+def plan_tiff_dates(data, tiff_start, new_datetime):
+    """
+    Rencana patch tag tanggal EXIF (DateTime, DateTimeOriginal, DateTimeDigitized)
+    di blok TIFF yang mulai di data[tiff_start]. Nilai ditimpa dengan panjang sama,
+    tag yang tidak ada tidak ditambahkan; tanpa DateTimeOriginal (tanggal yang dibaca
+    Google Photos) NativePatchError supaya file ditulis ExifTool.
+    Return list (offset di `data`, bytes).
+    """
+    byte_order = data[tiff_start:tiff_start + 2]
+    if byte_order == b'II':
+        endian = '<'
+    elif byte_order == b'MM':
+        endian = '>'
+    else:
+        raise NativePatchError("header TIFF tidak valid")
+    magic, ifd_offset = struct.unpack_from(endian + 'HI', data, tiff_start + 2)
+    if magic != 42:
+        raise NativePatchError("header TIFF tidak valid")
+    
+    value = new_datetime.strftime("%Y:%m:%d %H:%M:%S").encode('ascii') + b'\0'
+    patches = []
+    found = set()
+    # Hanya IFD0 dan Exif IFD; IFD1 (thumbnail) tidak punya tanggal yang dipakai
+    pending = [ifd_offset]
+    visited = set()
+    while pending:
+        ifd = tiff_start + pending.pop()
+        if ifd in visited or ifd + 2 > len(data):
+            continue
+        visited.add(ifd)
+        count = struct.unpack_from(endian + 'H', data, ifd)[0]
+        if ifd + 2 + 12 * count > len(data):
+            raise NativePatchError("IFD EXIF terpotong")
+        for index in range(count):
+            tag, tag_type, length, offset = struct.unpack_from(endian + 'HHII', data, ifd + 2 + 12 * index)
+            if tag == EXIF_IFD_POINTER:
+                pending.append(offset)
+            elif tag in TIFF_DATE_TAGS and tag_type == TIFF_ASCII and length >= TIFF_DATE_LENGTH:
+                if tiff_start + offset + length > len(data):
+                    raise NativePatchError("tag tanggal EXIF di luar blok")
+                patches.append((tiff_start + offset, value + b'\0' * (length - TIFF_DATE_LENGTH)))
+                found.add(tag)
+    
+    if DATE_TIME_ORIGINAL not in found:
+        raise NativePatchError("tag DateTimeOriginal tidak ditemukan")
+    return patches
+
+def _iter_boxes(f, start, end):
+    """Box ISOBMFF di [start, end): yield (type, posisi data, akhir box)"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, box_type = struct.unpack('>I4s', f.read(8))
+        data_pos = pos + 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            data_pos += 8
+        elif size == 0:
+            size = end - pos
+        if size < data_pos - pos or pos + size > end:
+            raise NativePatchError("box ISOBMFF tidak valid")
+        yield box_type, data_pos, pos + size
+        pos += size
+
+def _read_uint(data, pos, size):
+    """Integer big-endian `size` byte (0, 4 atau 8) dari data[pos]"""
+    return int.from_bytes(data[pos:pos + size], 'big'), pos + size
+
+def _find_exif_item(iinf):
+    """item_ID dari item bertipe 'Exif' di isi box iinf (tanpa header box)"""
+    version = iinf[0]
+    pos = 4 + (2 if version == 0 else 4)
+    while pos + 8 <= len(iinf):
+        size, box_type = struct.unpack_from('>I4s', iinf, pos)
+        if size < 8:
+            break
+        if box_type == b'infe' and iinf[pos + 8] >= 2:
+            id_size = 2 if iinf[pos + 8] == 2 else 4
+            item_id, item_pos = _read_uint(iinf, pos + 12, id_size)
+            if iinf[item_pos + 2:item_pos + 6] == b'Exif':
+                return item_id
+        pos += size
+    raise NativePatchError("item Exif tidak ditemukan di HEIF")
+
+def _find_item_extents(iloc, item_id):
+    """(construction_method, [(offset, length), ...]) untuk item_id dari isi box iloc"""
+    version = iloc[0]
+    offset_size, length_size = iloc[4] >> 4, iloc[4] & 0x0F
+    base_offset_size = iloc[5] >> 4
+    index_size = iloc[5] & 0x0F if version in (1, 2) else 0
+    pos = 6
+    item_count, pos = _read_uint(iloc, pos, 2 if version < 2 else 4)
+    for _ in range(item_count):
+        current_id, pos = _read_uint(iloc, pos, 2 if version < 2 else 4)
+        construction_method = 0
+        if version in (1, 2):
+            construction_method = iloc[pos + 1] & 0x0F
+            pos += 2
+        pos += 2  # data_reference_index
+        base_offset, pos = _read_uint(iloc, pos, base_offset_size)
+        extent_count, pos = _read_uint(iloc, pos, 2)
+        extents = []
+        for _ in range(extent_count):
+            pos += index_size
+            extent_offset, pos = _read_uint(iloc, pos, offset_size)
+            extent_length, pos = _read_uint(iloc, pos, length_size)
+            extents.append((base_offset + extent_offset, extent_length))
+        if current_id == item_id:
+            return construction_method, extents
+    raise NativePatchError("lokasi item Exif tidak ditemukan di iloc")
+
+def plan_heif_exif_dates(f, new_datetime):
+    """
+    Rencana patch tanggal EXIF di file HEIC/AVIF yang sudah dibuka (mode baca).
+    Item 'Exif' dicari lewat meta/iinf, lokasinya lewat meta/iloc (langsung di file
+    atau di dalam idat), lalu tag tanggal di blok TIFF-nya ditimpa (plan_tiff_dates).
+    Return list (offset, bytes).
+    """
+    f.seek(0, 2)
+    file_size = f.tell()
+    meta = next((box for box in _iter_boxes(f, 0, file_size) if box[0] == b'meta'), None)
+    if meta is None:
+        raise NativePatchError("box meta tidak ditemukan di HEIF")
+    
+    children = {}
+    for box_type, data_pos, box_end in _iter_boxes(f, meta[1] + 4, meta[2]):
+        children.setdefault(box_type, (data_pos, box_end))
+    if b'iinf' not in children or b'iloc' not in children:
+        raise NativePatchError("box iinf/iloc tidak ditemukan di HEIF")
+    
+    def read_box(box_type):
+        data_pos, box_end = children[box_type]
+        f.seek(data_pos)
+        return f.read(box_end - data_pos)
+    
+    construction_method, extents = _find_item_extents(read_box(b'iloc'), _find_exif_item(read_box(b'iinf')))
+    if len(extents) != 1:
+        raise NativePatchError("item Exif terpecah di beberapa extent")
+    offset, length = extents[0]
+    if construction_method == 1:
+        if b'idat' not in children:
+            raise NativePatchError("box idat tidak ditemukan di HEIF")
+        offset += children[b'idat'][0]
+    elif construction_method != 0:
+        raise NativePatchError("item Exif memakai construction_method yang tidak didukung")
+    if length == 0 or offset + length > file_size:
+        raise NativePatchError("item Exif di luar file")
+    
+    # Isi item Exif: offset header TIFF (uint32) lalu biasanya "Exif\0\0" + TIFF
+    f.seek(offset)
+    data = f.read(length)
+    tiff_start = 4 + struct.unpack_from('>I', data, 0)[0]
+    return [(offset + position, value) for position, value in plan_tiff_dates(data, tiff_start, new_datetime)]
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def _png_chunk(chunk_type, data):
+    """Chunk PNG lengkap: panjang + tipe + data + CRC"""
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+def png_time_value(new_datetime):
+    """Isi chunk tIME (7 byte, UTC sesuai spesifikasi PNG) untuk tanggal lokal"""
+    utc = time.gmtime(time.mktime(new_datetime.timetuple()))
+    return struct.pack('>HBBBBB', utc.tm_year, utc.tm_mon, utc.tm_mday, utc.tm_hour, utc.tm_min, utc.tm_sec)
+
+def build_tiff_dates(new_datetime):
+    """Blok TIFF minimal (big-endian): IFD0 DateTime + Exif IFD DateTimeOriginal/DateTimeDigitized"""
+    value = new_datetime.strftime("%Y:%m:%d %H:%M:%S").encode('ascii') + b'\0'
+    exif_ifd = 8 + 30
+    strings = exif_ifd + 30
+    return (b'MM' + struct.pack('>HI', 42, 8)
+            + struct.pack('>H', 2)
+            + struct.pack('>HHII', 0x0132, TIFF_ASCII, TIFF_DATE_LENGTH, strings)
+            + struct.pack('>HHII', EXIF_IFD_POINTER, 4, 1, exif_ifd) + struct.pack('>I', 0)
+            + struct.pack('>H', 2)
+            + struct.pack('>HHII', DATE_TIME_ORIGINAL, TIFF_ASCII, TIFF_DATE_LENGTH, strings + TIFF_DATE_LENGTH)
+            + struct.pack('>HHII', 0x9004, TIFF_ASCII, TIFF_DATE_LENGTH, strings + 2 * TIFF_DATE_LENGTH)
+            + struct.pack('>I', 0)
+            + value * 3)
+
+def plan_png_dates(f, new_datetime):
+    """
+    Rencana tulis tanggal PNG di file yang sudah dibuka (mode baca).
+    - tIME / eXIf yang sudah ada ditimpa di tempat (isi + CRC chunk)
+    - tIME / eXIf yang belum ada disisipkan tepat setelah IHDR (eXIf harus sebelum IDAT)
+    Hanya header chunk yang dibaca, data IDAT dilewati dengan seek.
+    Return NativePlan.
+    """
+    f.seek(0, 2)
+    file_size = f.tell()
+    f.seek(0)
+    if f.read(8) != PNG_SIGNATURE:
+        raise NativePatchError("bukan file PNG")
+    
+    ihdr_end = None
+    chunks = {}
+    pos = 8
+    while pos + 12 <= file_size:
+        f.seek(pos)
+        length, chunk_type = struct.unpack('>I4s', f.read(8))
+        chunk_end = pos + 12 + length
+        if chunk_end > file_size:
+            raise NativePatchError("chunk PNG terpotong")
+        if chunk_type == b'IHDR':
+            ihdr_end = chunk_end
+        elif chunk_type in (b'tIME', b'eXIf') and chunk_type not in chunks:
+            chunks[chunk_type] = (pos + 8, length)
+        elif chunk_type == b'IEND':
+            break
+        pos = chunk_end
+    if ihdr_end is None:
+        raise NativePatchError("chunk IHDR tidak ditemukan")
+    
+    patches = []
+    inserts = []
+    
+    if b'eXIf' in chunks:
+        data_pos, length = chunks[b'eXIf']
+        f.seek(data_pos)
+        data = bytearray(f.read(length))
+        for offset, value in plan_tiff_dates(data, 0, new_datetime):
+            data[offset:offset + len(value)] = value
+            patches.append((data_pos + offset, value))
+        patches.append((data_pos + length, struct.pack('>I', zlib.crc32(b'eXIf' + data))))
+    else:
+        inserts.append((ihdr_end, _png_chunk(b'eXIf', build_tiff_dates(new_datetime))))
+    
+    time_value = png_time_value(new_datetime)
+    if b'tIME' in chunks and chunks[b'tIME'][1] == len(time_value):
+        data_pos = chunks[b'tIME'][0]
+        patches.append((data_pos, time_value))
+        patches.append((data_pos + len(time_value), struct.pack('>I', zlib.crc32(b'tIME' + time_value))))
+    elif b'tIME' in chunks:
+        raise NativePatchError("chunk tIME bukan 7 byte")
+    else:
+        inserts.append((ihdr_end, _png_chunk(b'tIME', time_value)))
+    
+    return NativePlan(patches, inserts)
+
+def plan_native_patch(path, file_format, new_datetime):
+    """Rencana tulis tanggal (NativePlan) untuk file berjenis `file_format`"""
+    if file_format not in NATIVE_FORMATS:
+        raise NativePatchError(f"format {file_format} tidak didukung patcher native")
+    with open(path, 'rb') as f:
+        if file_format in PNG_FORMATS:
+            return plan_png_dates(f, new_datetime)
+        if file_format in HEIF_FORMATS:
+            return NativePlan(plan_heif_exif_dates(f, new_datetime), [])
+        return NativePlan(plan_matroska_date(f, new_datetime), [])
+
+def apply_patches(path, patches):
+    """Timpa patch (offset, bytes) di tempat lewat mmap; ukuran file tidak berubah"""
+    if not patches:
+        return
+    with open(path, 'r+b') as f, mmap.mmap(f.fileno(), 0) as mapped:
+        for offset, data in patches:
+            mapped[offset:offset + len(data)] = data
+        mapped.flush()
+
+def _copy_range(fsrc, fdst, length, buffer):
+    """Salin `length` byte dari posisi fsrc sekarang ke fdst"""
+    view = memoryview(buffer)
+    while length > 0:
+        read = fsrc.readinto(view[:min(len(buffer), length)])
+        if not read:
+            raise OSError("file sumber berubah saat disalin")
+        fdst.write(view[:read])
+        length -= read
+
+def write_with_inserts(source_path, target_path, plan, buffer_size=NATIVE_COPY_BUFFER_SIZE):
+    """
+    Tulis ulang source ke target sambil menyisipkan plan.inserts (satu pass streaming),
+    lalu plan.patches ditimpa di target dengan offset yang sudah digeser. Return jumlah byte target.
+    """
+    inserts = sorted(plan.inserts, key=lambda insert: insert[0])
+    buffer = bytearray(buffer_size)
+    with open(source_path, 'rb') as fsrc, open(target_path, 'wb') as fdst:
+        pos = 0
+        for offset, data in inserts:
+            _copy_range(fsrc, fdst, offset - pos, buffer)
+            fdst.write(data)
+            pos = offset
+        while True:
+            read = fsrc.readinto(buffer)
+            if not read:
+                break
+            fdst.write(memoryview(buffer)[:read])
+        written = fdst.tell()
+    
+    shifted = [(offset + sum(len(data) for insert_offset, data in inserts if insert_offset <= offset), value)
+               for offset, value in plan.patches]
+    apply_patches(target_path, shifted)
+    return written
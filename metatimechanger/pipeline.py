@@ -0,0 +1,604 @@
+"""Pipeline pemrosesan: writer background, API retime(), dan penggabungan shard."""
+
+import os
+import re
+import json
+import glob
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from .engines import (ERROR_OTHER, ERROR_UNSUPPORTED, RETRY_QUEUE_DELAY, TRANSIENT_ERRORS, OutputLayout,
+                      ToolChecker, classify_tool_error, engine_supports, find_duplicate_files,
+                      link_or_copy, restore_exif_tags, restore_file_times, run_ffmpeg_jobs, select_tool,
+                      set_file_times, snapshot_originals, write_files_metadata, write_xmp_sidecars)
+from .extraction import infer_undated_datetimes, smart_extract_datetime_detail
+from .scanner import SHARD_DIR_NAME, VIDEO_EXTENSIONS, VIDEO_FORMATS, sniff_file_type
+from .snapshot import SnapshotLog, mark_rolled_back, read_snapshot, snapshot_path
+
+class BackgroundWriter:
+    """
+    Worker thread untuk menulis metadata.
+    File yang tanggalnya sudah pasti langsung diproses di background,
+    sementara user masih menjawab pertanyaan untuk file lain.
+    Job yang sudah mengantri diambil sekaligus; prepare(jobs) dipanggil sekali
+    untuk kumpulan itu sebelum job ditulis (mis. snapshot tag asli dalam satu langkah).
+    """
+    
+    def __init__(self, write_func, prepare=None):
+        # write_func(entries, datetime, tool, file_format) -> list hasil
+        self.write_func = write_func
+        self.prepare = prepare
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def submit(self, entries, datetime_obj, selected_tool, file_format=None):
+        """entries: list (filename, file_path) berjenis file_format yang ditulis dengan tanggal sama"""
+        self.jobs.put((entries, datetime_obj, selected_tool, file_format))
+    
+    def _take_jobs(self):
+        """Satu job (menunggu), plus semua job lain yang sudah ada di antrian; None = berhenti"""
+        jobs = [self.jobs.get()]
+        while jobs[-1] is not None:
+            try:
+                jobs.append(self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        return jobs
+    
+    def _run(self):
+        while True:
+            jobs = self._take_jobs()
+            stop = jobs[-1] is None
+            if stop:
+                jobs.pop()
+            
+            prepare_error = None
+            if jobs and self.prepare is not None:
+                try:
+                    self.prepare(jobs)
+                except Exception as e:
+                    prepare_error = e
+            
+            for entries, datetime_obj, selected_tool, file_format in jobs:
+                try:
+                    if prepare_error is not None:
+                        raise prepare_error
+                    results = self.write_func(entries, datetime_obj, selected_tool, file_format)
+                except Exception as e:
+                    results = [{'filename': filename, 'file_path': file_path, 'engine': selected_tool,
+                                'status': 'failed', 'output': None, 'bytes': 0, 'seconds': 0.0,
+                                'duration': 0.0, 'error': str(e), 'error_kind': ERROR_OTHER} for filename, file_path in entries]
+                for result in results:
+                    self.results.put(result)
+            if stop:
+                break
+    
+    def finished_results(self):
+        """Ambil hasil yang sudah selesai tanpa menunggu"""
+        finished = []
+        while True:
+            try:
+                finished.append(self.results.get_nowait())
+            except queue.Empty:
+                return finished
+    
+    def stop(self):
+        """Tidak ada job baru lagi; thread berhenti setelah antrian habis"""
+        self.jobs.put(None)
+    
+    def wait(self, timeout):
+        """Tunggu thread maksimal `timeout` detik; True jika masih bekerja"""
+        self.thread.join(timeout)
+        return self.thread.is_alive()
+    
+    def close(self, poll=None, interval=0.1):
+        """Tunggu semua job selesai; poll() dipanggil tiap `interval` detik selama menunggu"""
+        self.stop()
+        while self.wait(interval):
+            if poll is not None:
+                poll()
+
+# Hasil retime() per file. status: "ok" / "failed" / "skipped"
+Result = namedtuple('Result', ['path', 'datetime', 'pattern', 'engine', 'status',
+                               'output', 'bytes', 'duration', 'error', 'error_kind'])
+
+# Kelompok file yang tanggalnya sudah ditentukan pemanggil (mis. jawaban user),
+# sebagai item untuk retime()
+Dated = namedtuple('Dated', ['paths', 'datetime', 'pattern'])
+
+class RetimePolicy:
+    """
+    Aturan untuk retime().
+    - output_folder: folder hasil (file asli tidak dipindah)
+    - tool: "auto" / "exiftool" / "ffmpeg" / "basic" / "sidecar" / "native"
+    - exiftool_path / ffmpeg_path: None = dicari otomatis saat retime() dipanggil
+      (kecuali detect_tools=False)
+    - infer_undated: file tanpa tanggal diperkirakan dari tetangga dalam `paths`
+    - infer_max_gap_hours: jarak maksimal (jam) kedua tetangga untuk inferensi
+      (None = INFER_MAX_GAP_HOURS)
+    - fallback: callable(path) -> datetime atau None, untuk file yang tetap tanpa tanggal
+    - dedupe: file dengan isi sama hanya ditulis sekali, hasilnya di-hardlink/copy
+      untuk duplikatnya
+    - sync_times: atime/mtime file output diisi tanggal metadata (engine basic selalu)
+    - layout: pattern subfolder output dari tanggal, mis. "{Y}/{m}/{d}" (None = flat),
+      atau OutputLayout yang sudah ada
+    - snapshot: waktu & tag asli file yang ditimpa ExifTool dicatat ke
+      output_folder/.metatimechanger/ untuk rollback_snapshot(); bisa juga
+      SnapshotLog milik pemanggil (tidak ditutup oleh retime)
+    - progress_factory: callable(filename, path) -> callback progress copy atau None
+    - log: callable(pesan) untuk info scheduler FFmpeg dan antrian ulang
+    """
+    
+    def __init__(self, output_folder, tool="auto", exiftool_path=None, ffmpeg_path=None,
+                 detect_tools=True, infer_undated=False, fallback=None, dedupe=False,
+                 sync_times=True, layout=None, snapshot=True, progress_factory=None, log=None,
+                 infer_max_gap_hours=None):
+        self.output_folder = output_folder
+        self.tool = tool
+        self.exiftool_path = exiftool_path
+        self.ffmpeg_path = ffmpeg_path
+        self.detect_tools = detect_tools
+        self.infer_undated = infer_undated
+        self.infer_max_gap_hours = infer_max_gap_hours
+        self.fallback = fallback
+        self.dedupe = dedupe
+        self.sync_times = sync_times
+        self.layout = layout
+        self.snapshot = snapshot
+        self.progress_factory = progress_factory
+        self.log = log
+
+def retime(paths, policy, duplicates=None):
+    """
+    API programatik: ubah tanggal metadata file berdasarkan nama file, tanpa UI.
+    paths: path file (tanggal dari nama file tanpa pertanyaan; file tanpa tanggal
+    di-skip atau memakai policy.fallback), dan/atau Dated(paths, datetime, pattern)
+    untuk kelompok file yang tanggalnya sudah ditentukan pemanggil.
+    Item dikonsumsi bertahap: file yang sudah siap ditulis di background selama
+    item berikutnya belum tersedia (mis. masih menunggu jawaban user), dan Result
+    yang sudah selesai dikembalikan sebelum item berikutnya diminta.
+    duplicates: {path utama: [(filename, path duplikat)]} dari find_duplicate_files;
+    jika None dan policy.dedupe, dihitung dari paths.
+    Return iterator Result, satu per file, urut selesai.
+    """
+    exiftool_path = policy.exiftool_path
+    ffmpeg_path = policy.ffmpeg_path
+    if policy.detect_tools:
+        if exiftool_path is None:
+            _, exiftool_path, _ = ToolChecker.check_exiftool()
+        if ffmpeg_path is None:
+            _, ffmpeg_path, _ = ToolChecker.check_ffmpeg()
+    os.makedirs(policy.output_folder, exist_ok=True)
+    
+    layout = policy.layout
+    if not isinstance(layout, OutputLayout):
+        layout = OutputLayout(policy.output_folder, layout)
+    snapshot = policy.snapshot
+    own_snapshot = snapshot is True
+    if own_snapshot:
+        snapshot = SnapshotLog(snapshot_path(policy.output_folder))
+    elif not snapshot:
+        snapshot = None
+    
+    if duplicates is None and policy.dedupe:
+        paths = list(paths)
+        unique, duplicates = find_duplicate_files([(os.path.basename(path), path) for path in paths
+                                                   if not isinstance(path, Dated)])
+        keep = {path for _, path in unique}
+        paths = [path for path in paths if isinstance(path, Dated) or path in keep]
+    
+    run = _RetimeRun(policy, layout, snapshot, exiftool_path, ffmpeg_path)
+    try:
+        items = iter(_dated_items(paths, policy))
+        while True:
+            # Hasil yang sudah selesai dikirim dulu: item berikutnya bisa menunggu input user
+            yield from run.drain()
+            item = next(items, None)
+            if item is None:
+                break
+            if isinstance(item, Result):
+                yield item
+            else:
+                run.submit(item)
+        yield from run.finish(duplicates or {})
+    finally:
+        run.close()
+        if own_snapshot:
+            snapshot.close()
+
+def _dated_items(paths, policy):
+    """Tanggal per path dari nama file (+ inferensi / fallback): Dated, atau Result skipped"""
+    extracted = {}
+    inferred = {}
+    if policy.infer_undated:
+        # Inferensi butuh seluruh daftar untuk melihat tetangga
+        paths = list(paths)
+        plain = [path for path in paths if not isinstance(path, Dated)]
+        for path in plain:
+            extracted[path] = smart_extract_datetime_detail(os.path.basename(path))
+        by_index = infer_undated_datetimes([os.path.basename(path) for path in plain],
+                                           [extracted[path][0] for path in plain],
+                                           max_gap_hours=policy.infer_max_gap_hours)
+        inferred = {plain[index]: value for index, value in by_index.items()}
+    
+    for path in paths:
+        if isinstance(path, Dated):
+            yield path
+            continue
+        
+        detail = extracted.get(path)
+        if detail is None:
+            detail = smart_extract_datetime_detail(os.path.basename(path))
+        datetime_obj, _, pattern_name = detail
+        if datetime_obj is None and path in inferred:
+            datetime_obj, pattern_name = inferred[path], "inferred"
+        if datetime_obj is None and policy.fallback is not None:
+            datetime_obj = policy.fallback(path)
+            pattern_name = "fallback" if datetime_obj else None
+        
+        if datetime_obj is None:
+            yield Result(path, None, None, None, 'skipped', None, 0, 0.0,
+                         "tanggal tidak ditemukan di nama file", None)
+        else:
+            yield Dated([path], datetime_obj, pattern_name)
+
+class _RetimeRun:
+    """
+    Isi retime(): pilih engine per jenis file, tulis di background, lalu tahap
+    akhir (fallback native, scheduler FFmpeg, antrian ulang, sidecar, duplikat).
+    Waktu filesystem diatur per kumpulan hasil yang selesai, satu set_file_times.
+    """
+    
+    def __init__(self, policy, layout, snapshot, exiftool_path, ffmpeg_path):
+        self.policy = policy
+        self.layout = layout
+        self.snapshot = snapshot
+        self.exiftool_path = exiftool_path
+        self.ffmpeg_path = ffmpeg_path
+        self.dates = {}
+        self.patterns = {}
+        # Jenis file asli per path, di-sniff sekali saat submit dan dibawa ke semua tahap
+        self.formats = {}
+        self.outputs = {}
+        self.synced = set()
+        self.linked = set()
+        self.ready = []
+        self.pending_sidecars = []
+        self.pending_ffmpeg = []
+        self.native_fallbacks = []
+        self.retry_writes = []
+        self.retry_ffmpeg = []
+        self.retrying = False
+        self.writer = BackgroundWriter(self.write_job, prepare=self.snapshot_jobs)
+    
+    def snapshot_jobs(self, jobs):
+        """Nilai asli semua file ExifTool di kumpulan job dicatat dengan satu pembacaan tag"""
+        if self.snapshot is None:
+            return
+        groups = [([path for _, path in entries], file_format)
+                  for entries, _, selected_tool, file_format in jobs if selected_tool == "exiftool"]
+        if groups:
+            snapshot_originals(self.snapshot, self.exiftool_path, groups)
+    
+    def write_job(self, entries, datetime_obj, selected_tool, file_format):
+        # Snapshot biasanya sudah dicatat oleh snapshot_jobs untuk seluruh kumpulan job;
+        # file yang pembacaan batch-nya gagal dibaca ulang per job, dan tidak ditimpa
+        # jika tetap gagal
+        return write_files_metadata(entries, datetime_obj, selected_tool, self.policy.output_folder,
+                                    exiftool_path=self.exiftool_path,
+                                    progress_factory=self.policy.progress_factory,
+                                    layout=self.layout, snapshot=self.snapshot, file_format=file_format)
+    
+    def write_jobs(self, jobs):
+        """Tulis job di luar writer (fallback, antrian ulang) dengan snapshot yang sama"""
+        self.snapshot_jobs(jobs)
+        for job in jobs:
+            self._collect(self.write_job(*job))
+    
+    def submit(self, dated):
+        """Kirim satu Dated ke engine yang sesuai"""
+        for path in dated.paths:
+            self.dates[path] = dated.datetime
+            self.patterns[path] = dated.pattern
+        
+        # Engine dipilih dari jenis file asli (magic bytes), bukan ekstensi;
+        # satu kelompok per jenis+ekstensi supaya batch ExifTool memakai profil yang benar
+        by_format = {}
+        for path in dated.paths:
+            self.formats[path] = sniff_file_type(path)
+            key = (self.formats[path], os.path.splitext(path)[1].lower())
+            by_format.setdefault(key, []).append((os.path.basename(path), path))
+        for (file_format, ext), entries in by_format.items():
+            self._route(entries, dated.datetime, file_format, ext)
+    
+    def _route(self, entries, datetime_obj, file_format, ext):
+        is_video = file_format in VIDEO_FORMATS if file_format else ext in VIDEO_EXTENSIONS
+        selected_tool = select_tool(self.policy.tool, is_video, self.exiftool_path is not None,
+                                    self.ffmpeg_path is not None, file_format, ext)
+        
+        if not engine_supports(selected_tool, file_format, ext):
+            for _, path in entries:
+                self.ready.append(self._result(path, selected_tool, 'failed',
+                                               error=f"{selected_tool} tidak bisa menulis file {file_format} ({ext})",
+                                               error_kind=ERROR_UNSUPPORTED))
+        
+        # Sidecar ditulis sekaligus setelah semua file selesai ditentukan tanggalnya
+        elif selected_tool == "sidecar":
+            self.pending_sidecars.extend(entries)
+        
+        # Remux FFmpeg dijalankan scheduler setelah semua file ditentukan
+        elif selected_tool == "ffmpeg" and self.ffmpeg_path and is_video:
+            self.pending_ffmpeg.extend((filename, path, datetime_obj) for filename, path in entries)
+        
+        elif (selected_tool == "exiftool" and self.exiftool_path) or selected_tool in ("basic", "native"):
+            self.writer.submit(entries, datetime_obj, selected_tool, file_format)
+        
+        else:
+            for _, path in entries:
+                self.ready.append(self._result(path, selected_tool, 'skipped',
+                                               error=f"tool {selected_tool} tidak tersedia"))
+    
+    def _result(self, path, engine, status, output=None, size=0, duration=0.0, error=None, error_kind=None):
+        return Result(path, self.dates.get(path), self.patterns.get(path), engine, status,
+                      output, size, duration, error, error_kind)
+    
+    def _collect(self, write_results):
+        """Hasil write_files_metadata -> Result; gagal sementara / native tidak bisa ditunda"""
+        for result in write_results:
+            path = result['file_path']
+            # Gagal sementara (file terkunci / timeout): masuk antrian ulang di akhir
+            if result['status'] != 'ok' and result['error_kind'] in TRANSIENT_ERRORS and not self.retrying:
+                self.retry_writes.append((result['filename'], path, result['engine']))
+                continue
+            # Struktur yang tidak bisa di-patch native (mis. MKV tanpa Void, HEIC tanpa EXIF):
+            # mode auto menulis ulang dengan tool berikutnya setelah writer selesai
+            if (result['engine'] == "native" and result['error_kind'] == ERROR_UNSUPPORTED
+                    and not self.retrying and self.policy.tool == "auto"):
+                self.native_fallbacks.append((result['filename'], path))
+                continue
+            self.ready.append(self._result(path, result['engine'], result['status'], result['output'],
+                                           result['bytes'], result['duration'],
+                                           result['error'], result['error_kind']))
+    
+    def drain(self):
+        """Result yang sudah selesai (tanpa menunggu), setelah waktu filesystem-nya diatur"""
+        self._collect(self.writer.finished_results())
+        ready, self.ready = self.ready, []
+        
+        # Tahap waktu filesystem: satu set_file_times untuk semua hasil yang selesai
+        targets = {}
+        for result in ready:
+            if result.status != 'ok' or not result.output:
+                continue
+            self.outputs[result.path] = result.output
+            # Duplikat ikut diatur hanya jika hasil file utamanya juga diatur
+            if result.engine == "link":
+                if result.output in self.linked:
+                    targets[result.output] = result.datetime
+            elif result.engine != "sidecar" and (self.policy.sync_times or result.engine == "basic"):
+                targets[result.output] = result.datetime
+        failed = {path: (error_kind, message) for path, error_kind, message in set_file_times(targets.items())}
+        self.synced.update(path for path in targets if path not in failed)
+        
+        for result in ready:
+            if result.output in failed:
+                error_kind, message = failed[result.output]
+                result = result._replace(error=f"gagal mengatur waktu file: {message}", error_kind=error_kind)
+            yield result
+    
+    def finish(self, duplicates):
+        """Tunggu writer, lalu jalankan tahap akhir; yield Result sampai semua file selesai"""
+        self.writer.stop()
+        while self.writer.wait(0.1):
+            yield from self.drain()
+        yield from self.drain()
+        
+        # Fallback native: dikelompokkan per tanggal + jenis file supaya ExifTool tetap batch
+        fallback_groups = {}
+        for filename, path in self.native_fallbacks:
+            file_format = self.formats[path]
+            ext = os.path.splitext(filename)[1].lower()
+            selected_tool = select_tool(self.policy.tool, file_format in VIDEO_FORMATS,
+                                        self.exiftool_path is not None, self.ffmpeg_path is not None,
+                                        file_format, ext, native=False)
+            if selected_tool == "ffmpeg":
+                self.pending_ffmpeg.append((filename, path, self.dates[path]))
+            else:
+                fallback_groups.setdefault((self.dates[path], file_format, ext, selected_tool), []).append((filename, path))
+        self.write_jobs([(entries, datetime_obj, selected_tool, file_format)
+                         for (datetime_obj, file_format, _, selected_tool), entries in fallback_groups.items()])
+        yield from self.drain()
+        
+        if self.pending_ffmpeg:
+            self._run_ffmpeg(self.pending_ffmpeg)
+            yield from self.drain()
+        
+        # Antrian ulang: file yang tetap gagal sementara setelah retry inline
+        # (mis. masih dikunci di SMB share) dicoba sekali lagi setelah jeda
+        if self.retry_writes or self.retry_ffmpeg:
+            if self.policy.log is not None:
+                retry_total = len(self.retry_writes) + len(self.retry_ffmpeg)
+                self.policy.log(f"Mengulang {retry_total} file yang gagal sementara "
+                                f"(tunggu {RETRY_QUEUE_DELAY:.0f} detik)")
+            time.sleep(RETRY_QUEUE_DELAY)
+            self.retrying = True
+            self.write_jobs([([(filename, path)], self.dates[path], selected_tool, self.formats[path])
+                             for filename, path, selected_tool in self.retry_writes])
+            if self.retry_ffmpeg:
+                self._run_ffmpeg(self.retry_ffmpeg)
+            yield from self.drain()
+        
+        if self.pending_sidecars:
+            self._write_sidecars()
+            yield from self.drain()
+        
+        self._link_duplicates(duplicates)
+        yield from self.drain()
+    
+    def _run_ffmpeg(self, jobs):
+        source_paths = {filename: path for filename, path, _ in jobs}
+        for filename, success, seconds, error_kind, message in run_ffmpeg_jobs(
+                self.ffmpeg_path, jobs, self.policy.output_folder, log=self.policy.log, layout=self.layout):
+            path = source_paths[filename]
+            if success:
+                output_path = self.layout.path_for(filename, self.dates[path], path)
+                self.ready.append(self._result(path, "ffmpeg", 'ok', output_path,
+                                               os.path.getsize(output_path), seconds))
+            elif error_kind in TRANSIENT_ERRORS and not self.retrying:
+                self.retry_ffmpeg.append((filename, path, self.dates[path]))
+            else:
+                self.ready.append(self._result(path, "ffmpeg", 'failed', duration=seconds,
+                                               error=message, error_kind=error_kind))
+    
+    def _write_sidecars(self):
+        written, failed = write_xmp_sidecars([(filename, self.dates[path]) for filename, path in self.pending_sidecars],
+                                             self.policy.output_folder, layout=self.layout)
+        source_paths = {filename: path for filename, path in self.pending_sidecars}
+        for filename in written:
+            path = source_paths[filename]
+            self.ready.append(self._result(path, "sidecar", 'ok',
+                                           self.layout.path_for(filename + '.xmp', self.dates[path])))
+        for filename in failed:
+            self.ready.append(self._result(source_paths[filename], "sidecar", 'failed',
+                                           error="gagal menulis sidecar", error_kind=ERROR_OTHER))
+    
+    def _link_duplicates(self, duplicates):
+        """Duplikat: pakai hasil file utama, tanpa exiftool/ffmpeg lagi"""
+        for primary_path, duplicate_files in duplicates.items():
+            primary_output = self.outputs.get(primary_path)
+            for filename, path in duplicate_files:
+                self.dates[path] = self.dates.get(primary_path)
+                self.patterns[path] = self.patterns.get(primary_path)
+                if primary_output is None:
+                    self.ready.append(self._result(path, "link", 'skipped', error="file utama gagal"))
+                    continue
+                
+                target_name = filename + '.xmp' if primary_output.endswith('.xmp') else filename
+                started = time.perf_counter()
+                try:
+                    target_path = self.layout.path_for(target_name, self.dates[path], path)
+                    link_or_copy(primary_output, target_path)
+                except OSError as e:
+                    self.ready.append(self._result(path, "link", 'failed', error=str(e),
+                                                   error_kind=classify_tool_error(exc=e)))
+                    continue
+                if primary_output in self.synced:
+                    self.linked.add(target_path)
+                self.ready.append(self._result(path, "link", 'ok', target_path,
+                                               duration=time.perf_counter() - started))
+    
+    def close(self):
+        """Hentikan writer jika retime() dihentikan di tengah jalan"""
+        if self.writer.thread.is_alive():
+            self.writer.stop()
+
+_SHARD_FILE_RE = re.compile(r'shard-(\d+)-of-(\d+)\.(journal\.jsonl|report\.json)$')
+
+def merge_shards(output_folder):
+    """
+    Gabungkan journal dan report semua shard di output folder jadi
+    merged.journal.jsonl dan merged.report.json.
+    Untuk file yang muncul berkali-kali (shard dijalankan ulang), event terakhir yang dipakai.
+    File dikenali dari path relatif terhadap folder input (seperti shard_of), jadi shard
+    yang dijalankan ulang dari mesin atau mount point lain tidak terhitung dua kali.
+    Return dict report gabungan.
+    """
+    shard_dir = os.path.join(output_folder, SHARD_DIR_NAME)
+    journals = {}
+    reports = {}
+    for path in sorted(glob.glob(os.path.join(shard_dir, "shard-*"))):
+        match = _SHARD_FILE_RE.search(os.path.basename(path))
+        if not match:
+            continue
+        key = (int(match.group(1)), int(match.group(2)))
+        if match.group(3) == "report.json":
+            reports[key] = path
+        else:
+            journals[key] = path
+    
+    counts = {count for _, count in set(journals) | set(reports)}
+    if len(counts) > 1:
+        raise ValueError(f"jumlah shard berbeda-beda di {shard_dir}: {sorted(counts)}")
+    count = counts.pop() if counts else 0
+    if not count:
+        return {'shards': 0}
+    
+    latest = {}
+    for key in sorted(journals):
+        with open(journals[key], encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Baris terakhir bisa terpotong jika shard terhenti mendadak
+                    continue
+                if record.get('event') == 'file':
+                    # Journal lama belum punya 'relative', jatuh ke path absolut
+                    path = record.get('relative', record['file'])
+                    latest.pop(path, None)
+                    latest[path] = record
+    
+    merged = {
+        'shards': count,
+        'missing_shards': [index for index in range(1, count + 1) if (index, count) not in reports],
+        'total': 0,
+        'processed': 0,
+        'skipped': 0,
+        'bytes': 0,
+        'patterns': {},
+        'hosts': {},
+        'statuses': {},
+    }
+    for key in sorted(reports):
+        with open(reports[key], encoding='utf-8') as f:
+            report = json.load(f)
+        for field in ('total', 'processed', 'skipped', 'bytes'):
+            merged[field] += report.get(field, 0)
+        for name, hits in report.get('patterns', {}).items():
+            merged['patterns'][name] = merged['patterns'].get(name, 0) + hits
+        merged['hosts'][f"{key[0]}/{key[1]}"] = report.get('host')
+    for record in latest.values():
+        merged['statuses'][record['status']] = merged['statuses'].get(record['status'], 0) + 1
+    
+    with open(os.path.join(shard_dir, "merged.journal.jsonl"), 'w', encoding='utf-8') as f:
+        for record in latest.values():
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    with open(os.path.join(shard_dir, "merged.report.json"), 'w', encoding='utf-8') as f:
+        json.dump(merged, f, ensure_ascii=False, indent=2)
+    
+    return merged
+
+def rollback_snapshot(path, exiftool_path=None):
+    """
+    Kembalikan semua file di satu snapshot ke kondisi sebelum run:
+    tag tanggal asli lewat satu proses exiftool (restore_exif_tags), lalu
+    atime/mtime asli lewat os.utime (restore_file_times) -- urutan ini
+    penting karena ExifTool menulis ulang file.
+    Snapshot diberi akhiran .rolledback setelah selesai.
+    Return dict: files, tags_restored, tags_failed (list path), times_failed
+    (list (path, error_kind, pesan)), snapshot (path baru).
+    """
+    entries = read_snapshot(path)
+    tag_entries = [(file_path, tags) for file_path, _, _, tags in entries if tags]
+    if tag_entries and exiftool_path is None:
+        _, exiftool_path, _ = ToolChecker.check_exiftool()
+        if exiftool_path is None:
+            raise OSError("exiftool dibutuhkan untuk mengembalikan tag tanggal")
+    
+    restored, tags_failed = restore_exif_tags(exiftool_path, tag_entries)
+    times_failed = restore_file_times((file_path, atime_ns, mtime_ns)
+                                      for file_path, atime_ns, mtime_ns, _ in entries)
+    return {
+        'files': len(entries),
+        'tags_restored': restored,
+        'tags_failed': tags_failed,
+        'times_failed': times_failed,
+        'snapshot': mark_rolled_back(path),
+    }
@@ -0,0 +1,257 @@
+"""Scan folder input: ekstensi yang didukung, pembagian shard, pemantauan folder."""
+
+import os
+import re
+import sys
+import time
+import hashlib
+import select
+import struct
+import ctypes
+import ctypes.util
+
+VIDEO_EXTENSIONS = frozenset({'.mp4', '.mov', '.avi', '.mkv', '.m4v', '.wmv', '.flv', '.3gp', '.webm'})
+PHOTO_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.heic', '.gif', '.bmp', '.tiff', '.webp'})
+MEDIA_EXTENSIONS = VIDEO_EXTENSIONS | PHOTO_EXTENSIONS
+
+# Jenis file asli hasil sniff_file_type()
+VIDEO_FORMATS = frozenset({'mp4', 'mov', 'm4v', '3gp', 'mkv', 'webm', 'avi', 'wmv', 'flv'})
+PHOTO_FORMATS = frozenset({'jpeg', 'png', 'gif', 'bmp', 'tiff', 'webp', 'heic', 'avif'})
+
+# Ekstensi yang cocok dengan tiap jenis file; keluarga QuickTime (mp4/mov/3gp)
+# dan HEIF (heic/avif) saling cocok karena tool memperlakukannya sama
+_QUICKTIME_EXTENSIONS = frozenset({'.mp4', '.mov', '.m4v', '.3gp', '.3g2', '.qt'})
+_HEIF_EXTENSIONS = frozenset({'.heic', '.heif', '.avif'})
+FORMAT_EXTENSIONS = {
+    'jpeg': frozenset({'.jpg', '.jpeg', '.jpe'}),
+    'png': frozenset({'.png'}),
+    'gif': frozenset({'.gif'}),
+    'bmp': frozenset({'.bmp'}),
+    'tiff': frozenset({'.tif', '.tiff'}),
+    'webp': frozenset({'.webp'}),
+    'heic': _HEIF_EXTENSIONS,
+    'avif': _HEIF_EXTENSIONS,
+    'mp4': _QUICKTIME_EXTENSIONS,
+    'mov': _QUICKTIME_EXTENSIONS,
+    'm4v': _QUICKTIME_EXTENSIONS,
+    '3gp': _QUICKTIME_EXTENSIONS,
+    'mkv': frozenset({'.mkv', '.webm'}),
+    'webm': frozenset({'.webm', '.mkv'}),
+    'avi': frozenset({'.avi'}),
+    'wmv': frozenset({'.wmv', '.asf'}),
+    'flv': frozenset({'.flv'}),
+}
+
+SNIFF_BYTES = 32
+
+# Brand ftyp (ISO BMFF) -> jenis file
+_HEIF_BRANDS = frozenset({b'heic', b'heix', b'hevc', b'hevx', b'heim', b'heis', b'mif1', b'msf1'})
+_AVIF_BRANDS = frozenset({b'avif', b'avis'})
+_M4V_BRANDS = frozenset({b'M4V ', b'M4VH', b'M4VP'})
+_ASF_GUID = bytes.fromhex('3026b2758e66cf11a6d900aa0062ce6c')
+
+def sniff_file_type(file_path):
+    """
+    Tebak jenis file asli dari 32 byte pertama (magic bytes), bukan dari ekstensi.
+    Return nama jenis (lihat VIDEO_FORMATS / PHOTO_FORMATS) atau None jika tidak dikenali.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return None
+    
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head[4:8] == b'ftyp':
+        major = head[8:12]
+        brands = {major} | {head[offset:offset + 4] for offset in range(16, len(head) - 3, 4)}
+        if brands & _AVIF_BRANDS:
+            return 'avif'
+        if brands & _HEIF_BRANDS:
+            return 'heic'
+        if major == b'qt  ':
+            return 'mov'
+        if major in _M4V_BRANDS:
+            return 'm4v'
+        if major.startswith(b'3g'):
+            return '3gp'
+        return 'mp4'
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        # EBML: DocType ada di header, biasanya masih dalam 32 byte pertama
+        return 'webm' if b'webm' in head else 'mkv'
+    if head.startswith(b'RIFF'):
+        return {b'WEBP': 'webp', b'AVI ': 'avi'}.get(head[8:12])
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if head.startswith((b'II*\x00', b'MM\x00*')):
+        return 'tiff'
+    if head.startswith(b'BM'):
+        return 'bmp'
+    if head.startswith(_ASF_GUID):
+        return 'wmv'
+    if head.startswith(b'FLV'):
+        return 'flv'
+    return None
+
+def extension_matches(file_format, ext):
+    """True jika ekstensi sesuai jenis file asli (atau jenisnya tidak dikenali)"""
+    return file_format is None or ext.lower() in FORMAT_EXTENSIONS.get(file_format, ())
+
+def scan_folder(folder_path, extensions, only=None):
+    """
+    Daftar (filename, file_path) berekstensi `extensions` di folder_path, urut nama.
+    only: list nama file yang dicek (tanpa listing folder).
+    """
+    files = []
+    for filename in sorted(os.listdir(folder_path) if only is None else only):
+        if os.path.splitext(filename)[1].lower() in extensions:
+            file_path = os.path.join(folder_path, filename)
+            if os.path.isfile(file_path):
+                files.append((filename, file_path))
+    return files
+
+# Journal & report per shard ditulis di subfolder ini dalam output folder
+SHARD_DIR_NAME = ".metatimechanger"
+
+def parse_shard(text):
+    """Parse "i/N" (1 <= i <= N) jadi tuple (i, N)"""
+    match = re.fullmatch(r'\s*(\d+)\s*/\s*(\d+)\s*', text)
+    if not match:
+        raise ValueError(f"format shard harus i/N, bukan {text!r}")
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"shard {index}/{count} di luar rentang 1..{count}")
+    return index, count
+
+def shard_of(relative_path, count):
+    """
+    Nomor shard (1..count) untuk sebuah path relatif terhadap folder input.
+    Deterministik di semua mesin: hanya bergantung pada path, bukan mount point.
+    """
+    key = relative_path.replace(os.sep, '/').encode('utf-8')
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % count + 1
+
+def shard_files(files, folder_path, shard):
+    """Ambil bagian file (filename, file_path) milik shard (i, N)"""
+    index, count = shard
+    return [(filename, file_path) for filename, file_path in files
+            if shard_of(os.path.relpath(file_path, folder_path), count) == index]
+
+def shard_paths(output_folder, shard):
+    """Path (journal, report) untuk shard (i, N)"""
+    index, count = shard
+    base = os.path.join(output_folder, SHARD_DIR_NAME, f"shard-{index}-of-{count}")
+    return base + ".journal.jsonl", base + ".report.json"
+
+# inotify (Linux): event yang menandakan file baru / berubah di folder
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_INOTIFY_MASK = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_INOTIFY_EVENT = struct.Struct('iIII')
+
+# File dianggap selesai ditulis jika ukuran & mtime tidak berubah selama sekian detik
+WATCH_SETTLE_SECONDS = 2.0
+WATCH_POLL_INTERVAL = 2.0
+
+def _inotify_open(folder):
+    """Buka inotify untuk folder; return fd atau None jika tidak tersedia (non-Linux)"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | getattr(os, 'O_CLOEXEC', 0))
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(folder), _INOTIFY_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+class FolderWatcher:
+    """
+    Pantau perubahan file di satu folder.
+    Linux: inotify lewat ctypes (tanpa library tambahan); lainnya: polling os.scandir.
+    """
+    
+    def __init__(self, folder, poll_interval=None):
+        self.folder = folder
+        self.poll_interval = WATCH_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.fd = _inotify_open(folder)
+        self.snapshot = {}
+        if self.fd is None:
+            self.snapshot = self._scan()
+    
+    @property
+    def backend(self):
+        return "inotify" if self.fd is not None else "polling"
+    
+    def _scan(self):
+        snapshot = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    continue
+        return snapshot
+    
+    def existing(self):
+        """Nama semua file yang sudah ada di folder"""
+        return list(self._scan())
+    
+    def wait(self, timeout):
+        """Tunggu maksimal `timeout` detik; return set nama file yang (mungkin) berubah"""
+        if self.fd is None:
+            time.sleep(min(timeout, self.poll_interval))
+            current = self._scan()
+            changed = {name for name, signature in current.items() if self.snapshot.get(name) != signature}
+            self.snapshot = current
+            return changed
+        
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        
+        offset = 0
+        while offset + _INOTIFY_EVENT.size <= len(data):
+            _, mask, _, name_length = _INOTIFY_EVENT.unpack_from(data, offset)
+            offset += _INOTIFY_EVENT.size
+            name = data[offset:offset + name_length].rstrip(b'\0')
+            offset += name_length
+            if mask & _IN_Q_OVERFLOW:
+                # Antrian kernel penuh: event hilang, cek ulang semua file
+                changed.update(self.existing())
+            elif name:
+                changed.add(os.fsdecode(name))
+        return changed
+    
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+def file_signature(file_path):
+    """(ukuran, mtime_ns) file, atau None jika file tidak ada"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
@@ -0,0 +1,173 @@
+"""Snapshot waktu & tag tanggal asli sebelum file ditimpa (log biner append-only) untuk rollback."""
+
+import os
+import glob
+import struct
+import threading
+import time
+
+from .scanner import SHARD_DIR_NAME
+
+SNAPSHOT_MAGIC = b'MTCSNAP1'
+ROLLED_BACK_SUFFIX = '.rolledback'
+
+# Record = 1 byte tipe + isi (big endian):
+#   D  folder   : dir_id u32, panjang u16, path folder (bytes filesystem)
+#   T  nama tag : tag_id u16, panjang u8, nama tag
+#   F  file     : dir_id u32, panjang u16, nama file, atime_ns i64, mtime_ns i64,
+#                 jumlah tag u8 (0xFF = tag tidak dibaca), lalu per tag:
+#                 tag_id u16, panjang nilai u16 (0xFFFF = tag tidak ada), nilai
+_DIR = struct.Struct('>cIH')
+_TAG = struct.Struct('>cHB')
+_FILE = struct.Struct('>cIH')
+_TIMES = struct.Struct('>qqB')
+_VALUE = struct.Struct('>HH')
+_NO_TAGS = 0xFF
+_ABSENT = 0xFFFF
+
+def snapshot_path(output_folder):
+    """Path snapshot baru untuk satu run di output_folder/.metatimechanger/"""
+    name = f"snapshot-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.bin"
+    return os.path.join(output_folder, SHARD_DIR_NAME, name)
+
+def find_snapshots(output_folder):
+    """Snapshot yang belum di-rollback, urut dari yang paling lama"""
+    paths = glob.glob(os.path.join(output_folder, SHARD_DIR_NAME, "snapshot-*.bin"))
+    return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+
+class SnapshotLog:
+    """
+    Log append-only berisi atime/mtime dan tag tanggal asli file, ditulis SEBELUM
+    file ditimpa. Folder dan nama tag di-intern (ditulis sekali, record file
+    memakai ID-nya), jadi satu record file cukup puluhan byte.
+    File log baru dibuat saat record pertama: run tanpa penulisan in-place
+    tidak meninggalkan snapshot kosong.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.dirs = {}
+        self.tags = {}
+        self.recorded = set()
+        self.count = 0
+        self.lock = threading.Lock()
+    
+    def is_recorded(self, path):
+        """True jika nilai asli file ini sudah ada di snapshot"""
+        with self.lock:
+            return os.path.abspath(path) in self.recorded
+    
+    def record(self, entries):
+        """
+        entries: iterable (path, atime_ns, mtime_ns, tags) dengan tags dict
+        {tag: nilai asli atau None jika tag tidak ada} atau None jika tag tidak terbaca
+        (rollback hanya mengembalikan waktu). File yang sudah tercatat dilewati:
+        nilai yang disimpan selalu nilai sebelum run ini menyentuhnya.
+        Ditulis dan di-flush sebelum return.
+        """
+        with self.lock:
+            buffer = bytearray()
+            for path, atime_ns, mtime_ns, tags in entries:
+                path = os.path.abspath(path)
+                if path in self.recorded:
+                    continue
+                self.recorded.add(path)
+                folder, name = os.path.split(path)
+                dir_id = self.dirs.get(folder)
+                if dir_id is None:
+                    dir_id = self.dirs[folder] = len(self.dirs)
+                    encoded = os.fsencode(folder)
+                    buffer += _DIR.pack(b'D', dir_id, len(encoded)) + encoded
+                # Nama tag baru ditulis sebelum record file yang memakainya
+                for tag in tags or ():
+                    if tag not in self.tags:
+                        self.tags[tag] = len(self.tags)
+                        encoded = tag.encode('utf-8')
+                        buffer += _TAG.pack(b'T', self.tags[tag], len(encoded)) + encoded
+                encoded = os.fsencode(name)
+                buffer += _FILE.pack(b'F', dir_id, len(encoded)) + encoded
+                buffer += _TIMES.pack(atime_ns, mtime_ns, _NO_TAGS if tags is None else len(tags))
+                for tag, value in (tags or {}).items():
+                    tag_id = self.tags[tag]
+                    if value is None:
+                        buffer += _VALUE.pack(tag_id, _ABSENT)
+                    else:
+                        encoded = value.encode('utf-8')[:_ABSENT - 1]
+                        buffer += _VALUE.pack(tag_id, len(encoded)) + encoded
+                self.count += 1
+            if not buffer:
+                return
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self.file = open(self.path, 'ab')
+                if self.file.tell() == 0:
+                    self.file.write(SNAPSHOT_MAGIC)
+            self.file.write(buffer)
+            self.file.flush()
+    
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+
+def read_snapshot(path):
+    """
+    Baca snapshot jadi list (path, atime_ns, mtime_ns, tags) sesuai urutan tulis.
+    Record terakhir yang terpotong (run terhenti mendadak) diabaikan.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(SNAPSHOT_MAGIC):
+        raise ValueError(f"bukan file snapshot MetaTimeChanger: {path}")
+    
+    dirs = {}
+    tags = {}
+    entries = []
+    pos = len(SNAPSHOT_MAGIC)
+    try:
+        while pos < len(data):
+            kind = data[pos:pos + 1]
+            if kind == b'D':
+                _, dir_id, length = _DIR.unpack_from(data, pos)
+                pos += _DIR.size
+                dirs[dir_id] = os.fsdecode(data[pos:pos + length])
+                pos += length
+            elif kind == b'T':
+                _, tag_id, length = _TAG.unpack_from(data, pos)
+                pos += _TAG.size
+                tags[tag_id] = data[pos:pos + length].decode('utf-8')
+                pos += length
+            elif kind == b'F':
+                _, dir_id, length = _FILE.unpack_from(data, pos)
+                pos += _FILE.size
+                name = os.fsdecode(data[pos:pos + length])
+                pos += length
+                atime_ns, mtime_ns, count = _TIMES.unpack_from(data, pos)
+                pos += _TIMES.size
+                values = None
+                if count != _NO_TAGS:
+                    values = {}
+                    for _ in range(count):
+                        tag_id, length = _VALUE.unpack_from(data, pos)
+                        pos += _VALUE.size
+                        if length == _ABSENT:
+                            values[tags[tag_id]] = None
+                        else:
+                            values[tags[tag_id]] = data[pos:pos + length].decode('utf-8')
+                            pos += length
+                if pos > len(data):
+                    break
+                entries.append((os.path.join(dirs[dir_id], name), atime_ns, mtime_ns, values))
+            else:
+                raise ValueError(f"record snapshot rusak di byte {pos}: {path}")
+    except struct.error:
+        # Record terakhir terpotong
+        pass
+    return entries
+
+def mark_rolled_back(path):
+    """Ganti nama snapshot supaya tidak di-rollback dua kali; return path baru"""
+    target = path + ROLLED_BACK_SUFFIX
+    os.replace(path, target)
+    return target
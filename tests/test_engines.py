@@ -0,0 +1,158 @@
+import errno
+import os
+import subprocess
+from datetime import datetime
+
+import pytest
+
+from metatimechanger import engines
+from metatimechanger.snapshot import SnapshotLog, read_snapshot
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.bin"
+    path.write_bytes(os.urandom(3 * 1024 * 1024 + 17))
+    return path
+
+def test_copy_falls_back_when_copy_file_range_stops_early(source, tmp_path, monkeypatch):
+    calls = []
+    
+    def short_copy_file_range(src_fd, dst_fd, count, *args):
+        # Satu chunk pertama tersalin, lalu filesystem return 0 sebelum selesai
+        calls.append(count)
+        if len(calls) > 1:
+            return 0
+        return os.write(dst_fd, os.read(src_fd, 1024))
+    
+    monkeypatch.setattr(engines.os, 'copy_file_range', short_copy_file_range, raising=False)
+    target = tmp_path / "target.bin"
+    copied, _ = engines.copy_file_fast(str(source), str(target))
+    
+    assert len(calls) == 2
+    assert copied == source.stat().st_size
+    assert target.read_bytes() == source.read_bytes()
+
+def test_copy_restarts_when_copy_file_range_fails_partway(source, tmp_path, monkeypatch):
+    calls = []
+    
+    def failing_copy_file_range(src_fd, dst_fd, count, *args):
+        # Chunk pertama tersalin, chunk berikutnya gagal dengan EIO
+        calls.append(count)
+        if len(calls) > 1:
+            raise OSError(errno.EIO, "I/O error")
+        return os.write(dst_fd, os.read(src_fd, 1024))
+    
+    monkeypatch.setattr(engines.os, 'copy_file_range', failing_copy_file_range, raising=False)
+    target = tmp_path / "target.bin"
+    copied, _ = engines.copy_file_fast(str(source), str(target))
+    
+    assert copied == source.stat().st_size
+    assert target.read_bytes() == source.read_bytes()
+
+def test_copy_restarts_when_sendfile_fails_partway(source, tmp_path, monkeypatch):
+    calls = []
+    
+    def failing_sendfile(dst_fd, src_fd, offset, count):
+        calls.append(offset)
+        if len(calls) > 1:
+            raise OSError(errno.EIO, "I/O error")
+        return os.write(dst_fd, os.pread(src_fd, 1024, offset))
+    
+    monkeypatch.delattr(engines.os, 'copy_file_range', raising=False)
+    monkeypatch.setattr(engines.os, 'sendfile', failing_sendfile, raising=False)
+    target = tmp_path / "target.bin"
+    copied, _ = engines.copy_file_fast(str(source), str(target), buffer_size=64 * 1024)
+    
+    assert copied == source.stat().st_size
+    assert target.read_bytes() == source.read_bytes()
+
+def test_copy_falls_back_when_sendfile_stops_early(source, tmp_path, monkeypatch):
+    monkeypatch.delattr(engines.os, 'copy_file_range', raising=False)
+    monkeypatch.setattr(engines.os, 'sendfile', lambda *args: 0, raising=False)
+    target = tmp_path / "target.bin"
+    copied, _ = engines.copy_file_fast(str(source), str(target), buffer_size=64 * 1024)
+    
+    assert copied == source.stat().st_size
+    assert target.read_bytes() == source.read_bytes()
+
+def test_copy_of_shrinking_source_fails_without_output(source, tmp_path, monkeypatch):
+    # Ukuran saat copy dimulai lebih besar dari isi yang masih bisa dibaca
+    real_getsize = os.path.getsize
+    monkeypatch.setattr(engines.os.path, 'getsize', lambda path: real_getsize(path) + 4096)
+    target = tmp_path / "target.bin"
+    
+    with pytest.raises(OSError):
+        engines.copy_file_fast(str(source), str(target))
+    assert not target.exists()
+
+def test_snapshot_reads_tags_of_all_groups_in_one_exiftool_call(tmp_path, monkeypatch):
+    photo = tmp_path / "a.jpg"
+    video = tmp_path / "b.mp4"
+    photo.write_bytes(b"jpg")
+    video.write_bytes(b"mp4")
+    calls = []
+    
+    def fake_read(exiftool_path, file_paths, tags):
+        calls.append((list(file_paths), list(tags)))
+        return {engines._path_key(path): {tag: "2001:02:03 04:05:06" for tag in tags} for path in file_paths}
+    
+    monkeypatch.setattr(engines, 'read_exif_dates', fake_read)
+    log = SnapshotLog(str(tmp_path / "snapshot.bin"))
+    groups = [([str(photo)], 'jpeg'), ([str(video)], 'mp4')]
+    engines.snapshot_originals(log, "exiftool", groups)
+    engines.snapshot_originals(log, "exiftool", groups)
+    log.close()
+    
+    assert len(calls) == 1
+    profiles = engines.get_exif_profiles()
+    recorded = {path: tags for path, _, _, tags in read_snapshot(log.path)}
+    assert set(recorded[str(photo)]) == set(profiles.tag_names('.jpg', 'jpeg'))
+    assert set(recorded[str(video)]) == set(profiles.tag_names('.mp4', 'mp4'))
+
+def test_restore_sets_filename_charset_in_every_execute_block(monkeypatch):
+    sent = []
+    
+    def fake_run(command, input=None, **kwargs):
+        sent.append(input)
+        return subprocess.CompletedProcess(command, 0, stdout="", stderr="")
+    
+    monkeypatch.setattr(engines.subprocess, 'run', fake_run)
+    engines.restore_exif_tags("exiftool", [("a.jpg", {'CreateDate': None}),
+                                           ("é.jpg", {'CreateDate': "2001:02:03 04:05:06"})])
+    
+    blocks = sent[0].split('\n-execute\n')
+    assert len(blocks) == 2
+    assert all('-charset\nfilename=utf8\n' in block for block in blocks)
+
+def test_exiftool_does_not_overwrite_files_whose_tags_were_not_snapshotted(tmp_path, monkeypatch):
+    photo = tmp_path / "a.jpg"
+    photo.write_bytes(b"jpg")
+    written = []
+    monkeypatch.setattr(engines, 'read_exif_dates', lambda *args: {})
+    monkeypatch.setattr(engines, 'update_metadata_exif_many',
+                        lambda exiftool_path, paths, *args: written.extend(paths) or (True, None, None))
+    log = SnapshotLog(str(tmp_path / "snapshot.bin"))
+    
+    [result] = engines.write_files_metadata([(photo.name, str(photo))], datetime(2020, 1, 2, 3, 4, 5),
+                                            "exiftool", str(tmp_path / "out"), exiftool_path="exiftool",
+                                            snapshot=log, file_format='jpeg')
+    
+    assert written == []
+    assert result['status'] == 'failed'
+    assert not log.is_recorded(str(photo))
+
+def test_exiftool_batch_sends_file_list_over_stdin(monkeypatch):
+    calls = []
+    
+    def fake_run(command, input=None, **kwargs):
+        calls.append((command, input))
+        return subprocess.CompletedProcess(command, 0, stdout="", stderr="")
+    
+    monkeypatch.setattr(engines.subprocess, 'run', fake_run)
+    paths = [f"Screenrecorder-{index:04d}-{'x' * 100}.mp4" for index in range(500)]
+    success, _, _ = engines.update_metadata_exif_many("exiftool", paths, datetime(2020, 1, 2, 3, 4, 5), 'mp4')
+    
+    [(command, sent)] = calls
+    assert success
+    assert command == ["exiftool", "-@", "-"]
+    assert sent.splitlines()[-len(paths):] == paths
@@ -0,0 +1,49 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from metatimechanger.extraction import reload_pattern_registry, smart_extract_datetime_detail
+
+@pytest.fixture
+def pattern_config(tmp_path):
+    """Tulis config pattern sementara, registry bawaan dipulihkan setelah test"""
+    config_path = tmp_path / "metatimechanger_patterns.json"
+    
+    def load(patterns):
+        config_path.write_text(json.dumps({'patterns': patterns}), encoding='utf-8')
+        return reload_pattern_registry(str(config_path))
+    
+    yield load
+    reload_pattern_registry(None)
+
+def test_user_pattern_with_literal_digits(pattern_config):
+    pattern_config([{'name': 'CAM2', 'regex': r'CAM2-(20\d{2})(\d{2})(\d{2})T(\d{2})(\d{2})(\d{2})'}])
+    
+    # Dua file berbentuk sama: yang kedua lewat cache bentuk nama file
+    for filename, expected in (("CAM2-20231225T143045.jpg", datetime(2023, 12, 25, 14, 30, 45)),
+                               ("CAM2-20240102T080910.jpg", datetime(2024, 1, 2, 8, 9, 10))):
+        assert smart_extract_datetime_detail(filename) == (expected, True, 'CAM2')
+
+def test_user_pattern_keeps_priority_over_defaults(pattern_config):
+    pattern_config([{'name': 'Dashcam', 'regex': r'DC(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})'}])
+    
+    datetime_obj, has_time, pattern_name = smart_extract_datetime_detail("DC20231225_143045.mp4")
+    assert (datetime_obj, has_time, pattern_name) == (datetime(2023, 12, 25, 14, 30, 45), True, 'Dashcam')
+
+def test_dates_before_2000_are_accepted():
+    assert smart_extract_datetime_detail("19991231_235959.jpg")[:2] == (datetime(1999, 12, 31, 23, 59, 59), True)
+
+def test_epoch_before_2000_is_rejected():
+    # 915148800 = 1999-01-01 00:00:00 UTC
+    assert smart_extract_datetime_detail("0915148800.jpg") == (None, False, None)
+
+@pytest.mark.parametrize("filename, expected", [
+    ("Screen Recording 2023-12-25 at 14.30.45.mov", datetime(2023, 12, 25, 14, 30, 45)),
+    ("Screen Recording 2023-12-25 at 9.30.45 PM.mov", datetime(2023, 12, 25, 21, 30, 45)),
+    ("Screenshot 2023-12-25 at 9.30.45 AM.png", datetime(2023, 12, 25, 9, 30, 45)),
+    ("Screenshot 2023-12-25 at 12.05.00 AM.png", datetime(2023, 12, 25, 0, 5, 0)),
+    ("Screenshot 2023-12-25 at 12.05.00 PM.png", datetime(2023, 12, 25, 12, 5, 0)),
+])
+def test_macos_names_in_24_and_12_hour_form(filename, expected):
+    assert smart_extract_datetime_detail(filename) == (expected, True, 'macOS YYYY-MM-DD at HH.MM.SS')
@@ -0,0 +1,253 @@
+import io
+import struct
+import zlib
+from datetime import datetime
+
+import pytest
+
+from metatimechanger import native
+
+NEW_DATE = datetime(2022, 3, 4, 5, 6, 7)
+TIMECODE_SCALE_ID = 0x2AD7B1
+TRACKS_ID = 0x1654AE6B
+
+def ebml(element_id, data, size_length=1):
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big') + native._encode_ebml_size(len(data), size_length) + data
+
+def with_crc(children):
+    return ebml(native.CRC32_ID, struct.pack('<I', zlib.crc32(children))) + children
+
+def write_matroska(path, info_children, after_info=b''):
+    info = ebml(native.INFO_ID, with_crc(info_children))
+    segment = info + after_info + ebml(TRACKS_ID, b'\x00' * 16)
+    path.write_bytes(ebml(native.EBML_HEADER_ID, ebml(0x4282, b'webm')) + ebml(native.SEGMENT_ID, segment, 8))
+    return path
+
+def read_info(path):
+    """(anak-anak Info {id: (posisi elemen, posisi data, ukuran)}, akhir Info, isi file)"""
+    data = path.read_bytes()
+    f = io.BytesIO(data)
+    _, info_data, _, _, info_end, _ = native._find_segment_info(f, len(data))
+    children = {}
+    pos = info_data
+    while pos < info_end:
+        element_id, data_pos, size, _ = native._read_ebml_header(f, pos, info_end)
+        children[element_id] = (pos, data_pos, size)
+        pos = data_pos + size
+    assert pos == info_end
+    return children, info_end, data
+
+def patch_matroska(path):
+    plan = native.plan_native_patch(str(path), 'mkv', NEW_DATE)
+    assert plan.inserts == []
+    size = path.stat().st_size
+    native.apply_patches(str(path), plan.patches)
+    assert path.stat().st_size == size
+
+def assert_date_and_crc(path):
+    children, info_end, data = read_info(path)
+    _, date_pos, date_size = children[native.DATE_UTC_ID]
+    assert data[date_pos:date_pos + date_size] == native.matroska_date_value(NEW_DATE)
+    _, crc_pos, _ = children[native.CRC32_ID]
+    assert data[crc_pos:crc_pos + 4] == struct.pack('<I', zlib.crc32(data[crc_pos + 4:info_end]))
+    return children, info_end, data
+
+def test_matroska_overwrites_existing_date_utc(tmp_path):
+    old_date = ebml(native.DATE_UTC_ID, struct.pack('>q', 0))
+    path = write_matroska(tmp_path / "a.mkv", ebml(TIMECODE_SCALE_ID, b'\x0f\x42\x40') + old_date)
+    _, old_end, _ = read_info(path)
+    patch_matroska(path)
+    
+    children, info_end, _ = assert_date_and_crc(path)
+    assert info_end == old_end
+    assert native.VOID_ID not in children
+
+@pytest.mark.parametrize("void_size, rest", [(20, 9), (12, 0), (11, 0)])
+def test_matroska_writes_date_into_void_inside_info(tmp_path, void_size, rest):
+    path = write_matroska(tmp_path / "a.mkv", ebml(TIMECODE_SCALE_ID, b'\x0f\x42\x40') + native._void_element(void_size))
+    _, old_end, _ = read_info(path)
+    patch_matroska(path)
+    
+    children, info_end, _ = assert_date_and_crc(path)
+    assert info_end == old_end
+    if rest:
+        void_pos, void_data, void_size_left = children[native.VOID_ID]
+        assert void_data + void_size_left - void_pos == rest
+    else:
+        # Sisa 1 byte diserap field ukuran DateUTC (12 byte), sisa 0 tidak butuh Void
+        assert native.VOID_ID not in children
+
+def test_matroska_grows_info_into_following_void(tmp_path):
+    path = write_matroska(tmp_path / "a.mkv", ebml(TIMECODE_SCALE_ID, b'\x0f\x42\x40'), native._void_element(30))
+    _, old_end, old_data = read_info(path)
+    tracks_pos = old_data.index(TRACKS_ID.to_bytes(4, 'big'))
+    patch_matroska(path)
+    
+    _, info_end, data = assert_date_and_crc(path)
+    assert info_end == old_end + native.DATE_UTC_ELEMENT_SIZE
+    # Sisa Void mengisi celah sampai Tracks, yang posisinya tidak bergeser
+    element_id, void_data, void_size, _ = native._read_ebml_header(io.BytesIO(data), info_end, len(data))
+    assert element_id == native.VOID_ID
+    assert void_data + void_size == tracks_pos
+    assert data[tracks_pos:] == old_data[tracks_pos:]
+
+def test_matroska_without_room_needs_remux(tmp_path):
+    path = write_matroska(tmp_path / "a.mkv", ebml(TIMECODE_SCALE_ID, b'\x0f\x42\x40'))
+    with pytest.raises(native.NativePatchError):
+        native.plan_native_patch(str(path), 'mkv', NEW_DATE)
+
+OLD_DATE = datetime(2001, 2, 3, 4, 5, 6)
+EXIF_ITEM_ID = 2
+
+def box(box_type, data):
+    return struct.pack('>I4s', 8 + len(data), box_type) + data
+
+def full_box(box_type, version, data):
+    return box(box_type, bytes([version, 0, 0, 0]) + data)
+
+def heif_iinf():
+    """iinf dengan item gambar (id 1) lalu item Exif (id 2), isi box tanpa header"""
+    entries = b''.join(full_box(b'infe', 2, struct.pack('>HH4s', item_id, 0, item_type) + b'\0')
+                       for item_id, item_type in ((1, b'hvc1'), (EXIF_ITEM_ID, b'Exif')))
+    return bytes([0, 0, 0, 0]) + struct.pack('>H', 2) + entries
+
+def heif_iloc(version, construction_method, offset, length):
+    """iloc dengan item gambar dan item Exif (satu extent), isi box tanpa header"""
+    if version == 0:
+        header = bytes([0x44, 0x00])
+        items = [struct.pack('>HHHII', item_id, 0, 1, item_offset, item_length)
+                 for item_id, item_offset, item_length in ((1, 0, 0), (EXIF_ITEM_ID, offset, length))]
+    else:
+        # Versi 1 dengan base_offset 4 byte: lokasi = base_offset + extent_offset
+        header = bytes([0x44, 0x40])
+        items = [struct.pack('>HHHIHII', item_id, method, 0, base, 1, item_offset, item_length)
+                 for item_id, method, base, item_offset, item_length
+                 in ((1, 0, 0, 0, 0), (EXIF_ITEM_ID, construction_method, offset - 2, 2, length))]
+    return bytes([version, 0, 0, 0]) + header + struct.pack('>H', 2) + b''.join(items)
+
+def write_heif(path, version, construction_method):
+    """HEIC dengan item Exif di mdat (construction_method 0) atau di idat (1). Return (iinf, iloc)"""
+    exif = struct.pack('>I', 6) + b'Exif\0\0' + native.build_tiff_dates(OLD_DATE)
+    ftyp = box(b'ftyp', b'heic' + b'\0' * 4 + b'mif1heic')
+    iinf = heif_iinf()
+    
+    def build(offset):
+        iloc = heif_iloc(version, construction_method, offset, len(exif))
+        children = box(b'iinf', iinf) + box(b'iloc', iloc)
+        if construction_method == 1:
+            children += box(b'idat', b'\0' * 4 + exif)
+        return full_box(b'meta', 0, children), iloc
+    
+    if construction_method == 1:
+        # Offset relatif terhadap awal data idat
+        meta, iloc = build(4)
+        mdat = box(b'mdat', b'\0' * 32)
+    else:
+        # Ukuran meta tidak tergantung nilai offset, jadi dibangun dua kali
+        meta, _ = build(2)
+        meta, iloc = build(len(ftyp) + len(meta) + 8 + 16)
+        mdat = box(b'mdat', b'\0' * 16 + exif + b'\0' * 16)
+    path.write_bytes(ftyp + meta + mdat)
+    return iinf, iloc
+
+@pytest.mark.parametrize("version, construction_method", [(0, 0), (1, 0), (1, 1)])
+def test_heif_patches_dates_in_exif_item(tmp_path, version, construction_method):
+    path = tmp_path / "a.heic"
+    iinf, iloc = write_heif(path, version, construction_method)
+    old_data = path.read_bytes()
+    old_value = OLD_DATE.strftime("%Y:%m:%d %H:%M:%S").encode('ascii')
+    new_value = NEW_DATE.strftime("%Y:%m:%d %H:%M:%S").encode('ascii')
+    
+    assert native._find_exif_item(iinf) == EXIF_ITEM_ID
+    method, [(offset, length)] = native._find_item_extents(iloc, EXIF_ITEM_ID)
+    assert method == construction_method
+    if construction_method == 0:
+        assert old_data[offset + 4:offset + 10] == b'Exif\0\0'
+    
+    plan = native.plan_native_patch(str(path), 'heic', NEW_DATE)
+    assert plan.inserts == [] and len(plan.patches) == 3
+    native.apply_patches(str(path), plan.patches)
+    data = path.read_bytes()
+    
+    assert len(data) == len(old_data)
+    assert data.count(new_value) == 3
+    assert old_value not in data
+    # Hanya string tanggal yang berubah
+    changed = [index for index in range(len(data)) if data[index] != old_data[index]]
+    assert all(any(patch_offset <= index < patch_offset + len(value) for patch_offset, value in plan.patches)
+               for index in changed)
+
+def test_heif_idat_item_without_idat_box_is_rejected(tmp_path):
+    path = tmp_path / "a.heic"
+    iinf = heif_iinf()
+    iloc = heif_iloc(1, 1, 4, 64)
+    path.write_bytes(box(b'ftyp', b'heic' + b'\0' * 4) + full_box(b'meta', 0, box(b'iinf', iinf) + box(b'iloc', iloc)))
+    with pytest.raises(native.NativePatchError):
+        native.plan_native_patch(str(path), 'heic', NEW_DATE)
+
+PNG_IHDR = native._png_chunk(b'IHDR', struct.pack('>IIBBBBB', 1, 1, 8, 6, 0, 0, 0))
+PNG_IDAT = native._png_chunk(b'IDAT', zlib.compress(b'\0' * 5))
+PNG_IEND = native._png_chunk(b'IEND', b'')
+
+def read_png_chunks(path):
+    """[(tipe, data)] dengan CRC setiap chunk sudah dicek"""
+    data = path.read_bytes()
+    assert data[:8] == native.PNG_SIGNATURE
+    chunks = []
+    pos = 8
+    while pos < len(data):
+        length, chunk_type = struct.unpack_from('>I4s', data, pos)
+        body = data[pos + 8:pos + 8 + length]
+        assert data[pos + 8 + length:pos + 12 + length] == struct.pack('>I', zlib.crc32(chunk_type + body))
+        chunks.append((chunk_type, body))
+        pos += 12 + length
+    assert pos == len(data)
+    return chunks
+
+def assert_png_dates(chunks):
+    values = dict(chunks)
+    assert values[b'tIME'] == native.png_time_value(NEW_DATE)
+    assert values[b'eXIf'].count(NEW_DATE.strftime("%Y:%m:%d %H:%M:%S").encode('ascii')) == 3
+
+def test_png_inserts_missing_chunks_after_ihdr(tmp_path):
+    source = tmp_path / "a.png"
+    target = tmp_path / "b.png"
+    source.write_bytes(native.PNG_SIGNATURE + PNG_IHDR + PNG_IDAT + PNG_IEND)
+    plan = native.plan_native_patch(str(source), 'png', NEW_DATE)
+    assert plan.patches == []
+    written = native.write_with_inserts(str(source), str(target), plan)
+    
+    chunks = read_png_chunks(target)
+    assert written == target.stat().st_size
+    assert [chunk_type for chunk_type, _ in chunks] == [b'IHDR', b'eXIf', b'tIME', b'IDAT', b'IEND']
+    assert_png_dates(chunks)
+
+def test_png_shifts_in_place_patches_past_inserted_chunk(tmp_path):
+    # tIME setelah IDAT ditimpa di tempat, eXIf disisipkan sebelumnya: offset patch harus bergeser
+    source = tmp_path / "a.png"
+    target = tmp_path / "b.png"
+    old_time = native._png_chunk(b'tIME', native.png_time_value(OLD_DATE))
+    source.write_bytes(native.PNG_SIGNATURE + PNG_IHDR + PNG_IDAT + old_time + PNG_IEND)
+    plan = native.plan_native_patch(str(source), 'png', NEW_DATE)
+    assert len(plan.inserts) == 1 and plan.patches
+    native.write_with_inserts(str(source), str(target), plan)
+    
+    chunks = read_png_chunks(target)
+    assert [chunk_type for chunk_type, _ in chunks] == [b'IHDR', b'eXIf', b'IDAT', b'tIME', b'IEND']
+    assert_png_dates(chunks)
+
+def test_png_patches_existing_chunks_in_place(tmp_path):
+    path = tmp_path / "a.png"
+    path.write_bytes(native.PNG_SIGNATURE + PNG_IHDR
+                     + native._png_chunk(b'eXIf', native.build_tiff_dates(OLD_DATE))
+                     + native._png_chunk(b'tIME', native.png_time_value(OLD_DATE))
+                     + PNG_IDAT + PNG_IEND)
+    size = path.stat().st_size
+    plan = native.plan_native_patch(str(path), 'png', NEW_DATE)
+    assert plan.inserts == []
+    native.apply_patches(str(path), plan.patches)
+    
+    chunks = read_png_chunks(path)
+    assert path.stat().st_size == size
+    assert [chunk_type for chunk_type, _ in chunks] == [b'IHDR', b'eXIf', b'tIME', b'IDAT', b'IEND']
+    assert_png_dates(chunks)
@@ -0,0 +1,146 @@
+import errno
+import os
+import threading
+import time
+from datetime import datetime
+
+from metatimechanger import engines, pipeline
+from metatimechanger.pipeline import Dated, RetimePolicy, retime
+
+def test_retime_mixes_paths_dated_items_and_duplicates(tmp_path):
+    source = tmp_path / "in"
+    source.mkdir()
+    dated = source / "VID_20230101_101010.mp4"
+    undated = source / "random.mp4"
+    answered = source / "clip.mp4"
+    duplicate = source / "clip (1).mp4"
+    dated.write_bytes(b"a" * 100)
+    undated.write_bytes(b"b" * 50)
+    answered.write_bytes(b"c" * 70)
+    duplicate.write_bytes(b"c" * 70)
+    
+    answer = datetime(2021, 6, 7, 8, 9, 10)
+    policy = RetimePolicy(str(tmp_path / "out"), tool="basic", detect_tools=False, snapshot=False)
+    items = [str(dated), str(undated), Dated([str(answered)], answer, None)]
+    duplicates = {str(answered): [(duplicate.name, str(duplicate))]}
+    results = {result.path: result for result in retime(items, policy, duplicates)}
+    
+    assert results[str(dated)].status == 'ok'
+    assert results[str(dated)].datetime == datetime(2023, 1, 1, 10, 10, 10)
+    assert results[str(undated)].status == 'skipped'
+    assert results[str(answered)].datetime == answer
+    assert results[str(duplicate)].engine == 'link'
+    assert results[str(duplicate)].datetime == answer
+    assert os.path.getmtime(results[str(duplicate)].output) == answer.timestamp()
+
+def test_auto_writes_heic_named_jpg_without_exiftool_and_sniffs_once(tmp_path, monkeypatch):
+    # HEIC tanpa EXIF dengan ekstensi .jpg: ExifTool akan menolak (ekstensi tidak cocok),
+    # native tidak bisa patch, jadi mode auto harus jatuh ke basic
+    photo = tmp_path / "IMG_20230405_060708.jpg"
+    photo.write_bytes(b"\x00\x00\x00\x18ftypheic\x00\x00\x00\x00mif1heic" + b"\x00" * 64)
+    sniffed = []
+    sniff_file_type = pipeline.sniff_file_type
+    
+    def counting_sniff(path):
+        sniffed.append(path)
+        return sniff_file_type(path)
+    
+    monkeypatch.setattr(pipeline, 'sniff_file_type', counting_sniff)
+    policy = RetimePolicy(str(tmp_path / "out"), exiftool_path="/tidak/ada/exiftool",
+                          detect_tools=False, snapshot=False)
+    [result] = retime([str(photo)], policy)
+    
+    assert result.status == 'ok'
+    assert result.engine == 'basic'
+    assert sniffed == [str(photo)]
+
+def test_writer_prepares_queued_jobs_together():
+    release = threading.Event()
+    prepared = []
+    
+    def write(entries, datetime_obj, selected_tool, file_format):
+        # Job pertama menahan writer supaya job berikutnya menumpuk di antrian
+        release.wait(5)
+        return []
+    
+    writer = pipeline.BackgroundWriter(write, prepare=lambda jobs: prepared.append(len(jobs)))
+    writer.submit([("a.jpg", "a.jpg")], None, "exiftool")
+    while not prepared:
+        time.sleep(0.01)
+    writer.submit([("b.jpg", "b.jpg")], None, "exiftool")
+    writer.submit([("c.jpg", "c.jpg")], None, "exiftool")
+    release.set()
+    writer.close()
+    
+    assert prepared == [1, 2]
+
+def test_failed_copy_is_reported_as_failed(tmp_path, monkeypatch):
+    video = tmp_path / "VID_20230101_101010.mp4"
+    video.write_bytes(b"a" * 100)
+    
+    def broken_copy(source_path, target_path, progress=None):
+        raise OSError(errno.EIO, "disk gone")
+    
+    monkeypatch.setattr(engines, 'copy_file_fast', broken_copy)
+    policy = RetimePolicy(str(tmp_path / "out"), tool="basic", detect_tools=False, snapshot=False)
+    [result] = retime([str(video)], policy)
+    
+    assert result.status == 'failed'
+    assert result.output is None
+    assert "disk gone" in result.error
+
+def test_locked_copy_goes_to_retry_queue(tmp_path, monkeypatch):
+    video = tmp_path / "VID_20230101_101010.mp4"
+    video.write_bytes(b"a" * 100)
+    copy_file_fast = engines.copy_file_fast
+    calls = []
+    
+    def locked_once(source_path, target_path, progress=None):
+        calls.append(source_path)
+        if len(calls) == 1:
+            raise OSError(errno.EBUSY, "busy")
+        return copy_file_fast(source_path, target_path, progress=progress)
+    
+    monkeypatch.setattr(engines, 'copy_file_fast', locked_once)
+    monkeypatch.setattr(pipeline, 'RETRY_QUEUE_DELAY', 0)
+    policy = RetimePolicy(str(tmp_path / "out"), tool="basic", detect_tools=False, snapshot=False)
+    [result] = retime([str(video)], policy)
+    
+    assert len(calls) == 2
+    assert result.status == 'ok'
+    assert os.path.getsize(result.output) == 100
+
+def test_merge_counts_rerun_shard_from_other_mount_once(tmp_path):
+    shard_dir = tmp_path / ".metatimechanger"
+    shard_dir.mkdir()
+    journal = shard_dir / "shard-1-of-1.journal.jsonl"
+    # Shard yang sama dijalankan ulang dari mount point lain: path absolut beda, path relatif sama
+    journal.write_text(
+        '{"event": "file", "file": "/mnt/a/in/x.mp4", "relative": "x.mp4", "status": "failed"}\n'
+        '{"event": "file", "file": "/media/b/in/x.mp4", "relative": "x.mp4", "status": "ok"}\n',
+        encoding='utf-8')
+    (shard_dir / "shard-1-of-1.report.json").write_text('{"total": 1}', encoding='utf-8')
+    merged = pipeline.merge_shards(str(tmp_path))
+    
+    assert merged['statuses'] == {'ok': 1}
+    assert merged['missing_shards'] == []
+
+def test_infer_max_gap_hours_is_passed_to_inference(tmp_path):
+    source = tmp_path / "in"
+    source.mkdir()
+    names = ["IMG_20230101_080000.jpg", "random.jpg", "IMG_20230101_180000.jpg"]
+    for name in names:
+        (source / name).write_bytes(b"x" * 10)
+    paths = [str(source / name) for name in names]
+    
+    # Tetangga berjarak 10 jam: di luar default 6 jam, masuk jika batasnya 12 jam
+    default = RetimePolicy(str(tmp_path / "a"), tool="basic", detect_tools=False, snapshot=False,
+                           infer_undated=True)
+    wider = RetimePolicy(str(tmp_path / "b"), tool="basic", detect_tools=False, snapshot=False,
+                         infer_undated=True, infer_max_gap_hours=12)
+    
+    assert {result.path: result for result in retime(paths, default)}[paths[1]].status == 'skipped'
+    result = {result.path: result for result in retime(paths, wider)}[paths[1]]
+    assert result.status == 'ok'
+    assert result.pattern == 'inferred'
+    assert datetime(2023, 1, 1, 8) < result.datetime < datetime(2023, 1, 1, 18)